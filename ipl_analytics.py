@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In-memory analytics engine for the IPL MCP server.
+#
+# Loads deliveries, wickets, match_detail and powerplay (plus the players and
+# teams lookup tables) into pandas/NumPy columns once, with players, teams and
+# matches integer-encoded, and answers every template in ipl_mcp_server's
+# TEMPLATES with vectorized group-bys instead of SQL. Result rows use the same
+# column names and ordering as the SQL templates.
+#
+# Enable it per request with {"engine": "analytics"} on /query, or for every
+# request with QUERY_ENGINE = "analytics" in ipl_mcp_server.py.
+
+import time
+
+import numpy as np
+import pandas as pd
+
+
+BOWLER_WICKET_KINDS = ['bowled', 'caught', 'lbw', 'stumped', 'hit wicket', 'caught and bowled']
+RETIRED_KINDS = ['retired hurt', 'retired not out']
+
+TABLE_QUERIES = {
+    "players": "SELECT player_id, player_name FROM players",
+    "teams": "SELECT team_id, team_name FROM teams",
+    "match_detail": """
+        SELECT match_id, match_date, city, venue, match_number, season, match_type, stage,
+               team1_id, team2_id, winner_team_id, win_by_runs, win_by_wickets
+        FROM match_detail
+    """,
+    # deliveries stores integer surrogate keys; translate them back to the
+    # string ids the rest of the engine (and the API) uses. Scorecards and
+    # partnerships need the rows in the order they were bowled.
+    "deliveries": """
+        SELECT d.delivery_key AS delivery_id, md.match_id, d.inning_num,
+               bt.team_id AS batting_team_id, wt.team_id AS bowling_team_id, d.over_num,
+               pb.player_id AS batsman_id, pw.player_id AS bowler_id, pn.player_id AS non_striker_id,
+               d.runs_batsman, d.runs_extras, d.runs_total
+        FROM deliveries d
+        JOIN match_detail md ON md.match_key = d.match_key
+        JOIN teams bt ON bt.team_key = d.batting_team_key
+        JOIN teams wt ON wt.team_key = d.bowling_team_key
+        JOIN players pb ON pb.player_key = d.batsman_key
+        JOIN players pw ON pw.player_key = d.bowler_key
+        JOIN players pn ON pn.player_key = d.non_striker_key
+        ORDER BY d.delivery_key
+    """,
+    "wickets": "SELECT delivery_key AS delivery_id, player_dismissed_id, dismissal_kind FROM wickets ORDER BY wicket_id",
+    "powerplay": "SELECT match_id, inning_num, start_over, end_over FROM powerplay",
+}
+
+
+def fetch_tables(conn):
+    tables = {}
+    cursor = conn.cursor()
+    for name, sql in TABLE_QUERIES.items():
+        cursor.execute(sql)
+        columns = [column[0] for column in cursor.description]
+        tables[name] = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+    cursor.close()
+    return tables
+
+
+def records(frame):
+    """DataFrame -> list of dicts with plain Python values (NaN -> None)."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict("records")
+
+
+class AnalyticsEngine:
+    def __init__(self, tables):
+        start = time.perf_counter()
+        players = tables["players"]
+        teams = tables["teams"]
+        matches = tables["match_detail"].reset_index(drop=True)
+        deliveries = tables["deliveries"]
+        wickets = tables["wickets"]
+        powerplay = tables["powerplay"]
+
+        # Dictionary-encode the string keys once; everything below works on
+        # int32 codes into these arrays.
+        self.player_ids = pd.Index(players["player_id"])
+        self.player_names = players["player_name"].to_numpy(dtype=object)
+        self.team_ids = pd.Index(teams["team_id"])
+        self.team_names = teams["team_name"].to_numpy(dtype=object)
+        self.match_ids = pd.Index(matches["match_id"])
+
+        self.matches = pd.DataFrame({
+            "match": np.arange(len(matches), dtype=np.int32),
+            "match_id": matches["match_id"],
+            "match_date": matches["match_date"],
+            "city": matches["city"],
+            "venue": matches["venue"],
+            "match_number": matches["match_number"],
+            "season": matches["season"],
+            "match_type": matches["match_type"],
+            "stage": matches["stage"],
+            "team1": self._team_codes(matches["team1_id"]),
+            "team2": self._team_codes(matches["team2_id"]),
+            "winner": self._team_codes(matches["winner_team_id"]),
+            "win_by_runs": pd.to_numeric(matches["win_by_runs"]).fillna(0).astype(np.int32),
+            "win_by_wickets": pd.to_numeric(matches["win_by_wickets"]).fillna(0).astype(np.int32),
+        })
+
+        self.deliveries = pd.DataFrame({
+            "match": self.match_ids.get_indexer(deliveries["match_id"]).astype(np.int32),
+            "inning": deliveries["inning_num"].to_numpy(dtype=np.int16),
+            "batting_team": self._team_codes(deliveries["batting_team_id"]),
+            "bowling_team": self._team_codes(deliveries["bowling_team_id"]),
+            "over": deliveries["over_num"].to_numpy(dtype=np.int16),
+            "batsman": self._player_codes(deliveries["batsman_id"]),
+            "bowler": self._player_codes(deliveries["bowler_id"]),
+            "non_striker": self._player_codes(deliveries["non_striker_id"]),
+            "runs_batsman": deliveries["runs_batsman"].to_numpy(dtype=np.int16),
+            "runs_extras": deliveries["runs_extras"].to_numpy(dtype=np.int16),
+            "runs_total": deliveries["runs_total"].to_numpy(dtype=np.int16),
+        })
+
+        delivery_rows = pd.Index(deliveries["delivery_id"]).get_indexer(wickets["delivery_id"])
+        self.wickets = pd.DataFrame({
+            "delivery": delivery_rows.astype(np.int32),
+            "dismissed": self._player_codes(wickets["player_dismissed_id"]),
+            "kind": wickets["dismissal_kind"].to_numpy(dtype=object),
+            "bowler_credit": wickets["dismissal_kind"].isin(BOWLER_WICKET_KINDS).to_numpy(),
+        })
+        self.wickets = self.wickets[self.wickets["delivery"] >= 0]
+
+        self.powerplay = pd.DataFrame({
+            "match": self.match_ids.get_indexer(powerplay["match_id"]).astype(np.int32),
+            "inning": powerplay["inning_num"].to_numpy(dtype=np.int16),
+            "start_over": powerplay["start_over"].to_numpy(dtype=np.int16),
+            "end_over": powerplay["end_over"].to_numpy(dtype=np.int16),
+        })
+
+        self._build_lines()
+        self.load_seconds = time.perf_counter() - start
+
+    @classmethod
+    def from_connection(cls, conn):
+        return cls(fetch_tables(conn))
+
+    def _player_codes(self, values):
+        return self.player_ids.get_indexer(values).astype(np.int32)
+
+    def _team_codes(self, values):
+        return self.team_ids.get_indexer(values).astype(np.int32)
+
+    def _build_lines(self):
+        d = self.deliveries
+        wicket_deliveries = np.unique(self.wickets.loc[self.wickets["bowler_credit"], "delivery"].to_numpy())
+        bowler_wicket = np.zeros(len(d), dtype=np.int16)
+        bowler_wicket[wicket_deliveries] = 1
+        d = d.assign(
+            four=(d["runs_batsman"] == 4).astype(np.int16),
+            six=(d["runs_batsman"] == 6).astype(np.int16),
+            bowler_wicket=bowler_wicket,
+            conceded=d["runs_batsman"] + d["runs_extras"],
+        )
+        self.deliveries = d
+
+        self.innings = (
+            d.groupby(["match", "inning", "batting_team"], sort=False)
+            .agg(total_runs=("runs_total", "sum"), balls=("runs_total", "size"))
+            .reset_index()
+        )
+        # Batting order: first appearance at either end, striker before
+        # non-striker on the same ball.
+        rows = np.arange(len(d))
+        crease = pd.DataFrame({
+            "seq": np.concatenate([rows * 2, rows * 2 + 1]),
+            "match": np.tile(d["match"].to_numpy(), 2),
+            "inning": np.tile(d["inning"].to_numpy(), 2),
+            "batsman": np.concatenate([d["batsman"].to_numpy(), d["non_striker"].to_numpy()]),
+            "batting_team": np.tile(d["batting_team"].to_numpy(), 2),
+        }).sort_values("seq", kind="stable").drop_duplicates(["match", "inning", "batsman"])
+        crease["batting_position"] = crease.groupby(["match", "inning"]).cumcount() + 1
+
+        faced = (
+            d.groupby(["match", "inning", "batsman"], sort=False)
+            .agg(runs=("runs_batsman", "sum"), balls_faced=("runs_batsman", "size"),
+                 fours=("four", "sum"), sixes=("six", "sum"))
+            .reset_index()
+        )
+        w = self.wickets.assign(match=d["match"].to_numpy()[self.wickets["delivery"]],
+                                inning=d["inning"].to_numpy()[self.wickets["delivery"]])
+        how_out = (
+            w.sort_values("delivery", kind="stable")
+            .drop_duplicates(["match", "inning", "dismissed"], keep="last")
+            .rename(columns={"dismissed": "batsman", "kind": "dismissal_kind"})
+        )
+        self.batting = (
+            crease.drop(columns="seq")
+            .merge(faced, on=["match", "inning", "batsman"], how="left")
+            .merge(how_out[["match", "inning", "batsman", "dismissal_kind"]], on=["match", "inning", "batsman"], how="left")
+            .fillna({"runs": 0, "balls_faced": 0, "fours": 0, "sixes": 0})
+            .astype({"runs": np.int64, "balls_faced": np.int64, "fours": np.int64, "sixes": np.int64})
+        )
+
+        self.bowling = (
+            d.groupby(["match", "bowler"], sort=False)
+            .agg(wickets=("bowler_wicket", "sum"), runs_conceded=("conceded", "sum"))
+            .reset_index()
+        )
+        spells = (
+            d.groupby(["match", "inning", "bowler", "bowling_team"], sort=False)
+            .agg(wickets=("bowler_wicket", "sum"), runs_conceded=("conceded", "sum"), balls=("conceded", "size"))
+            .reset_index()
+        )
+        # groupby(sort=False) keeps first-appearance order, which is the bowling order.
+        spells["bowling_position"] = spells.groupby(["match", "inning"]).cumcount() + 1
+        self.bowling_lines = spells
+
+        self._build_partnerships(w)
+
+    def _build_partnerships(self, w):
+        # A stand is a run of deliveries with the same two batters, numbered by
+        # the wickets (not retirements) that fell before it; same pair and
+        # wicket number again later in the innings counts as the same stand.
+        d = self.deliveries
+        low = np.minimum(d["batsman"], d["non_striker"]).to_numpy()
+        high = np.maximum(d["batsman"], d["non_striker"]).to_numpy()
+        match, inning = d["match"].to_numpy(), d["inning"].to_numpy()
+        new_stand = np.ones(len(d), dtype=bool)
+        new_stand[1:] = ((match[1:] != match[:-1]) | (inning[1:] != inning[:-1])
+                         | (low[1:] != low[:-1]) | (high[1:] != high[:-1]))
+
+        fell = w[~w["kind"].isin(RETIRED_KINDS)].drop_duplicates(["delivery", "dismissed"])
+        fallen = np.bincount(fell["delivery"], minlength=len(d))
+        fallen_after = pd.Series(fallen).groupby([match, inning]).cumsum().to_numpy()
+        stand = np.cumsum(new_stand) - 1
+        wicket_num = (fallen_after - fallen)[new_stand][stand] + 1
+
+        stands = (
+            d.assign(low=low, high=high, wicket_num=wicket_num)
+            .groupby(["match", "inning", "wicket_num", "low", "high"], sort=False)
+            .agg(batting_team=("batting_team", "first"), bowling_team=("bowling_team", "first"),
+                 runs=("runs_total", "sum"), balls=("runs_total", "size"))
+            .reset_index()
+        )
+        positions = self.batting.set_index(["match", "inning", "batsman"])["batting_position"]
+        low_first = (
+            positions.reindex(pd.MultiIndex.from_arrays([stands["match"], stands["inning"], stands["low"]])).to_numpy()
+            < positions.reindex(pd.MultiIndex.from_arrays([stands["match"], stands["inning"], stands["high"]])).to_numpy()
+        )
+        self.partnerships = stands.assign(
+            batter1=np.where(low_first, stands["low"], stands["high"]),
+            batter2=np.where(low_first, stands["high"], stands["low"]),
+        )
+
+    def _team_frame(self, matches, columns):
+        out = matches.assign(team1=self.team_names[matches["team1"]], team2=self.team_names[matches["team2"]])
+        return out[columns]
+
+    def answer(self, template_name, params=()):
+        handler = getattr(self, f"_q_{template_name}", None)
+        if handler is None:
+            raise KeyError(f"Analytics engine has no implementation for template {template_name}")
+        return records(handler(*params))
+
+    @classmethod
+    def supports(cls, template_name):
+        return hasattr(cls, f"_q_{template_name}")
+
+    # ========== TEMPLATES ==========
+
+    def _q_all_matches(self):
+        m = self.matches.sort_values(["match_date", "match_id"], kind="stable")
+        return self._team_frame(m, ["match_id", "match_date", "city", "venue", "match_number",
+                                    "season", "match_type", "team1", "team2"])
+
+    def _q_most_wins(self):
+        winners = self.matches["winner"].to_numpy()
+        wins = np.bincount(winners[winners >= 0], minlength=len(self.team_names))
+        best = int(np.argmax(wins))
+        return pd.DataFrame({"team_name": [self.team_names[best]], "wins": [int(wins[best])]})
+
+    def _q_highest_total(self):
+        top = self.innings.nlargest(1, "total_runs")
+        return pd.DataFrame({
+            "match_id": self.match_ids[top["match"].to_numpy()],
+            "inning_num": top["inning"].to_numpy(),
+            "team_name": self.team_names[top["batting_team"]],
+            "total_runs": top["total_runs"].to_numpy(),
+        })
+
+    def _q_matches_in_city(self, city):
+        m = self.matches[self.matches["city"] == city].sort_values(["match_date", "match_id"], kind="stable")
+        return self._team_frame(m, ["match_id", "match_date", "venue", "team1", "team2"])
+
+    def _q_matches_at_venue(self, venue):
+        m = self.matches[self.matches["venue"] == venue].sort_values(["match_date", "match_id"], kind="stable")
+        return self._team_frame(m, ["match_id", "match_date", "city", "team1", "team2"])
+
+    def _q_most_runs(self):
+        d = self.deliveries
+        runs = np.bincount(d["batsman"], weights=d["runs_batsman"], minlength=len(self.player_names))
+        best = int(np.argmax(runs))
+        return pd.DataFrame({"player_name": [self.player_names[best]], "total_runs": [int(runs[best])]})
+
+    def _q_most_wickets(self):
+        d = self.deliveries
+        wickets = np.bincount(d["bowler"], weights=d["bowler_wicket"], minlength=len(self.player_names))
+        best = int(np.argmax(wickets))
+        return pd.DataFrame({"bowler_name": [self.player_names[best]], "wickets_taken": [int(wickets[best])]})
+
+    def _q_player_batting(self, player_id, _dismissed_id=None):
+        code = self.player_ids.get_indexer([player_id])[0]
+        lines = self.batting[self.batting["batsman"] == code]
+        if code < 0 or lines.empty:
+            return pd.DataFrame(columns=["player_name"])
+        per_match = lines.groupby("match").agg(runs=("runs", "sum"), balls_faced=("balls_faced", "sum"),
+                                               fours=("fours", "sum"), sixes=("sixes", "sum"))
+        times_out = int((self.wickets["dismissed"] == code).sum())
+        total_runs = int(per_match["runs"].sum())
+        balls = int(per_match["balls_faced"].sum())
+        return pd.DataFrame([{
+            "player_name": self.player_names[code],
+            "innings_played": len(per_match),
+            "total_runs": total_runs,
+            "highest_score": int(per_match["runs"].max()),
+            "total_fours": int(per_match["fours"].sum()),
+            "total_sixes": int(per_match["sixes"].sum()),
+            "balls_faced": balls,
+            "times_dismissed": times_out,
+            "batting_average": round(total_runs / times_out, 2) if times_out else None,
+            "strike_rate": round(total_runs / balls * 100, 2) if balls else None,
+            "fifties": int(per_match["runs"].between(50, 99).sum()),
+            "centuries": int((per_match["runs"] >= 100).sum()),
+        }])
+
+    def _q_best_bowling_figures(self):
+        top = self.bowling.sort_values(["wickets", "runs_conceded"], ascending=[False, True], kind="stable").head(1)
+        return pd.DataFrame({
+            "player_name": self.player_names[top["bowler"]],
+            "match_id": self.match_ids[top["match"].to_numpy()],
+            "wickets_taken": top["wickets"].to_numpy(),
+            "runs_conceded": top["runs_conceded"].to_numpy(),
+        })
+
+    def _q_average_first_innings(self):
+        first = self.innings.loc[self.innings["inning"] == 1, "total_runs"]
+        return pd.DataFrame({"average_first_innings_score": [round(float(first.mean()), 2) if len(first) else None]})
+
+    def _q_highest_scoring_venue(self):
+        totals = np.bincount(self.deliveries["match"], weights=self.deliveries["runs_total"], minlength=len(self.matches))
+        played = self.matches.assign(total_runs=totals)
+        played = played[np.bincount(self.deliveries["match"], minlength=len(self.matches)) > 0]
+        venues = played.groupby("venue", dropna=False)["total_runs"].mean().round(2)
+        top = venues.sort_values(ascending=False, kind="stable").head(5)
+        return pd.DataFrame({"venue": top.index, "avg_total_runs": top.to_numpy()})
+
+    def _q_centuries(self):
+        hundreds = self.batting[self.batting["runs"] >= 100]
+        out = pd.DataFrame({
+            "player_name": self.player_names[hundreds["batsman"]],
+            "match_id": self.match_ids[hundreds["match"].to_numpy()],
+            "runs_scored": hundreds["runs"].to_numpy(),
+            "balls_faced": hundreds["balls_faced"].to_numpy(),
+            "fours": hundreds["fours"].to_numpy(),
+            "sixes": hundreds["sixes"].to_numpy(),
+        })
+        return out.sort_values(["runs_scored", "player_name", "match_id"], ascending=[False, True, True], kind="stable")
+
+    def _q_best_chase(self):
+        chases = self.matches[self.matches["win_by_wickets"] > 0]
+        totals = self.innings.groupby(["match", "batting_team"])["total_runs"].sum()
+        chased = totals.reindex(pd.MultiIndex.from_arrays([chases["match"], chases["winner"]])).to_numpy()
+        top = chases.assign(chased_runs=pd.array(chased, dtype="Int64")).sort_values("chased_runs", ascending=False, kind="stable").head(1)
+        return pd.DataFrame({
+            "match_id": top["match_id"].to_numpy(),
+            "match_date": top["match_date"].to_numpy(),
+            "chasing_team": self.team_names[top["winner"]],
+            "wickets_left": top["win_by_wickets"].to_numpy(),
+            "chased_runs": top["chased_runs"].to_numpy(),
+        })
+
+    def _q_best_powerplay(self):
+        d = self.deliveries[["match", "inning", "over", "batting_team", "runs_total"]]
+        joined = d.merge(self.powerplay, on=["match", "inning"])
+        joined = joined[(joined["over"] >= joined["start_over"]) & (joined["over"] <= joined["end_over"])]
+        runs = np.bincount(joined["batting_team"], weights=joined["runs_total"], minlength=len(self.team_names))
+        best = int(np.argmax(runs))
+        return pd.DataFrame({"team_name": [self.team_names[best]], "total_powerplay_runs": [int(runs[best])]})
+
+    def _q_scorecard(self, team1_id, team2_id, _team2_id=None, _team1_id=None):
+        t1, t2 = self.team_ids.get_indexer([team1_id, team2_id])
+        m = self.matches
+        has_t1 = (m["team1"] == t1) | (m["team2"] == t1)
+        has_t2 = (m["team1"] == t2) | (m["team2"] == t2)
+        between = m.loc[has_t1 & has_t2, "match"]
+        lines = self.batting[self.batting["match"].isin(between)]
+        out = pd.DataFrame({
+            "match_id": self.match_ids[lines["match"].to_numpy()],
+            "inning_num": lines["inning"].to_numpy(),
+            "batting_position": lines["batting_position"].to_numpy(),
+            "player": self.player_names[lines["batsman"]],
+            "team_name": self.team_names[lines["batting_team"]],
+            "dismissal": lines["dismissal_kind"].fillna("not out").to_numpy(),
+            "balls_faced": lines["balls_faced"].to_numpy(),
+            "runs": lines["runs"].to_numpy(),
+            "fours": lines["fours"].to_numpy(),
+            "sixes": lines["sixes"].to_numpy(),
+        })
+        return out.sort_values(["match_id", "inning_num", "batting_position"], kind="stable")
+
+    def _q_bowling_scorecard(self, team1_id, team2_id, _team2_id=None, _team1_id=None):
+        t1, t2 = self.team_ids.get_indexer([team1_id, team2_id])
+        m = self.matches
+        has_t1 = (m["team1"] == t1) | (m["team2"] == t1)
+        has_t2 = (m["team1"] == t2) | (m["team2"] == t2)
+        between = m.loc[has_t1 & has_t2, "match"]
+        lines = self.bowling_lines[self.bowling_lines["match"].isin(between)]
+        out = pd.DataFrame({
+            "match_id": self.match_ids[lines["match"].to_numpy()],
+            "inning_num": lines["inning"].to_numpy(),
+            "bowling_position": lines["bowling_position"].to_numpy(),
+            "bowler": self.player_names[lines["bowler"]],
+            "team_name": self.team_names[lines["bowling_team"]],
+            "balls": lines["balls"].to_numpy(),
+            "runs_conceded": lines["runs_conceded"].to_numpy(),
+            "wickets": lines["wickets"].to_numpy(),
+        })
+        return out.sort_values(["match_id", "inning_num", "bowling_position"], kind="stable")
+
+    def _q_sixes_in_final(self):
+        finals = self.matches.loc[self.matches["stage"].str.lower() == "final", "match"]
+        sixes = self.deliveries.loc[self.deliveries["match"].isin(finals), "six"]
+        return pd.DataFrame({"total_sixes_in_final": [int(sixes.sum()) if len(sixes) else None]})
+
+    def _q_closest_match(self):
+        rows = []
+        for column, margin_type in (("win_by_runs", "runs"), ("win_by_wickets", "wickets")):
+            won = self.matches[self.matches[column] > 0].sort_values(column, kind="stable").head(1)
+            rows.append(self._team_frame(won, ["match_id", "team1", "team2"]).assign(
+                margin=won[column].to_numpy(), margin_type=margin_type))
+        return pd.concat(rows, ignore_index=True)
+
+    def _q_century_partnerships(self):
+        stands = self.partnerships[self.partnerships["runs"] >= 100]
+        names = self.player_names
+        out = pd.DataFrame({
+            "match_id": self.match_ids[stands["match"].to_numpy()],
+            "inning_num": stands["inning"].to_numpy(),
+            "wicket_num": stands["wicket_num"].to_numpy(),
+            "batting_team_id": self.team_ids[stands["batting_team"].to_numpy()],
+            "bowling_team_id": self.team_ids[stands["bowling_team"].to_numpy()],
+            "partnership": [f"{names[a]} - {names[b]}" for a, b in zip(stands["batter1"], stands["batter2"])],
+            "partnership_score": stands["runs"].to_numpy(),
+            "balls": stands["balls"].to_numpy(),
+        })
+        return out.sort_values(["partnership_score", "match_id", "inning_num", "wicket_num"],
+                               ascending=[False, True, True, True], kind="stable")
@@ -0,0 +1,647 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# asyncio serving mode for the IPL MCP server.
+#
+# Serves the same /query (with limit/cursor pages and NDJSON streams),
+# /query/batch, /metrics and /stats contract as the Flask app in
+# ipl_mcp_server.py, but on one event loop: MySQL goes through an aiomysql
+# pool and the LLM through an aiohttp client session, so a request waiting
+# on either holds no thread. Once the exact and contains lookups miss, the
+# LLM call starts alongside the slower local stages (fuzzy_high, semantic),
+# which run in a worker thread, and is cancelled if one of them answers
+# first. Mapping-cache reads and writes (SQLite) also run in a worker thread.
+#
+# Templates, the gazetteer, the mapping and result caches and the analytics
+# engine are the ones ipl_mcp_server builds; their blocking loads run in a
+# worker thread. --snapshot builds the gazetteer and analytics engine from a
+# corpus snapshot (ipl_snapshot.py), as for ipl_mcp_server.py.
+#
+#   pip install aiohttp aiomysql
+#   python ipl_async_server.py --port 5000
+#
+# `python ipl_benchmark.py load` compares it with the Flask server under
+# concurrent LLM-bound traffic.
+#
+# MySQL only: serve the embedded SQLite backend (ipl_db.py) with
+# `ipl_mcp_server.py --sqlite`, where a query is a local read and there is
+# no network wait for the event loop to overlap.
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import aiohttp
+import aiomysql
+from aiohttp import web
+
+import ipl_mcp_server as server
+from ipl_analytics import AnalyticsEngine
+
+
+# Start the LLM request alongside the local stages instead of after them.
+# Ollama stops generating when the client disconnects, so a cancelled call
+# costs little; set False to only call the LLM once every earlier stage misses.
+LLM_SPECULATIVE = True
+# Stages that answer most questions with a dict lookup run before the LLM
+# request goes out, so they never cost an Ollama call or a mapping-cache
+# lookup.
+LLM_SPECULATE_AFTER = ("exact", "contains")
+
+class AsyncDataVersion:
+    """DataVersion for the event loop: one poll in flight, other callers reuse it."""
+
+    def __init__(self, pool, poll_interval=5.0):
+        self._pool = pool
+        self.poll_interval = poll_interval
+        self._lock = asyncio.Lock()
+        self._version = None
+        self._live_version = None
+        self._checked_at = None
+
+    def _stale(self):
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.poll_interval
+
+    async def current(self):
+        await self._poll()
+        return self._version
+
+    async def live(self):
+        await self._poll()
+        return self._live_version
+
+    async def _poll(self):
+        if self._stale():
+            async with self._lock:
+                if self._stale():
+                    self._version, self._live_version = await self._read()
+                    self._checked_at = time.monotonic()
+
+    async def _read(self):
+        try:
+            row = (await run_sql_async(self._pool, "SELECT version, live_version FROM data_version WHERE id = 1"))[:1]
+            return (row[0]["version"], row[0]["live_version"]) if row else (None, None)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not read data_version, result cache bypassed: {e}")
+            return None, None
+
+
+class LLMStats:
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def stats(self):
+        return {"calls": self.calls, "coalesced": llm_flight.coalesced, "cancelled": self.cancelled, "failed": self.failed}
+
+
+llm_stats = LLMStats()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines. The shared task is only cancelled when every caller waiting on it is."""
+
+    def __init__(self):
+        self._tasks = {}
+        self._waiters = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, factory):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(factory())
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._tasks.get(key) is task and self._waiters[key] == 1:
+                task.cancel()
+            raise
+        finally:
+            if self._tasks.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key, task):
+        # A cancelled task's callback can run after a new call for the key started.
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            del self._waiters[key]
+
+    def stats(self):
+        return {"calls": self.executed, "coalesced": self.coalesced, "in_flight": len(self._tasks)}
+
+
+llm_flight = AsyncSingleFlight()
+query_flight = AsyncSingleFlight()
+
+
+async def call_llm_async(session, question, timeout=None):
+    llm_stats.calls += 1
+    try:
+        async with session.post(
+            server.LLM_URL,
+            json=server.llm_payload(question),
+            timeout=aiohttp.ClientTimeout(total=timeout or server.LLM_TIMEOUT)
+        ) as response:
+            response.raise_for_status()
+            answer = ""
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                answer += chunk.get("response", "")
+                complete, mapped_question = server.parse_llm_answer(answer, final=chunk.get("done", False))
+                if complete:
+                    # Leaving the block releases the connection mid-stream,
+                    # which stops Ollama generating.
+                    break
+            else:
+                mapped_question = server.parse_llm_answer(answer, final=True)[1]
+        return await asyncio.to_thread(server.record_llm_answer, question, answer, mapped_question)
+
+    except Exception as e:
+        llm_stats.failed += 1
+        logging.error(f"⚠️ Error contacting LLM for question mapping: {e}")
+        return None
+
+
+async def question_map_async(session, question, timeout=None):
+    """question_map() over aiohttp. Cancelling the task closes the request."""
+    hit, mapped_question = await asyncio.to_thread(server.mapping_cache.get, question)
+    if hit:
+        logging.info(f"LLM mapping cache hit: {mapped_question}")
+        return mapped_question
+
+    return await llm_flight.do(
+        server.normalize_question(question),
+        lambda: call_llm_async(session, question, timeout)
+    )
+
+
+async def resolve_question_async(session, question, version, pipeline=None):
+    """resolve_question() with the LLM stage awaited instead of blocking.
+
+    With LLM_SPECULATIVE the LLM task starts once the LLM_SPECULATE_AFTER
+    stages have missed, before the rest run, and is cancelled as soon as one
+    of them answers. Those stages run in a worker thread so the LLM request
+    goes out while they match.
+    """
+    start = time.perf_counter()
+    if not server.gazetteer.is_current(version):
+        await asyncio.to_thread(server.gazetteer.ensure_loaded, server.db_pool, version)
+    delexicalized, entities = server.gazetteer.extract(question)
+    state = {"delexicalized": delexicalized}
+    steps = []
+    resolved, slots = None, None
+    pipeline = pipeline or server.RESOLUTION_PIPELINE
+
+    llm_task = None
+    llm_started = None
+    llm_budget = dict(pipeline).get("llm")
+
+    try:
+        for stage, budget_ms in pipeline:
+            if (LLM_SPECULATIVE and llm_task is None and llm_budget is not None
+                    and stage != "llm" and stage not in LLM_SPECULATE_AFTER):
+                llm_started = time.perf_counter()
+                llm_task = asyncio.create_task(question_map_async(session, question, timeout=llm_budget / 1000))
+            stage_start = time.perf_counter()
+            try:
+                if stage == "llm":
+                    if llm_task is None:
+                        llm_task = asyncio.create_task(question_map_async(session, question, timeout=budget_ms / 1000))
+                    else:
+                        # Time spent waiting on a call that was already in flight.
+                        stage_start = max(stage_start, llm_started)
+                    resolved = server.resolve_llm_answer(await llm_task, state)
+                else:
+                    resolved = await asyncio.to_thread(server.RESOLUTION_STAGES[stage], question, budget_ms, state)
+            except Exception as e:
+                logging.error(f"⚠️ Resolution stage {stage} failed: {e}")
+                resolved = None
+            resolved, slots = server.bind_stage(stage, resolved, entities)
+            server.record_step(steps, stage, budget_ms, stage_start, resolved)
+            if resolved:
+                break
+    finally:
+        if llm_task is not None and not llm_task.done():
+            llm_task.cancel()
+            llm_stats.cancelled += 1
+            logging.info(f"Cancelled LLM call, question answered at stage {steps[-1]['stage'] if steps else None}")
+
+    return server.finish_resolution(start, resolved, slots, steps)
+
+
+async def acquire_async(pool, timeout=None):
+    try:
+        return await asyncio.wait_for(pool.acquire(), timeout or server.DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise server.PoolTimeout(f"No database connection available within {timeout or server.DB_POOL_TIMEOUT}s") from None
+
+
+async def run_sql_async(pool, sql_query, params=(), timeout=None, timer=None):
+    acquire_start = time.perf_counter()
+    conn = await acquire_async(pool, timeout)
+    try:
+        execute_start = time.perf_counter()
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            # aiomysql has no server-side prepared statements; params are
+            # escaped client-side, so the SQL text itself never changes.
+            await cursor.execute(sql_query, params or None)
+            fetch_start = time.perf_counter()
+            rows = list(await cursor.fetchall())
+    except BaseException:
+        # Cancelled or failed mid-result: unread packets would corrupt the
+        # next query on this connection.
+        release_async(pool, conn, broken=True)
+        raise
+    release_async(pool, conn)
+    if timer is not None:
+        timer.add("db_connect", execute_start - acquire_start)
+        timer.add("sql_execute", fetch_start - execute_start)
+        timer.add("fetch", time.perf_counter() - fetch_start)
+    return rows
+
+
+async def stream_sql_async(conn, sql_query, params=(), batch_rows=server.STREAM_BATCH_ROWS):
+    """stream_sql() over aiomysql: execute on an unbuffered cursor and return an async iterator over its rows."""
+    cursor = await conn.cursor(aiomysql.SSDictCursor)
+    await cursor.execute(sql_query.strip().rstrip(";"), params or None)
+
+    async def rows():
+        while True:
+            batch = await cursor.fetchmany(batch_rows)
+            if not batch:
+                break
+            for row in batch:
+                yield row
+        await cursor.close()
+    return rows()
+
+
+def release_async(pool, conn, broken=False):
+    # A closed connection is dropped from the pool instead of reused.
+    if broken:
+        conn.close()
+    pool.release(conn)
+
+
+async def iterate(rows):
+    for row in rows:
+        yield row
+
+
+async def fetch_result_async(pool, sql_query, params, version, live_version=None, timer=None):
+    """fetch_result() for the event loop: cached, or one execution shared by concurrent identical requests."""
+    result = server.result_cache.get((sql_query, params), version, live_version)
+    if result is not None:
+        return result, "cache"
+
+    executed = False
+
+    async def execute():
+        nonlocal executed
+        executed = True
+        rows = await run_sql_async(pool, sql_query, params, timer=timer)
+        server.result_cache.put((sql_query, params), version, rows, live_version)
+        return rows
+
+    wait_start = time.perf_counter()
+    result = await query_flight.do((sql_query, params, version, live_version), execute)
+    if executed:
+        return result, "database"
+    if timer is not None:
+        # Time spent waiting on another request's execution.
+        timer.add("sql_execute", time.perf_counter() - wait_start)
+    return result, "coalesced"
+
+
+async def question_map_batch_async(session, questions, timeout=None):
+    """question_map_batch() over aiohttp: one LLM call for every question the mapping cache misses."""
+    mapped = {}
+    pending = []
+    for question in dict.fromkeys(questions):
+        hit, mapped_question = await asyncio.to_thread(server.mapping_cache.get, question)
+        if hit:
+            mapped[question] = mapped_question
+        else:
+            pending.append(question)
+    if len(pending) == 1:
+        mapped[pending[0]] = await question_map_async(session, pending[0], timeout=timeout)
+    elif pending:
+        llm_stats.calls += 1
+        try:
+            async with session.post(
+                server.LLM_URL,
+                json=server.batch_llm_payload(pending),
+                timeout=aiohttp.ClientTimeout(total=timeout or server.LLM_TIMEOUT)
+            ) as response:
+                response.raise_for_status()
+                answer = (await response.json()).get("response", "")
+            await asyncio.to_thread(server.record_batch_answers, pending, answer, mapped)
+        except Exception as e:
+            llm_stats.failed += 1
+            logging.error(f"❌ Error in question_map_batch: {str(e)}")
+        # Questions the model skipped stay unmapped (and uncached).
+        for question in pending:
+            mapped.setdefault(question, None)
+    return mapped
+
+
+async def resolve_batch_async(session, questions, version, pipeline=None):
+    """resolve_batch() with the shared LLM call awaited instead of blocking; local stages run in a worker thread."""
+    pipeline = pipeline or server.RESOLUTION_PIPELINE
+    if not server.gazetteer.is_current(version):
+        await asyncio.to_thread(server.gazetteer.ensure_loaded, server.db_pool, version)
+    pending, unresolved = await asyncio.to_thread(server.begin_batch, questions, pipeline)
+    if unresolved:
+        llm_start = time.perf_counter()
+        budget_ms = pipeline[server.batch_llm_split(pipeline)][1]
+        mapped = await question_map_batch_async(session, [entry["question"] for entry in unresolved], timeout=budget_ms / 1000)
+        await asyncio.to_thread(server.finish_batch, unresolved, mapped, pipeline, llm_start)
+    return [server.finish_resolution(entry["start"], entry["resolved"], entry["slots"], entry["steps"]) for entry in pending]
+
+
+def json_response(payload, status=200):
+    # Flask's provider, so dates and Decimals serialize exactly as on the
+    # threaded server.
+    return web.json_response(payload, status=status, dumps=server.app.json.dumps)
+
+
+def respond(request, body, status=200):
+    """ipl_mcp_server.respond() for aiohttp: timed as the serialize stage, with the timing breakdown on request."""
+    timer = request["timer"]
+    if request.headers.get(server.TIMING_HEADER):
+        body = dict(body, timing=timer.report())
+    with timer.stage("serialize"):
+        return json_response(body, status)
+
+
+async def ndjson_response(request, meta, rows, release=None):
+    """ipl_mcp_server.ndjson_response() for aiohttp; rows is an async iterator."""
+    dumps = server.app.json.dumps
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    count = 0
+    complete = False
+    try:
+        await response.prepare(request)
+        await response.write((dumps({"meta": meta}) + "\n").encode())
+        async for row in rows:
+            await response.write((dumps({"row": row}) + "\n").encode())
+            count += 1
+        await response.write((dumps({"end": {"rows": count}}) + "\n").encode())
+        complete = True
+    except aiomysql.Error as err:
+        logging.error(f"MySQL error while streaming: {err}")
+        await response.write((dumps({"error": str(err)}) + "\n").encode())
+    finally:
+        # A connection left with unread rows (client went away, or an
+        # error) can't be reused.
+        if release is not None:
+            release(complete)
+    await response.write_eof()
+    return response
+
+
+@web.middleware
+async def timing_middleware(request, handler):
+    request["timer"] = server.RequestTimer()
+    response = await handler(request)
+    if request.match_info.route.name in server.TIMED_ENDPOINTS:
+        server.request_metrics.observe(request["timer"], request.get("resolution"))
+    return response
+
+
+async def query(request):
+    timer = request["timer"]
+    try:
+        body = await request.json()
+    except ValueError:
+        body = {}
+    user_question = body.get("question")
+    logging.info(f"Received question: {user_question}")
+
+    if not user_question:
+        logging.warning("No question provided in request")
+        return respond(request, {"error": "No question provided"}, 400)
+
+    engine = body.get("engine", server.QUERY_ENGINE)
+    if engine not in server.QUERY_ENGINES:
+        return respond(request, {"error": f"Unknown engine {engine!r}, expected one of {list(server.QUERY_ENGINES)}"}, 400)
+
+    stream, limit, cursor_state, error = server.paging_options(body)
+    if error:
+        message, status = error
+        return respond(request, {"error": message}, status)
+    timer.add("parse", time.perf_counter() - timer.start)
+
+    app = request.app
+    version = await app["data_version"].current()
+    resolution = await resolve_question_async(app["llm_session"], user_question, version)
+    timer.add_resolution(resolution)
+    request["resolution"] = resolution
+    sql_query = resolution.pop("sql")
+    params = resolution.pop("params")
+    mapped_question = resolution["mapped_question"]
+
+    if not sql_query:
+        logging.error("Unable to map question to SQL")
+        return respond(request, {
+            "error": "Sorry, I don't understand that question yet.",
+            "resolution": resolution
+        }, 400)
+
+    try:
+        template = server.template_registry.get(resolution["template"])
+        if cursor_state is not None:
+            error = server.cursor_error(cursor_state, template, params, version)
+            if error:
+                message, status = error
+                return respond(request, {"error": message}, status)
+
+        response = {
+            "question": user_question,
+            "mapped_question": mapped_question,
+            "resolution": resolution,
+            "engine": engine
+        }
+
+        # Templates the engine doesn't implement yet still go to MySQL.
+        if engine == "analytics" and AnalyticsEngine.supports(resolution["template"]):
+            with timer.stage("analytics"):
+                result = await asyncio.to_thread(server.analytics.answer, version, resolution["template"], params)
+            logging.info(f"Answered from analytics engine for question: {user_question}")
+            if stream:
+                return await ndjson_response(request, response, iterate(result))
+            if limit is not None:
+                result = server.slice_page(result, limit, cursor_state)
+
+        elif stream:
+            live_version = await app["data_version"].live()
+            result = server.result_cache.get((sql_query, params), version, live_version)
+            if result is not None:
+                logging.info(f"Streaming cached result for question: {user_question}")
+                return await ndjson_response(request, response, iterate(result))
+            pool = app["db_pool"]
+            with timer.stage("db_connect"):
+                conn = await acquire_async(pool)
+            try:
+                with timer.stage("sql_execute"):
+                    rows = await stream_sql_async(conn, sql_query, params)
+            except BaseException:
+                release_async(pool, conn, broken=True)
+                raise
+            logging.info(f"Streaming result for question: {user_question}")
+            return await ndjson_response(request, response, rows, lambda complete: release_async(pool, conn, broken=not complete))
+
+        elif limit is not None and template.keyset:
+            live_version = await app["data_version"].live()
+            page_query, page_params = server.page_query(template, params, limit, cursor_state)
+            result, _ = await fetch_result_async(app["db_pool"], page_query, page_params, version, live_version, timer)
+
+        else:
+            live_version = await app["data_version"].live()
+            result, source = await fetch_result_async(app["db_pool"], sql_query, params, version, live_version, timer)
+            if source == "cache":
+                logging.info(f"Served cached result for question: {user_question}")
+            elif source == "coalesced":
+                logging.info(f"Shared an in-flight query's result for question: {user_question}")
+            else:
+                logging.info(f"Successfully executed query for question: {user_question}")
+            if limit is not None:
+                result = server.slice_page(result, limit, cursor_state)
+
+        if limit is not None:
+            result, response["page"] = server.page_of(result, limit, cursor_state, template, params, version)
+        response["result"] = result
+        return respond(request, response)
+
+    except server.PoolTimeout as err:
+        logging.error(f"Connection pool exhausted: {err}")
+        return respond(request, {"error": str(err)}, 503)
+
+    except aiomysql.Error as err:
+        logging.error(f"MySQL error: {err}")
+        return respond(request, {"error": str(err)}, 500)
+
+
+async def execute_query_async(app, engine, template_name, sql_query, params, version):
+    """execute_query() for the event loop. Returns (result, served_from_cache)."""
+    if engine == "analytics" and AnalyticsEngine.supports(template_name):
+        return await asyncio.to_thread(server.analytics.answer, version, template_name, params), False
+    live_version = await app["data_version"].live()
+    result, source = await fetch_result_async(app["db_pool"], sql_query, params, version, live_version)
+    return result, source == "cache"
+
+
+async def query_batch(request):
+    start = time.perf_counter()
+    try:
+        body = await request.json()
+    except ValueError:
+        body = {}
+    error = server.batch_request_error(body)
+    if error:
+        return json_response({"error": error}, 400)
+    questions = body["questions"]
+    engine = body.get("engine", server.QUERY_ENGINE)
+    logging.info(f"Received batch of {len(questions)} questions")
+
+    app = request.app
+    version = await app["data_version"].current()
+    resolutions = await resolve_batch_async(app["llm_session"], questions, version)
+    resolve_ms = (time.perf_counter() - start) * 1000
+    jobs = server.batch_jobs(resolutions)
+
+    async def run(key):
+        job_start = time.perf_counter()
+        outcome = {}
+        try:
+            outcome["result"], outcome["cached"] = await execute_query_async(app, engine, key[0], jobs[key], key[1], version)
+        except server.PoolTimeout as err:
+            logging.error(f"Connection pool exhausted: {err}")
+            outcome.update(error=str(err), status=503)
+        except aiomysql.Error as err:
+            logging.error(f"MySQL error: {err}")
+            outcome.update(error=str(err), status=500)
+        outcome["execute_ms"] = round((time.perf_counter() - job_start) * 1000, 3)
+        return outcome
+
+    execute_start = time.perf_counter()
+    outcomes = dict(zip(jobs, await asyncio.gather(*(run(key) for key in jobs))))
+    execute_ms = (time.perf_counter() - execute_start) * 1000
+    return json_response(server.batch_response(questions, resolutions, engine, jobs, outcomes, start, resolve_ms, execute_ms))
+
+
+async def metrics(request):
+    return web.Response(text=server.request_metrics.render(), headers={"Content-Type": "text/plain; version=0.0.4"})
+
+
+async def stats(request):
+    pool = request.app["db_pool"]
+    return json_response({
+        "pool": {"size": pool.size, "free": pool.freesize, "max_size": pool.maxsize},
+        "cache": server.result_cache.stats(),
+        "mapping_cache": server.mapping_cache.stats(),
+        "query_flight": query_flight.stats(),
+        "resolution": server.resolution_stats.stats(),
+        "analytics": server.analytics.stats(),
+        "llm": llm_stats.stats()
+    })
+
+
+async def db_pool_ctx(app):
+    if server.db_backend.name != "mysql":
+        raise RuntimeError(f"The async server needs MySQL, not {server.db_backend.describe()}; use ipl_mcp_server.py --sqlite")
+    config = {key: value for key, value in server.db_config.items() if key != "ssl_disabled"}
+    config["db"] = config.pop("database")
+    app["db_pool"] = await aiomysql.create_pool(
+        minsize=1, maxsize=server.DB_POOL_SIZE, autocommit=True, **config
+    )
+    app["data_version"] = AsyncDataVersion(app["db_pool"], poll_interval=server.DATA_VERSION_POLL_SECONDS)
+    yield
+    app["db_pool"].close()
+    await app["db_pool"].wait_closed()
+
+
+async def llm_session_ctx(app):
+    # One session, so LLM calls reuse keep-alive connections to Ollama.
+    app["llm_session"] = aiohttp.ClientSession()
+    yield
+    await app["llm_session"].close()
+
+
+def make_app():
+    app = web.Application(middlewares=[timing_middleware])
+    app.cleanup_ctx.append(db_pool_ctx)
+    app.cleanup_ctx.append(llm_session_ctx)
+    app.router.add_post("/query", query, name="query")
+    app.router.add_post("/query/batch", query_batch, name="query_batch")
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IPL MCP server, asyncio mode")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--snapshot", metavar="PATH",
+                        help="Build the gazetteer and analytics engine from this corpus snapshot (ipl_snapshot.py) while it is current")
+    args = parser.parse_args()
+    if args.snapshot:
+        server.use_snapshot(args.snapshot)
+    web.run_app(make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1657 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmarks for the IPL MCP server.
+#
+# Usage:
+#   python ipl_benchmark.py pool --backend sqlite --connect-latency 5
+#   python ipl_benchmark.py pool --backend mysql --threads 16 --requests 200
+#   python ipl_benchmark.py mapping --llm-latency 800 --log-size 500
+#   python ipl_benchmark.py llm --prefill-ms 1 --token-ms 60 --concurrency 8
+#   python ipl_benchmark.py semantic
+#   python ipl_benchmark.py analytics --repeat 50
+#   python ipl_benchmark.py explain
+#   python ipl_benchmark.py load --llm-latency 500 --concurrency 64 --threads 8
+#   python ipl_benchmark.py coalesce --burst 64 --rounds 10
+#   python ipl_benchmark.py suite --load --output bench.json --compare previous.json
+#   python ipl_benchmark.py live --load --interval 20
+#   python ipl_benchmark.py backends --load --sqlite ipl_bench.sqlite3
+#   python ipl_benchmark.py parse --scales 1 8 32
+#   python ipl_benchmark.py snapshot --load --output ipl_bench.snapshot
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import decimal
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import sqlite3
+import subprocess
+import statistics
+import tempfile
+import sys
+import logging
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import mysql.connector
+import pandas as pd
+import requests
+from aiohttp import web
+from rapidfuzz import process, fuzz
+
+import ipl_mcp_server as server
+import ipl_async_server as async_server
+import ipl_db
+import ipl_snapshot
+import ipl_sql_insert
+from ipl_analytics import AnalyticsEngine, fetch_tables
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, latencies, elapsed):
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "req_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3) if latencies else 0.0
+    }
+
+
+def run_concurrent(worker, threads, requests_per_thread):
+    latencies = []
+    lock = threading.Lock()
+
+    def loop():
+        local = []
+        for _ in range(requests_per_thread):
+            start = time.perf_counter()
+            worker()
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=loop) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+
+# Paraphrases users actually send, paired with the known question they mean
+# (None when nothing in the catalog answers them).
+PARAPHRASES = [
+    ("list every match", "show me all matches in the dataset"),
+    ("show all the games in the data", "show me all matches in the dataset"),
+    ("which side has the most wins", "which team won the most matches"),
+    ("team with most victories", "which team won the most matches"),
+    ("highest total score", "what was the highest total score"),
+    ("biggest team total in an innings", "what was the highest total score"),
+    ("matches held in mumbai", "show matches played in mumbai"),
+    ("games at mumbai", "show matches played in mumbai"),
+    ("top run getter", "who scored the most runs across all matches"),
+    ("most runs overall", "who scored the most runs across all matches"),
+    ("leading run scorer", "who scored the most runs across all matches"),
+    ("highest wicket taker", "which bowler took the most wickets"),
+    ("who has the most wickets", "which bowler took the most wickets"),
+    ("kohli batting record", "show me virat kohli's batting stats"),
+    ("virat kohli stats", "show me virat kohli's batting stats"),
+    ("best bowling in a match", "who has the best bowling figures in a single match"),
+    ("best bowling spell", "who has the best bowling figures in a single match"),
+    ("average score batting first", "what's the average first innings score"),
+    ("mean first innings total", "what's the average first innings score"),
+    ("highest scoring ground", "which venue has the highest scoring matches"),
+    ("which stadium sees the most runs", "which venue has the highest scoring matches"),
+    ("list of hundreds", "show me all centuries scored"),
+    ("who scored a century", "show me all centuries scored"),
+    ("biggest successful run chase", "what's the most successful chase target"),
+    ("highest run chase", "what's the most successful chase target"),
+    ("best powerplay team", "which team has the best powerplay performance"),
+    ("most runs in the powerplay", "which team has the best powerplay performance"),
+    ("csk vs mi scorecard", "show me the scorecard for match between CSK and MI"),
+    ("chennai mumbai scorecard", "show me the scorecard for match between CSK and MI"),
+    ("csk vs mi bowling card", "show me the bowling scorecard for match between CSK and MI"),
+    ("who bowled in csk vs mi", "show me the bowling scorecard for match between CSK and MI"),
+    ("sixes in the final", "how many sixes were hit in the final"),
+    ("how many maximums in the final", "how many sixes were hit in the final"),
+    ("closest finish", "what was the winning margin in the closest match"),
+    ("narrowest win", "what was the winning margin in the closest match"),
+    ("century partnerships", "show partnerships over 100 runs"),
+    ("hundred run stands", "show partnerships over 100 runs"),
+    ("who won the toss most often", None),
+    ("what is the weather in delhi", None),
+    ("most catches by a fielder", None),
+    ("who was the best umpire", None),
+    ("fastest fifty this season", None),
+]
+
+
+def question_log(size, seed=7):
+    """Replayable question log with a heavy head, like real traffic."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(PARAPHRASES))]
+    return [q for q, _ in rng.choices(PARAPHRASES, weights=weights, k=size)]
+
+
+class StubLLM:
+    """Local stand-in for Ollama's /api/generate.
+
+    Each call costs `latency_ms`, plus `prefill_ms` per prompt token the
+    model hasn't already evaluated (the prefix shared with the previous
+    prompt is reused while the model stays loaded, as llama.cpp does), plus
+    `token_ms` per generated token. Streams NDJSON unless the request sets
+    "stream": false, honours options.num_predict and options.stop, and stops
+    generating when the client disconnects. Prompts that number the known
+    questions get the number back, others the known question's text;
+    `chatty` appends the question's text after the number.
+    """
+
+    def __init__(self, latency_ms=800.0, prefill_ms=0.0, token_ms=0.0, chatty=False):
+        self.latency_ms = latency_ms
+        self.prefill_ms = prefill_ms
+        self.token_ms = token_ms
+        self.chatty = chatty
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self._last_prompt = ""
+        self._lock = threading.Lock()
+        self._answers = dict(PARAPHRASES)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = body["prompt"]
+                with stub._lock:
+                    stub.calls += 1
+                    evaluated = prompt if "keep_alive" not in body else prompt[len(os.path.commonprefix([prompt, stub._last_prompt])):]
+                    stub._last_prompt = prompt
+                    stub.prompt_tokens += count_tokens(evaluated)
+                time.sleep((stub.latency_ms + stub.prefill_ms * count_tokens(evaluated)) / 1000)
+                tokens = stub.generate(stub.answer(prompt), body.get("options", {}))
+                try:
+                    if body.get("stream", True):
+                        self.stream(body, tokens)
+                    else:
+                        time.sleep(stub.token_ms * len(tokens) / 1000)
+                        stub.count_generated(len(tokens))
+                        self.send_json({"model": body.get("model"), "response": "".join(tokens), "done": True})
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client had what it needed, or the async server cancelled the call.
+                    pass
+
+            def stream(self, body, tokens):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(stub.token_ms / 1000)
+                    self.wfile.write(json.dumps({"model": body.get("model"), "response": token, "done": False}).encode() + b"\n")
+                    self.wfile.flush()
+                    stub.count_generated(1)
+                self.wfile.write(json.dumps({"model": body.get("model"), "response": "", "done": True}).encode() + b"\n")
+
+            def send_json(self, payload):
+                payload = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}/api/generate"
+
+    def count_generated(self, tokens):
+        with self._lock:
+            self.generated_tokens += tokens
+
+    def generate(self, answer, options):
+        tokens = split_tokens(answer)
+        for stop in options.get("stop", []):
+            text = "".join(tokens)
+            if stop in text:
+                tokens = split_tokens(text[:text.index(stop)])
+        if options.get("num_predict"):
+            tokens = tokens[:options["num_predict"]]
+        return tokens
+
+    def answer(self, prompt):
+        by_number = "Reply with" in prompt and "number" in prompt
+        if "User Questions:\n" in prompt:
+            # batch_prompt_builder: numbered questions up to the next blank line.
+            numbered = prompt.split("User Questions:\n", 1)[1].split("\n\n", 1)[0].strip().splitlines()
+            return "\n".join(f"{line.split('. ', 1)[0]}. {self.reply(line.split('. ', 1)[1], by_number)}" for line in numbered)
+        return self.reply(prompt.split("User Question:\n", 1)[-1].split("\n", 1)[0].strip(), by_number)
+
+    def reply(self, question, by_number):
+        known = self.map(question)
+        if not by_number:
+            return known or "None"
+        template = server.template_registry.get(known_template(known)) if known else None
+        if template is None:
+            return "0"
+        number = server.known_questions.index(template.question) + 1
+        return f"{number}. {template.question}" if self.chatty else str(number)
+
+    def map(self, question):
+        if question in self._answers:
+            return self._answers[question]
+        match, score, _ = process.extractOne(question, server.known_questions, scorer=fuzz.token_set_ratio)
+        return match if score >= 60 else None
+
+    def stats(self):
+        return {"calls": self.calls, "prompt_tokens": self.prompt_tokens, "generated_tokens": self.generated_tokens}
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.prompt_tokens = self.generated_tokens = 0
+            self._last_prompt = ""
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def split_tokens(text):
+    """Rough llama3 tokens: numbers up to three digits, words with their leading space, punctuation."""
+    return re.findall(r"\d{1,3}|\s*[^\W\d]+|\s*[^\w\s]|\s+", text)
+
+
+def count_tokens(text):
+    return len(split_tokens(text))
+
+
+# ## Connection pool vs connect-per-request
+
+def make_connect(backend, connect_latency):
+    if backend == "mysql":
+        return lambda: mysql.connector.connect(autocommit=True, **server.db_config)
+
+    def connect():
+        # SQLite opens in microseconds; sleep to stand in for the TCP
+        # handshake and auth round-trips a MySQL connect pays.
+        time.sleep(connect_latency / 1000)
+        return sqlite3.connect(":memory:", check_same_thread=False)
+    return connect
+
+
+def bench_pool(args):
+    connect = make_connect(args.backend, args.connect_latency)
+    sql = server.map_question_to_sql("which team won the most matches") if args.backend == "mysql" else "SELECT 1"
+
+    def run_query(conn):
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        cursor.fetchall()
+        cursor.close()
+
+    def per_request():
+        conn = connect()
+        try:
+            run_query(conn)
+        finally:
+            conn.close()
+
+    pool = server.ConnectionPool(connect, size=args.pool_size, timeout=args.pool_timeout)
+
+    def pooled():
+        with pool.connection() as conn:
+            run_query(conn)
+
+    results = []
+    for name, worker in (("connect_per_request", per_request), ("pooled", pooled)):
+        latencies, elapsed = run_concurrent(worker, args.threads, args.requests)
+        results.append(summarize(name, latencies, elapsed))
+
+    pool_stats = pool.stats()
+    pool.close()
+    return {"benchmark": "pool", "backend": args.backend, "results": results, "pool": pool_stats}
+
+
+# ## LLM mapping cache
+
+def bench_mapping(args):
+    log = question_log(args.log_size)
+    results = []
+    with StubLLM(args.llm_latency) as llm, tempfile.TemporaryDirectory() as tmp:
+        server.LLM_URL = llm.url
+        # ttl=0 expires every entry immediately, i.e. the pre-cache behaviour.
+        for name, ttl in (("no_cache", 0), ("mapping_cache", 7 * 24 * 3600)):
+            server.mapping_cache = server.MappingCache(os.path.join(tmp, f"{name}.sqlite3"), server.known_questions, ttl=ttl, negative_ttl=ttl)
+            llm.calls = 0
+            latencies = []
+            start = time.perf_counter()
+            for question in log:
+                t0 = time.perf_counter()
+                server.question_map(question)
+                latencies.append(time.perf_counter() - t0)
+            summary = summarize(name, latencies, time.perf_counter() - start)
+            summary["llm_calls"] = llm.calls
+            summary["total_s"] = round(sum(latencies), 3)
+            summary["cache"] = server.mapping_cache.stats()
+            results.append(summary)
+
+    saved = results[0]["total_s"] - results[1]["total_s"]
+    return {
+        "benchmark": "mapping",
+        "log_size": len(log),
+        "distinct_phrasings": len(set(log)),
+        "llm_latency_ms": args.llm_latency,
+        "results": results,
+        "llm_calls_saved": results[0]["llm_calls"] - results[1]["llm_calls"],
+        "latency_saved_s": round(saved, 3)
+    }
+
+
+# ## LLM mapping: verbatim echo vs numbered IDs
+
+def verbatim_prompt(question):
+    """prompt_builder as it was before numbered IDs: the model echoes a known question back."""
+    options = "\n".join(f"- {q}" for q in server.known_questions)
+    return f"""You are a helpful assistant.
+
+Given the user's question below, match it to the most relevant known question from the list.
+
+Only return the matched known question exactly as it appears. If there is no suitable match, return "None".
+Words in braces such as {{player}}, {{team1}} or {{city}} are placeholders for a name in the user's question; keep them as they are.
+Only return question no extra text.
+
+User Question:
+{question}
+
+Known Questions:
+{options}
+"""
+
+
+def verbatim_map(question):
+    payload = {"model": server.LLM_MODEL, "prompt": verbatim_prompt(question), "stream": False}
+    response = requests.post(server.LLM_URL, json=payload, timeout=server.LLM_TIMEOUT)
+    response.raise_for_status()
+    answer = response.json().get("response", "").strip()
+    return None if answer.lower() == "none" else answer
+
+
+def bench_llm(args):
+    log = question_log(args.requests)
+    expected = {question: known_template(known) if known else None for question, known in PARAPHRASES}
+    results = []
+    with StubLLM(args.llm_latency, args.prefill_ms, args.token_ms, args.chatty) as llm, tempfile.TemporaryDirectory() as tmp:
+        server.LLM_URL = llm.url
+        # ttl=0: every question goes to the LLM (or joins an identical call in flight).
+        server.mapping_cache = server.MappingCache(os.path.join(tmp, "llm.sqlite3"), server.known_questions, ttl=0, negative_ttl=0)
+        logging.getLogger().setLevel(logging.WARNING)
+        for name, map_question in (("verbatim", verbatim_map), ("numbered", server.question_map)):
+            llm.reset()
+            server.llm_flight = server.SingleFlight()
+            correct = Counter()
+
+            def timed(question):
+                t0 = time.perf_counter()
+                # What the llm stage makes of the answer.
+                resolved = server.resolve_llm_answer(map_question(question), {})
+                correct[(resolved[1].name if resolved else None) == expected[question]] += 1
+                return time.perf_counter() - t0
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as executor:
+                latencies = list(executor.map(timed, log))
+            summary = summarize(name, latencies, time.perf_counter() - start)
+            summary["llm"] = llm.stats()
+            summary["coalesced"] = server.llm_flight.stats()["coalesced"] if name == "numbered" else 0
+            summary["accuracy"] = round(correct[True] / len(log), 3)
+            results.append(summary)
+
+    by_name = {r["name"]: r for r in results}
+    return {
+        "benchmark": "llm",
+        "requests": len(log),
+        "concurrency": args.concurrency,
+        "cost_model": {"latency_ms": args.llm_latency, "prefill_ms_per_token": args.prefill_ms, "ms_per_token": args.token_ms, "chatty": args.chatty},
+        "results": results,
+        "p50_speedup": round(by_name["verbatim"]["p50_ms"] / by_name["numbered"]["p50_ms"], 2) if by_name["numbered"]["p50_ms"] else None
+    }
+
+
+# ## Semantic matcher vs fuzzy matching
+
+def bench_semantic(args):
+    """Calibrate SEMANTIC_THRESHOLD on PARAPHRASES and compare the matchers that run before the LLM."""
+    server.gazetteer.ensure_loaded(server.db_pool, server.data_version.current())
+    labelled = [
+        (server.gazetteer.extract(question)[0], known_template(expected) if expected else None)
+        for question, expected in PARAPHRASES
+    ]
+    threshold = server.semantic_index.calibrate(labelled, args.precision)
+
+    def fuzzy(text):
+        match = server.fuzzy_match_question(text, threshold=server.FUZZY_HIGH_THRESHOLD)
+        return server.template_registry.lookup(match) if match else None
+
+    def semantic(text, threshold):
+        template, score = server.semantic_index.match(text)
+        return template if score >= threshold else None
+
+    matchers = [
+        ("fuzzy_high", fuzzy),
+        ("semantic", lambda text: semantic(text, server.SEMANTIC_THRESHOLD)),
+    ]
+    if threshold is not None:
+        matchers.append(("semantic_calibrated", lambda text: semantic(text, threshold)))
+
+    answerable = sum(expected is not None for _, expected in labelled)
+    results = []
+    # Silence per-question match logging while timing.
+    logging.getLogger().setLevel(logging.WARNING)
+    for name, matcher in matchers:
+        latencies, correct, wrong = [], 0, 0
+        for text, expected in labelled:
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                template = matcher(text)
+                latencies.append(time.perf_counter() - t0)
+            if template is not None:
+                if template.name == expected:
+                    correct += 1
+                else:
+                    wrong += 1
+        summary = summarize(name, latencies, sum(latencies))
+        summary.update({
+            "answered": correct + wrong,
+            "correct": correct,
+            "wrong": wrong,
+            "precision": round(correct / (correct + wrong), 3) if correct + wrong else None,
+            "recall": round(correct / answerable, 3) if answerable else None
+        })
+        results.append(summary)
+
+    # Questions the fast stages leave for the LLM, with and without the semantic stage.
+    exact = [server.template_registry.match(text) for text, _ in labelled]
+    escalated_without = sum(1 for text, hit in zip((t for t, _ in labelled), exact) if not hit and not fuzzy(text))
+    escalated_with = sum(
+        1 for text, hit in zip((t for t, _ in labelled), exact)
+        if not hit and not fuzzy(text) and not semantic(text, server.SEMANTIC_THRESHOLD)
+    )
+    return {
+        "benchmark": "semantic",
+        "questions": len(labelled),
+        "answerable": answerable,
+        "target_precision": args.precision,
+        "threshold": server.SEMANTIC_THRESHOLD,
+        "calibrated_threshold": round(threshold, 3) if threshold is not None else None,
+        "results": results,
+        "llm_escalations": {"without_semantic": escalated_without, "with_semantic": escalated_with}
+    }
+
+
+# ## In-memory analytics engine vs SQL
+
+def sample_params(engine):
+    """Slot values for the parameterized templates, taken from the loaded data."""
+    runs = engine.batting.groupby("batsman")["runs"].sum()
+    player = engine.player_ids[int(runs.idxmax())]
+    first = engine.matches.iloc[0]
+    return {
+        "player": player,
+        "city": first["city"],
+        "venue": first["venue"],
+        "team1": engine.team_ids[first["team1"]],
+        "team2": engine.team_ids[first["team2"]],
+    }
+
+
+def comparable(rows):
+    def value(v):
+        if isinstance(v, (float, decimal.Decimal)):
+            return round(float(v), 2)
+        if isinstance(v, datetime.date):
+            return v.isoformat()
+        return v
+    return [{k: value(v) for k, v in row.items()} for row in rows]
+
+
+def bench_analytics(args):
+    with server.db_pool.connection() as conn:
+        start = time.perf_counter()
+        engine = AnalyticsEngine.from_connection(conn)
+        load_s = time.perf_counter() - start
+
+        slots = sample_params(engine)
+        templates = []
+        for template in server.TEMPLATES:
+            params = tuple(slots[slot] for slot in template.params)
+            sql_rows = server.run_sql(conn, template.sql, params)
+            engine_rows = engine.answer(template.name, params)
+            expected, actual = comparable(sql_rows), comparable(engine_rows)
+
+            timings = {}
+            for name, run in (("sql", lambda: server.run_sql(conn, template.sql, params)),
+                              ("analytics", lambda: engine.answer(template.name, params))):
+                latencies = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    run()
+                    latencies.append(time.perf_counter() - t0)
+                timings[name] = {
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                    "p99_ms": round(percentile(latencies, 99) * 1000, 3)
+                }
+
+            entry = {
+                "template": template.name,
+                "rows": len(sql_rows),
+                "parity": expected == actual,
+                "sql": timings["sql"],
+                "analytics": timings["analytics"],
+                "speedup": round(timings["sql"]["p50_ms"] / timings["analytics"]["p50_ms"], 2) if timings["analytics"]["p50_ms"] else None
+            }
+            if expected != actual:
+                mismatch = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual)))
+                entry["first_mismatch"] = {
+                    "row": mismatch,
+                    "sql": expected[mismatch] if mismatch < len(expected) else None,
+                    "analytics": actual[mismatch] if mismatch < len(actual) else None
+                }
+            templates.append(entry)
+
+    return {
+        "benchmark": "analytics",
+        "load_s": round(load_s, 3),
+        "deliveries": len(engine.deliveries),
+        "repeat": args.repeat,
+        "parity_failures": [t["template"] for t in templates if not t["parity"]],
+        "templates": templates
+    }
+
+
+# ## EXPLAIN: no template full-scans a large table
+
+# teams has a row per franchise, and all_matches returns every match, so a
+# full scan is the right plan there, as it is for best_powerplay, which sums
+# every powerplay of every match and so reads one of those tables whole.
+# Anything else reading a whole table (MySQL EXPLAIN type ALL, SQLite
+# "SCAN <table>" without an index) means an index is missing.
+FULL_SCAN_ALLOWED = {"teams"}
+FULL_SCAN_EXPECTED = {"all_matches": {"match_detail"}, "best_powerplay": {"match_detail", "powerplay"}}
+
+SQL_KEYWORDS = {"on", "where", "join", "left", "group", "order", "limit", "union", "inner", "as", "using"}
+
+SQLITE_FULL_SCAN = re.compile(r"SCAN (\w+)")
+SQLITE_INDEX_SCAN = re.compile(r"SCAN (\w+) USING INDEX \w+")
+
+
+def table_aliases(sql):
+    """alias -> table for every FROM/JOIN in the statement."""
+    aliases = {}
+    for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.I):
+        aliases.setdefault(table, table)
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases.setdefault(alias, table)
+    return aliases
+
+
+def derived_names(sql):
+    """Names of the statement's CTEs (WITH x AS (...)) and derived tables ((...) AS x)."""
+    names = re.findall(r"(?:\bWITH|,)\s*(\w+)\s+AS\s*\(|\)\s*AS\s+(\w+)", sql, re.I)
+    return {name.lower() for pair in names for name in pair if name}
+
+
+def explain_plan(conn, template, params):
+    """(plan rows, tables it reads in full that the template may not).
+
+    Scans of a CTE or derived table are not counted: reading those whole is
+    how they are used, and the tables under them are checked on their own.
+    """
+    statement = template.sql.strip().rstrip(";")
+    cursor = conn.cursor(dictionary=True)
+    if isinstance(conn, ipl_db.SQLiteConnection):
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, params)
+        plan = cursor.fetchall()
+        # "SCAN md USING COVERING INDEX ..." reads only the index, like
+        # MySQL's type index. Walking a plain index visits every row as well,
+        # unless a LIMIT stops it early (highest_total's ORDER BY ... LIMIT 1).
+        patterns = [SQLITE_FULL_SCAN] if re.search(r"\bLIMIT\b", statement, re.I) else [SQLITE_FULL_SCAN, SQLITE_INDEX_SCAN]
+        scanned = [match.group(1) for row in plan for pattern in patterns for match in [pattern.fullmatch(row["detail"])] if match]
+    else:
+        cursor.execute("EXPLAIN " + statement, params)
+        plan = [{k: row[k] for k in ("table", "type", "key", "rows", "Extra")} for row in cursor.fetchall()]
+        # Derived tables and union results show up as <derived2>, <union1,2>.
+        scanned = [row["table"] for row in plan if row["type"] == "ALL" and row["table"] and not row["table"].startswith("<")]
+    cursor.close()
+    aliases, derived = table_aliases(template.sql), derived_names(template.sql)
+    allowed = FULL_SCAN_ALLOWED | FULL_SCAN_EXPECTED.get(template.name, set())
+    tables = {aliases.get(table, table) for table in scanned}
+    return plan, sorted(table for table in tables - allowed if table.lower() not in derived)
+
+
+def sql_sample_params(cursor):
+    cursor.execute("SELECT player_id FROM player_match_batting GROUP BY player_id ORDER BY SUM(runs) DESC LIMIT 1")
+    player = cursor.fetchone()["player_id"]
+    cursor.execute("SELECT city, venue, team1_id, team2_id FROM match_detail ORDER BY match_date LIMIT 1")
+    match = cursor.fetchone()
+    return {"player": player, "city": match["city"], "venue": match["venue"],
+            "team1": match["team1_id"], "team2": match["team2_id"]}
+
+
+def check_explain(args):
+    failures = []
+    templates = []
+    backend = ipl_db.SQLiteBackend(args.sqlite) if args.sqlite else server.db_backend
+    conn = backend.connect(autocommit=True, read_only=True)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        slots = sql_sample_params(cursor)
+        cursor.close()
+        for template in server.TEMPLATES:
+            params = tuple(slots[slot] for slot in template.params)
+            plan, full_scans = explain_plan(conn, template, params)
+            templates.append({"template": template.name, "plan": plan, "full_scans": full_scans})
+            if full_scans:
+                failures.append(template.name)
+    finally:
+        conn.close()
+    return {"benchmark": "explain", "backend": backend.describe(), "failures": failures, "templates": templates}
+
+
+# ## Load test: threaded Flask vs asyncio server
+
+class FlaskServer:
+    """The Flask app on a fixed pool of request threads, as one launcher worker runs it."""
+
+    def __init__(self, threads):
+        self._server = server.ThreadPoolWSGIServer("127.0.0.1", 0, server.app, threads)
+        self.url = f"http://127.0.0.1:{self._server.server_port}/query"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class AsyncServer:
+    """ipl_async_server's app on its own event loop in a background thread."""
+
+    def __enter__(self):
+        self._loop = asyncio.new_event_loop()
+        self._runner = web.AppRunner(async_server.make_app(), access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        self.url = f"http://127.0.0.1:{self._runner.addresses[0][1]}/query"
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+async def drive(url, questions, concurrency):
+    """POST every question with at most `concurrency` requests in flight."""
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = Counter()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async def send(question):
+            async with slots:
+                t0 = time.perf_counter()
+                async with session.post(url, json={"question": question}) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+                latencies.append(time.perf_counter() - t0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(question) for question in questions))
+        return latencies, time.perf_counter() - start, statuses
+
+
+def bench_load(args):
+    log = question_log(args.requests)
+    servers = {"flask": lambda: FlaskServer(args.threads), "async": AsyncServer}
+    targets = [("url", None)] if args.url else [(name, servers[name]) for name in args.serve]
+    # Per-request INFO logs would dominate at these rates.
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    results = []
+    with StubLLM(args.llm_latency) as llm, tempfile.TemporaryDirectory() as tmp:
+        server.LLM_URL = llm.url
+        for name, make_server in targets:
+            # ttl=0: every paraphrase that reaches the LLM stage pays for it.
+            server.mapping_cache = server.MappingCache(os.path.join(tmp, f"{name}.sqlite3"), server.known_questions, ttl=0, negative_ttl=0)
+            llm.calls = 0
+            async_server.llm_stats = async_server.LLMStats()
+            if make_server is None:
+                latencies, elapsed, statuses = asyncio.run(drive(args.url, log, args.concurrency))
+            else:
+                with make_server() as target:
+                    latencies, elapsed, statuses = asyncio.run(drive(target.url, log, args.concurrency))
+            summary = summarize(name, latencies, elapsed)
+            summary["statuses"] = dict(statuses)
+            summary["llm_calls"] = llm.calls
+            if name == "async":
+                summary["llm_cancelled"] = async_server.llm_stats.cancelled
+            results.append(summary)
+
+    by_name = {r["name"]: r for r in results}
+    return {
+        "benchmark": "load",
+        "llm_latency_ms": args.llm_latency,
+        "concurrency": args.concurrency,
+        "threads": args.threads,
+        # The most a fixed thread pool can serve when every request waits on the LLM.
+        "thread_bound_req_per_s": round(args.threads / (args.llm_latency / 1000), 1) if args.llm_latency else None,
+        "results": results,
+        "async_vs_flask": round(by_name["async"]["req_per_s"] / by_name["flask"]["req_per_s"], 2)
+        if "async" in by_name and "flask" in by_name and by_name["flask"]["req_per_s"] else None
+    }
+
+
+# ## Coalescing: bursts of one question
+
+class NoFlight:
+    """SingleFlight with coalescing switched off: every caller runs its own call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            self.calls += 1
+        return fn()
+
+    def stats(self):
+        return {"calls": self.calls, "coalesced": 0, "in_flight": 0}
+
+
+class AsyncNoFlight(NoFlight):
+    async def do(self, key, factory):
+        self.calls += 1
+        return await factory()
+
+
+# Answered at the exact stage, and a paraphrase that needs the LLM.
+BURST_QUESTIONS = ["which team won the most matches", "most runs overall"]
+
+
+def bench_coalesce(args):
+    servers = {"flask": lambda: FlaskServer(args.threads), "async": AsyncServer}
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    results = []
+    with StubLLM(args.llm_latency) as llm, tempfile.TemporaryDirectory() as tmp:
+        server.LLM_URL = llm.url
+        for name in args.serve:
+            for coalescing in (False, True):
+                if coalescing:
+                    server.query_flight, server.llm_flight = server.SingleFlight(), server.SingleFlight()
+                    async_server.query_flight, async_server.llm_flight = async_server.AsyncSingleFlight(), async_server.AsyncSingleFlight()
+                else:
+                    server.query_flight, server.llm_flight = NoFlight(), NoFlight()
+                    async_server.query_flight, async_server.llm_flight = AsyncNoFlight(), AsyncNoFlight()
+                # ttl=0: the LLM question reaches the LLM in every burst.
+                server.mapping_cache = server.MappingCache(os.path.join(tmp, f"{name}-{coalescing}.sqlite3"), server.known_questions, ttl=0, negative_ttl=0)
+                llm.calls = 0
+                latencies, elapsed, statuses = [], 0.0, Counter()
+                with servers[name]() as target:
+                    for round_ in range(args.rounds):
+                        # Every burst starts cold, like the first requests after an ingest.
+                        server.result_cache.clear()
+                        question = BURST_QUESTIONS[round_ % len(BURST_QUESTIONS)]
+                        burst_latencies, burst_elapsed, burst_statuses = asyncio.run(drive(target.url, [question] * args.burst, args.burst))
+                        latencies += burst_latencies
+                        elapsed += burst_elapsed
+                        statuses.update(burst_statuses)
+                flights = (async_server if name == "async" else server)
+                summary = summarize(f"{name}{'' if coalescing else '_uncoalesced'}", latencies, elapsed)
+                summary["statuses"] = dict(statuses)
+                summary["sql_executions"] = flights.query_flight.stats()["calls"]
+                summary["sql_coalesced"] = flights.query_flight.stats()["coalesced"]
+                summary["llm_calls"] = llm.calls
+                summary["llm_coalesced"] = flights.llm_flight.stats()["coalesced"]
+                results.append(summary)
+
+    return {
+        "benchmark": "coalesce",
+        "burst": args.burst,
+        "rounds": args.rounds,
+        "llm_latency_ms": args.llm_latency,
+        "results": results
+    }
+
+
+# ## Suite: SQL, resolution and end-to-end, comparable across runs
+
+# Metrics where a bigger number is better; everything else is a latency.
+HIGHER_IS_BETTER = ("req_per_s", "accuracy")
+
+
+def load_bench_database(database, data_dir):
+    """Recreate `database` from tables.sql and load data_dir into it."""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables.sql")) as f:
+        ddl = re.sub(r"\bipl_data\b", database, f.read())
+    statements = [
+        statement.strip() for statement in re.sub(r"(?m)^\s*--.*$", "", ddl).split(";")
+        if statement.strip()
+    ]
+    config = {k: v for k, v in server.db_config.items() if k != "database"}
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor()
+    for statement in statements:
+        cursor.execute(statement)
+    cursor.close()
+    start = time.perf_counter()
+    # The loader reports per file on stdout, which carries the results.
+    with contextlib.redirect_stdout(sys.stderr):
+        loaded = ipl_sql_insert.load_directory(conn, data_dir)
+    conn.close()
+    return {"database": database, "files": loaded, "load_s": round(time.perf_counter() - start, 3)}
+
+
+def use_database(database):
+    """Point the server's pool and every cache built on it at another database."""
+    server.db_config = dict(server.db_config, database=database)
+    server.db_backend = ipl_db.MySQLBackend(server.db_config)
+    server.db_pool.close()
+    server.data_version = server.DataVersion(server.db_pool, poll_interval=server.DATA_VERSION_POLL_SECONDS)
+    server.result_cache.clear()
+    server.gazetteer = server.Gazetteer(stopwords=server.template_registry.vocabulary())
+    server.analytics = server.AnalyticsSnapshot(server.db_pool)
+
+
+def suite_sql(repeat):
+    templates = []
+    with server.db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        slots = sql_sample_params(cursor)
+        cursor.close()
+        for template in server.TEMPLATES:
+            params = tuple(slots[slot] for slot in template.params)
+            rows = server.run_sql(conn, template.sql, params)
+            latencies = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                server.run_sql(conn, template.sql, params)
+                latencies.append(time.perf_counter() - t0)
+            summary = summarize(template.name, latencies, sum(latencies))
+            summary["rows"] = len(rows)
+            templates.append(summary)
+    return templates
+
+
+def known_template(question):
+    """The template a known question from PARAPHRASES stands for, without the LLM."""
+    delexicalized = server.gazetteer.extract(question)[0]
+    template = server.template_registry.match(question) or server.template_registry.match(delexicalized)
+    if template is None:
+        # Its entity may not be in the loaded data ("virat kohli" vs "V Kohli").
+        match = server.fuzzy_match_question(delexicalized, threshold=server.FUZZY_HIGH_THRESHOLD)
+        template = server.template_registry.lookup(match) if match else None
+    return template.name if template else None
+
+
+def suite_resolution(repeat):
+    """Resolve every paraphrase, timing it and checking it reached the template it means."""
+    questions = []
+    latencies = []
+    by_stage = Counter()
+    correct = 0
+    server.gazetteer.ensure_loaded(server.db_pool, server.data_version.current())
+    for question, expected in PARAPHRASES:
+        expected_template = known_template(expected) if expected else None
+        times = []
+        for _ in range(repeat):
+            resolution = server.resolve_question(question)
+            times.append(resolution["elapsed_ms"] / 1000)
+        latencies.extend(times)
+        by_stage[resolution["stage"] or "unresolved"] += 1
+        correct += resolution["template"] == expected_template
+        questions.append({
+            "question": question,
+            "expected": expected_template,
+            "template": resolution["template"],
+            "stage": resolution["stage"],
+            "p50_ms": round(percentile(times, 50) * 1000, 3)
+        })
+    summary = summarize("resolution", latencies, sum(latencies))
+    summary["accuracy"] = round(correct / len(PARAPHRASES), 4)
+    summary["by_stage"] = dict(by_stage)
+    summary["questions"] = questions
+    return summary
+
+
+def flatten_metrics(sql, resolution, e2e):
+    metrics = {}
+    for template in sql:
+        metrics[f"sql.{template['name']}.p50_ms"] = template["p50_ms"]
+        metrics[f"sql.{template['name']}.p99_ms"] = template["p99_ms"]
+    for key in ("p50_ms", "p99_ms", "mean_ms", "accuracy"):
+        metrics[f"resolution.{key}"] = resolution[key]
+    for key in ("req_per_s", "p50_ms", "p99_ms"):
+        metrics[f"e2e.{key}"] = e2e[key]
+    return metrics
+
+
+def compare_metrics(baseline, current, threshold_pct, min_delta_ms=0.0):
+    changes = []
+    for name, after in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change_pct = round((after - before) / before * 100, 1) if before else 0.0
+        worse = -change_pct if name.endswith(HIGHER_IS_BETTER) else change_pct
+        # A few percent of a sub-millisecond query is timer noise.
+        noise = name.endswith("_ms") and abs(after - before) < min_delta_ms
+        changes.append({
+            "metric": name,
+            "before": before,
+            "after": after,
+            "change_pct": change_pct,
+            "regression": worse > threshold_pct and not noise
+        })
+    return changes
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(args):
+    setup = None
+    if args.load:
+        setup = load_bench_database(args.database, args.data_dir)
+    if args.load or args.database != server.db_config["database"]:
+        use_database(args.database)
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    with StubLLM(args.llm_latency) as llm, tempfile.TemporaryDirectory() as tmp:
+        server.LLM_URL = llm.url
+        sql = suite_sql(args.repeat)
+
+        # ttl=0: every paraphrase that reaches the LLM stage pays for it.
+        server.mapping_cache = server.MappingCache(os.path.join(tmp, "resolution.sqlite3"), server.known_questions, ttl=0, negative_ttl=0)
+        llm.calls = 0
+        resolution = suite_resolution(args.resolution_repeat)
+        resolution["llm_calls"] = llm.calls
+
+        # End to end with a cold mapping cache and result cache, as after a deploy.
+        server.mapping_cache = server.MappingCache(os.path.join(tmp, "e2e.sqlite3"), server.known_questions)
+        server.result_cache.clear()
+        llm.calls = 0
+        with FlaskServer(args.threads) as target:
+            latencies, elapsed, statuses = asyncio.run(drive(target.url, question_log(args.requests), args.concurrency))
+        e2e = summarize("e2e", latencies, elapsed)
+        e2e["statuses"] = dict(statuses)
+        e2e["llm_calls"] = llm.calls
+
+    metrics = flatten_metrics(sql, resolution, e2e)
+    result = {
+        "benchmark": "suite",
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count()
+        },
+        "config": {
+            "database": args.database,
+            "llm_latency_ms": args.llm_latency,
+            "repeat": args.repeat,
+            "resolution_repeat": args.resolution_repeat,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "threads": args.threads
+        },
+        "setup": setup,
+        "metrics": metrics,
+        "sql": sql,
+        "resolution": resolution,
+        "e2e": e2e
+    }
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            logging.warning("⚠️ Baseline was run with a different config; deltas may not be meaningful")
+        changes = compare_metrics(baseline["metrics"], metrics, args.threshold, args.min_delta_ms)
+        result["comparison"] = {
+            "baseline": args.compare,
+            "baseline_revision": baseline.get("meta", {}).get("revision"),
+            "threshold_pct": args.threshold,
+            "min_delta_ms": args.min_delta_ms,
+            "regressions": [c["metric"] for c in changes if c["regression"]],
+            "changes": changes
+        }
+        if args.fail_on_regression:
+            result["failures"] = result["comparison"]["regressions"]
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+    return result
+
+
+# ## Live: ball-to-query freshness for a match fed ball by ball
+
+def scorecard_balls(match_id, teams):
+    """Balls faced in the match so far, as the scorecard template serves it."""
+    template = next(t for t in server.TEMPLATES if t.name == "scorecard")
+    params = tuple(teams[slot] for slot in template.params)
+    rows, _ = server.fetch_result(template.sql, params, server.data_version.current())
+    return sum(row["balls_faced"] for row in rows if row["match_id"] == match_id)
+
+
+def bench_live(args):
+    setup = None
+    if args.load:
+        setup = load_bench_database(args.database, args.data_dir)
+    use_database(args.database)
+    server.data_version.poll_interval = args.version_poll
+    logging.getLogger().setLevel(logging.WARNING)
+
+    paths = sorted(os.path.join(args.data_dir, f) for f in os.listdir(args.data_dir) if f.endswith(".json"))
+    path = paths[args.match % len(paths)]
+    match_id = os.path.basename(path)[:-len(".json")]
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    events = list(ipl_sql_insert.feed_events(match_id, data))
+    teams = dict(zip(("team1", "team2"), (ipl_sql_insert.make_team_id(team) for team in data["info"]["teams"])))
+
+    config = dict(server.db_config)
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor()
+
+    # Baseline: what a ball costs if every one reloads the whole match.
+    reloads = []
+    for _ in range(args.reloads):
+        t0 = time.perf_counter()
+        ipl_sql_insert.delete_match(cursor, match_id)
+        ipl_sql_insert.insert_match(cursor, ipl_sql_insert.match_rows(match_id, data))
+        ipl_sql_insert.refresh_match_aggregates(cursor, match_id)
+        ipl_sql_insert.bump_data_version(cursor)
+        conn.commit()
+        reloads.append(time.perf_counter() - t0)
+    ipl_sql_insert.delete_match(cursor, match_id)
+    ipl_sql_insert.bump_data_version(cursor)
+    conn.commit()
+    cursor.close()
+
+    # Balls faced the scorecard should show once each line is loaded (every
+    # delivery counts, as in player_match_batting), and when it was written.
+    expected, written = [], {}
+    balls_faced = 0
+    for event in events:
+        balls_faced += "delivery" in event
+        expected.append(balls_faced)
+
+    stop = threading.Event()
+    with tempfile.TemporaryDirectory() as tmp:
+        feed_path = os.path.join(tmp, "feed.jsonl")
+        open(feed_path, "w").close()
+        follower_conn = mysql.connector.connect(**config)
+        with contextlib.redirect_stdout(sys.stderr):
+            follower = threading.Thread(
+                target=ipl_sql_insert.follow_live, args=(follower_conn, feed_path),
+                kwargs={"poll_seconds": args.feed_poll, "stop": stop}, daemon=True)
+            follower.start()
+
+            def write():
+                with open(feed_path, "a", encoding="utf-8") as feed:
+                    for event, count in zip(events, expected):
+                        feed.write(json.dumps(event) + "\n")
+                        feed.flush()
+                        written.setdefault(count, time.perf_counter())
+                        time.sleep(args.interval / 1000)
+
+            writer = threading.Thread(target=write, daemon=True)
+            writer.start()
+            freshness, queries, seen = [], 0, 0
+            deadline = time.perf_counter() + len(events) * args.interval / 1000 + args.timeout
+            while seen < balls_faced and time.perf_counter() < deadline:
+                current = scorecard_balls(match_id, teams)
+                queries += 1
+                now = time.perf_counter()
+                for count in range(seen + 1, current + 1):
+                    freshness.append(now - written[count])
+                seen = max(seen, current)
+                time.sleep(args.query_interval / 1000)
+            writer.join()
+            stop.set()
+            follower.join()
+        follower_conn.close()
+
+    summary = summarize("ball_to_query", freshness, sum(freshness))
+    del summary["req_per_s"]
+    return {
+        "benchmark": "live",
+        "match_id": match_id,
+        "setup": setup,
+        "deliveries": balls_faced,
+        "balls_faced": balls_faced,
+        "balls_seen": seen,
+        "interval_ms": args.interval,
+        "feed_poll_ms": args.feed_poll * 1000,
+        "version_poll_ms": args.version_poll * 1000,
+        "queries": queries,
+        "freshness": summary,
+        "full_reload": summarize("full_reload", reloads, sum(reloads)),
+        "result_cache": server.result_cache.stats()
+    }
+
+
+# ## Backends: the embedded SQLite file against MySQL
+
+def load_sqlite_database(path, data_dir):
+    """Recreate the SQLite file at `path` and load data_dir into it."""
+    for suffix in ("", "-wal", "-shm"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + suffix)
+    backend = ipl_db.SQLiteBackend(path)
+    conn = backend.connect(create=True)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        loaded = ipl_sql_insert.load_directory(conn, data_dir)
+    backend.analyze(conn)
+    conn.close()
+    return {"path": path, "files": loaded, "load_s": round(time.perf_counter() - start, 3)}
+
+
+def result_set(rows):
+    """comparable() rows with every number as a float, for comparing backends.
+
+    MySQL returns SUM() and ROUND() as Decimal where SQLite returns int or
+    float, and only the values have to agree.
+    """
+    return [repr([(k, float(v) if isinstance(v, (int, float)) else v) for k, v in row.items()]) for row in comparable(rows)]
+
+
+def bench_backends(args):
+    setup = None
+    if args.load:
+        setup = {
+            "mysql": load_bench_database(args.database, args.data_dir),
+            "sqlite": load_sqlite_database(args.sqlite, args.data_dir)
+        }
+    use_database(args.database)
+    backends = {"mysql": server.db_backend, "sqlite": ipl_db.SQLiteBackend(args.sqlite)}
+
+    # Connecting is what a cold worker pays before its first query.
+    conns, connect_ms = {}, {}
+    for name, backend in backends.items():
+        t0 = time.perf_counter()
+        conns[name] = backend.connect(autocommit=True, read_only=True)
+        connect_ms[name] = round((time.perf_counter() - t0) * 1000, 3)
+
+    cursor = conns["mysql"].cursor(dictionary=True)
+    slots = sql_sample_params(cursor)
+    cursor.close()
+
+    templates = []
+    for template in server.TEMPLATES:
+        params = tuple(slots[slot] for slot in template.params)
+        results, timings = {}, {}
+        for name, conn in conns.items():
+            results[name] = result_set(server.run_sql(conn, template.sql, params))
+            latencies = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                server.run_sql(conn, template.sql, params)
+                latencies.append(time.perf_counter() - t0)
+            timings[name] = {
+                "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 3)
+            }
+
+        expected, actual = results["mysql"], results["sqlite"]
+        entry = {
+            "template": template.name,
+            "rows": len(expected),
+            # Rows that tie on the ORDER BY may come back in either order.
+            "parity": sorted(expected) == sorted(actual),
+            "same_order": expected == actual,
+            "mysql": timings["mysql"],
+            "sqlite": timings["sqlite"],
+            "speedup": round(timings["mysql"]["p50_ms"] / timings["sqlite"]["p50_ms"], 2) if timings["sqlite"]["p50_ms"] else None
+        }
+        if not entry["parity"]:
+            entry["only_mysql"] = sorted(set(expected) - set(actual))[:5]
+            entry["only_sqlite"] = sorted(set(actual) - set(expected))[:5]
+        templates.append(entry)
+
+    for conn in conns.values():
+        conn.close()
+    failures = [t["template"] for t in templates if not t["parity"]]
+    return {
+        "benchmark": "backends",
+        "database": args.database,
+        "sqlite": os.path.abspath(args.sqlite),
+        "setup": setup,
+        "connect_ms": connect_ms,
+        "repeat": args.repeat,
+        "parity_failures": failures,
+        "failures": failures,
+        "templates": templates
+    }
+
+
+# ## Parse: streaming parser against json.load per file
+
+def merged_parts(parts):
+    """stream_match() parts joined back into one parse_match()-shaped dict."""
+    merged = None
+    for part in parts:
+        if merged is None:
+            merged = {table: list(rows) if isinstance(rows, list) else rows for table, rows in part.items()}
+            continue
+        for table, rows in part.items():
+            if isinstance(rows, list):
+                merged[table].extend(rows)
+    return merged
+
+
+def long_match(data, copies):
+    """The match with each innings' overs played `copies` times over, as a stand-in for a much longer file."""
+    innings = []
+    for inning in data.get("innings", []):
+        overs = inning.get("overs", [])
+        step = max((over["over"] for over in overs), default=0) + 1
+        innings.append({**inning, "overs": [{**over, "over": over["over"] + copy * step}
+                                             for copy in range(copies) for over in overs]})
+    return {**data, "innings": innings}
+
+
+def max_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def parse_peak(path, stream):
+    """Peak memory of parsing one file, measured in a fresh process.
+
+    The peak RSS growth is from an untraced run; the Python heap peak comes
+    from a second, traced run.
+    """
+    def parse():
+        if stream:
+            for part in ipl_sql_insert.stream_match(path):
+                del part
+        else:
+            ipl_sql_insert.parse_match(path)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        before = max_rss_bytes()
+        parse()
+        rss_growth = max_rss_bytes() - before
+        tracemalloc.start()
+        parse()
+        heap_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return rss_growth, heap_peak
+
+
+def bench_parse(args):
+    paths = [os.path.join(args.data_dir, f) for f in sorted(os.listdir(args.data_dir)) if f.endswith(".json")]
+    mib = lambda n: round(n / 2**20, 2)
+
+    # The streamed parts add up to parse_match()'s rows, even when every
+    # value straddles a chunk boundary.
+    mismatches = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in paths:
+            expected = ipl_sql_insert.parse_match(path)
+            if (merged_parts(ipl_sql_insert.stream_match(path)) != expected or
+                    merged_parts(ipl_sql_insert.stream_match(path, batch_rows=7, chunk_bytes=13)) != expected):
+                mismatches.append(os.path.basename(path))
+
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    with contextlib.redirect_stdout(io.StringIO()):
+        deliveries = sum(len(ipl_sql_insert.parse_match(path)["deliveries"]) for path in paths)
+    throughput = {}
+    for name, parse in (
+        ("json_load", ipl_sql_insert.parse_match),
+        ("stream", lambda path: deque(ipl_sql_insert.stream_match(path), maxlen=0)),
+    ):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for path in paths:
+                    parse(path)
+            elapsed = (time.perf_counter() - start) / args.repeat
+        throughput[name] = {
+            "ms_per_file": round(elapsed * 1000 / len(paths), 3),
+            "files_per_s": round(len(paths) / elapsed, 1),
+            "deliveries_per_s": round(deliveries / elapsed),
+            "mib_per_s": round(total_bytes / 2**20 / elapsed, 2)
+        }
+
+    # Peak memory per worker as one file grows: each measurement runs in a
+    # fresh process so earlier peaks don't hide later ones.
+    with open(paths[0], "rb") as f:
+        data = json.loads(f.read())
+    memory = []
+    with tempfile.TemporaryDirectory() as tmp, \
+            ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                max_tasks_per_child=1) as pool:
+        for copies in args.scales:
+            path = os.path.join(tmp, f"{os.path.basename(paths[0])[:-5]}.json")
+            with open(path, "w") as f:
+                json.dump(long_match(data, copies), f, indent=2)
+            entry = {"copies": copies, "file_mib": mib(os.path.getsize(path))}
+            for name, stream in (("json_load", False), ("stream", True)):
+                rss_growth, heap_peak = pool.submit(parse_peak, path, stream).result()
+                entry[name] = {"peak_rss_growth_mib": mib(rss_growth), "peak_heap_mib": mib(heap_peak)}
+            memory.append(entry)
+
+    # A file shorter than one part is parsed in one go by both paths, so
+    # flatness is judged between the two longest files.
+    previous, longest = memory[-2:] if len(memory) > 1 else memory * 2
+    growth = {
+        "file": round(longest["file_mib"] / previous["file_mib"], 2),
+        **{name: round(longest[name]["peak_heap_mib"] / previous[name]["peak_heap_mib"], 2)
+           for name in ("json_load", "stream")}
+    }
+    failures = [f"parity:{name}" for name in mismatches]
+    if growth["stream"] > args.max_growth:
+        failures.append(f"stream peak heap grew {growth['stream']}x for a {growth['file']}x longer file")
+    return {
+        "benchmark": "parse",
+        "files": len(paths),
+        "deliveries": deliveries,
+        "mib": mib(total_bytes),
+        "repeat": args.repeat,
+        "parity_failures": mismatches,
+        "throughput": throughput,
+        "stream_slowdown": round(throughput["stream"]["ms_per_file"] / throughput["json_load"]["ms_per_file"], 2),
+        "memory": memory,
+        "peak_heap_growth": growth,
+        "failures": failures
+    }
+
+
+# ## Snapshot: startup from the mapped corpus snapshot against SQL
+
+def snapshot_startup(backend, snapshot_path):
+    """Gazetteer and analytics engine built in a fresh process, from SQL or from the snapshot."""
+    server.use_backend(backend)
+    before = server.memory_usage()
+    start = time.perf_counter()
+    if snapshot_path:
+        server.use_snapshot(snapshot_path)
+    version = server.data_version.current()
+    server.gazetteer.ensure_loaded(server.db_pool, version)
+    gazetteer_at = time.perf_counter()
+    server.analytics.get(version)
+    done = time.perf_counter()
+    after = server.memory_usage()
+    return {
+        "source": server.analytics.stats()["source"],
+        "gazetteer_ms": (gazetteer_at - start) * 1000,
+        "analytics_ms": (done - gazetteer_at) * 1000,
+        "startup_ms": (done - start) * 1000,
+        "rss_growth_mib": (after["rss_bytes"] - before["rss_bytes"]) / 2**20,
+        "private_growth_mib": (after["private_bytes"] - before["private_bytes"]) / 2**20
+    }
+
+
+def bench_snapshot(args):
+    setup = None
+    if args.sqlite:
+        if args.load:
+            setup = load_sqlite_database(args.sqlite, args.data_dir)
+        backend = ipl_db.SQLiteBackend(args.sqlite)
+        server.use_backend(backend)
+    else:
+        if args.load:
+            setup = load_bench_database(args.database, args.data_dir)
+        use_database(args.database)
+        backend = server.db_backend
+
+    with server.db_pool.connection() as conn:
+        start = time.perf_counter()
+        version, nbytes = ipl_snapshot.export_snapshot(conn, args.output)
+        export_s = time.perf_counter() - start
+        expected_tables = fetch_tables(conn)
+    snapshot = ipl_snapshot.Snapshot(args.output)
+
+    # The snapshot must rebuild exactly what SQL does: the tables, the
+    # gazetteer and every template's answer.
+    mismatches = []
+    actual_tables = snapshot.tables()
+    for name, expected in expected_tables.items():
+        try:
+            pd.testing.assert_frame_equal(expected, actual_tables[name], check_dtype=False)
+        except AssertionError:
+            mismatches.append(f"table:{name}")
+    from_sql, from_snapshot = server.Gazetteer(), server.Gazetteer()
+    from_sql.load(server.db_pool)
+    server.use_snapshot(args.output)
+    from_snapshot.load(server.db_pool, version)
+    server.corpus_snapshot = None
+    if from_sql._names != from_snapshot._names:
+        mismatches.append("gazetteer")
+    sql_engine, snapshot_engine = AnalyticsEngine(expected_tables), AnalyticsEngine(actual_tables)
+    slots = sample_params(sql_engine)
+    for template in server.TEMPLATES:
+        params = tuple(slots[slot] for slot in template.params)
+        if comparable(sql_engine.answer(template.name, params)) != comparable(snapshot_engine.answer(template.name, params)):
+            mismatches.append(f"template:{template.name}")
+
+    # The tables alone: every row through the driver against the mapping.
+    tables_ms = {}
+    with server.db_pool.connection() as conn:
+        for name, load in (("database", lambda: fetch_tables(conn)),
+                           ("snapshot", lambda: ipl_snapshot.Snapshot(args.output).tables())):
+            latencies = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                load()
+                latencies.append(time.perf_counter() - t0)
+            tables_ms[name] = {"p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                               "p99_ms": round(percentile(latencies, 99) * 1000, 3)}
+
+    # Whole startup, each in a fresh process so nothing is already built
+    # or imported-and-warm; medians over --starts processes.
+    startup = {}
+    context = multiprocessing.get_context("spawn")
+    for name, snapshot_path in (("database", None), ("snapshot", args.output)):
+        runs = []
+        for _ in range(args.starts):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                runs.append(pool.submit(snapshot_startup, backend, snapshot_path).result())
+        startup[name] = {"source": runs[0]["source"],
+                         **{metric: round(statistics.median(run[metric] for run in runs), 3)
+                            for metric in runs[0] if metric != "source"}}
+        if runs[0]["source"] != name:
+            mismatches.append(f"startup:{name} loaded from {runs[0]['source']}")
+
+    return {
+        "benchmark": "snapshot",
+        "backend": backend.describe(),
+        "setup": setup,
+        "snapshot": snapshot.describe(),
+        "data_version": version,
+        "snapshot_mib": round(nbytes / 2**20, 3),
+        "export_s": round(export_s, 3),
+        "rows": {name: table["rows"] for name, table in snapshot.header["tables"].items()},
+        "repeat": args.repeat,
+        "tables_ms": tables_ms,
+        "tables_speedup": round(tables_ms["database"]["p50_ms"] / tables_ms["snapshot"]["p50_ms"], 1) if tables_ms["snapshot"]["p50_ms"] else None,
+        "starts": args.starts,
+        "startup": startup,
+        "startup_speedup": round(startup["database"]["startup_ms"] / startup["snapshot"]["startup_ms"], 1) if startup["snapshot"]["startup_ms"] else None,
+        "parity_failures": mismatches,
+        "failures": mismatches
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IPL MCP server benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pool = sub.add_parser("pool", help="Connection pool vs connect-per-request")
+    pool.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    pool.add_argument("--connect-latency", type=float, default=5.0,
+                      help="Simulated connect cost in ms for the sqlite stand-in")
+    pool.add_argument("--threads", type=int, default=8)
+    pool.add_argument("--requests", type=int, default=200, help="Requests per thread")
+    pool.add_argument("--pool-size", type=int, default=server.DB_POOL_SIZE)
+    pool.add_argument("--pool-timeout", type=float, default=server.DB_POOL_TIMEOUT)
+    pool.set_defaults(func=bench_pool)
+
+    mapping = sub.add_parser("mapping", help="Replay a question log through question_map with and without the mapping cache")
+    mapping.add_argument("--llm-latency", type=float, default=800.0, help="Stub LLM response time in ms")
+    mapping.add_argument("--log-size", type=int, default=500)
+    mapping.set_defaults(func=bench_mapping)
+
+    llm = sub.add_parser("llm", help="Verbatim-echo LLM mapping vs numbered IDs with streaming early stop, keep_alive and coalescing")
+    llm.add_argument("--llm-latency", type=float, default=20.0, help="Fixed stub cost per call in ms")
+    llm.add_argument("--prefill-ms", type=float, default=1.0, help="Stub cost per prompt token not already cached, in ms")
+    llm.add_argument("--token-ms", type=float, default=60.0, help="Stub cost per generated token, in ms")
+    llm.add_argument("--chatty", action="store_true", help="Stub follows each number with the question's text")
+    llm.add_argument("--requests", type=int, default=200)
+    llm.add_argument("--concurrency", type=int, default=8)
+    llm.set_defaults(func=bench_llm)
+
+    semantic = sub.add_parser("semantic", help="Calibrate the semantic matcher's threshold on the paraphrase corpus and compare it with fuzzy matching")
+    semantic.add_argument("--precision", type=float, default=1.0, help="Target precision for the calibrated threshold")
+    semantic.add_argument("--repeat", type=int, default=20, help="Timed matches per question")
+    semantic.set_defaults(func=bench_semantic)
+
+    analytics = sub.add_parser("analytics", help="Check the in-memory analytics engine against MySQL for every template and compare latency")
+    analytics.add_argument("--repeat", type=int, default=50, help="Timed runs per template and engine")
+    analytics.set_defaults(func=bench_analytics)
+
+    explain = sub.add_parser("explain", help="Fail if any template's EXPLAIN plan full-scans a table")
+    explain.add_argument("--sqlite", metavar="PATH", help="Check the plans SQLite chooses on this file instead of MySQL's")
+    explain.set_defaults(func=check_explain)
+
+    load = sub.add_parser("load", help="Concurrent /query load against the threaded Flask server and the asyncio server")
+    load.add_argument("--llm-latency", type=float, default=500.0, help="Stub LLM response time in ms")
+    load.add_argument("--concurrency", type=int, default=64, help="Requests in flight")
+    load.add_argument("--requests", type=int, default=512, help="Total requests per server")
+    load.add_argument("--threads", type=int, default=8, help="Worker threads for the Flask server")
+    load.add_argument("--serve", nargs="+", choices=["flask", "async"], default=["flask", "async"])
+    load.add_argument("--url", help="Load an already running server's /query instead")
+    load.set_defaults(func=bench_load)
+
+    coalesce = sub.add_parser("coalesce", help="Bursts of one question against cold caches, with and without request coalescing")
+    coalesce.add_argument("--burst", type=int, default=64, help="Identical requests sent at once")
+    coalesce.add_argument("--rounds", type=int, default=10, help="Bursts, alternating an exact-match question and an LLM paraphrase")
+    coalesce.add_argument("--llm-latency", type=float, default=500.0, help="Stub LLM response time in ms")
+    coalesce.add_argument("--threads", type=int, default=server.WORKER_THREADS, help="Request threads for the Flask server")
+    coalesce.add_argument("--serve", nargs="+", choices=["flask", "async"], default=["flask", "async"])
+    coalesce.set_defaults(func=bench_coalesce)
+
+    suite = sub.add_parser("suite", help="Per-template SQL, paraphrase resolution and end-to-end /query, written to a comparable JSON file")
+    suite.add_argument("--load", action="store_true", help="Recreate --database from tables.sql and load --data-dir into it first")
+    suite.add_argument("--database", default="ipl_bench", help="MySQL database to benchmark (on db_config's server)")
+    suite.add_argument("--data-dir", default=ipl_sql_insert.DATA_DIR)
+    suite.add_argument("--llm-latency", type=float, default=200.0, help="Stub LLM response time in ms")
+    suite.add_argument("--repeat", type=int, default=50, help="Timed runs per template")
+    suite.add_argument("--resolution-repeat", type=int, default=3, help="Timed resolutions per paraphrase")
+    suite.add_argument("--requests", type=int, default=400, help="End-to-end requests")
+    suite.add_argument("--concurrency", type=int, default=32)
+    suite.add_argument("--threads", type=int, default=server.WORKER_THREADS, help="Request threads for the server")
+    suite.add_argument("--output", help="Write the results to this JSON file")
+    suite.add_argument("--compare", help="Results file from an earlier run to diff against")
+    suite.add_argument("--threshold", type=float, default=10.0, help="Percent change that counts as a regression")
+    suite.add_argument("--min-delta-ms", type=float, default=0.5, help="Latency changes smaller than this are never regressions")
+    suite.add_argument("--fail-on-regression", action="store_true", help="Exit non-zero if --compare finds a regression")
+    suite.set_defaults(func=bench_suite)
+
+    live = sub.add_parser("live", help="Replay a match as a live feed and time each ball until the scorecard query shows it")
+    live.add_argument("--load", action="store_true", help="Recreate --database from tables.sql and load --data-dir into it first")
+    live.add_argument("--database", default="ipl_bench", help="MySQL database to benchmark (on db_config's server)")
+    live.add_argument("--data-dir", default=ipl_sql_insert.DATA_DIR)
+    live.add_argument("--match", type=int, default=0, help="Index of the match file to replay, in name order")
+    live.add_argument("--interval", type=float, default=20.0, help="ms between balls written to the feed")
+    live.add_argument("--query-interval", type=float, default=10.0, help="ms between scorecard queries")
+    live.add_argument("--feed-poll", type=float, default=ipl_sql_insert.LIVE_POLL_SECONDS, help="Seconds the follower waits on an idle feed")
+    live.add_argument("--version-poll", type=float, default=server.DATA_VERSION_POLL_SECONDS, help="Seconds between data_version reads")
+    live.add_argument("--reloads", type=int, default=5, help="Timed full-match reloads for the baseline")
+    live.add_argument("--timeout", type=float, default=10.0, help="Seconds to wait for the last ball after the feed ends")
+    live.set_defaults(func=bench_live)
+
+    backends = sub.add_parser("backends", help="Every template on MySQL and on the embedded SQLite file: parity and latency")
+    backends.add_argument("--load", action="store_true", help="Recreate both databases from --data-dir first")
+    backends.add_argument("--database", default="ipl_bench", help="MySQL database to compare (on db_config's server)")
+    backends.add_argument("--sqlite", default="ipl_bench.sqlite3", help="SQLite file to compare")
+    backends.add_argument("--data-dir", default=ipl_sql_insert.DATA_DIR)
+    backends.add_argument("--repeat", type=int, default=50, help="Timed runs per template and backend")
+    backends.set_defaults(func=bench_backends)
+
+    parse = sub.add_parser("parse", help="Streaming parser against json.load per file: parity, throughput and peak memory as a file grows")
+    parse.add_argument("--data-dir", default=ipl_sql_insert.DATA_DIR)
+    parse.add_argument("--repeat", type=int, default=5, help="Timed passes over --data-dir per parser")
+    parse.add_argument("--scales", type=int, nargs="+", default=[1, 8, 32],
+                       help="Lengths of the synthetic long file, in copies of the first match's overs")
+    parse.add_argument("--max-growth", type=float, default=1.5,
+                       help="Fail if the streaming parser's peak heap grows more than this between the two longest files")
+    parse.set_defaults(func=bench_parse)
+
+    snapshot = sub.add_parser("snapshot", help="Startup time and memory from the mapped corpus snapshot against loading the same tables through SQL")
+    snapshot.add_argument("--load", action="store_true", help="Recreate the database from --data-dir first")
+    snapshot.add_argument("--database", default="ipl_bench", help="MySQL database to export (on db_config's server)")
+    snapshot.add_argument("--sqlite", metavar="PATH", help="Export from and compare with this SQLite file instead of MySQL")
+    snapshot.add_argument("--data-dir", default=ipl_sql_insert.DATA_DIR)
+    snapshot.add_argument("--output", default="ipl_bench.snapshot", help="Snapshot file to write and map")
+    snapshot.add_argument("--repeat", type=int, default=20, help="Timed table loads per source")
+    snapshot.add_argument("--starts", type=int, default=5, help="Fresh processes started per source")
+    snapshot.set_defaults(func=bench_snapshot)
+
+    args = parser.parse_args()
+    result = args.func(args)
+    print(json.dumps(result, indent=2, default=str))
+    if result.get("failures"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
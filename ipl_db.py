@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Database backends shared by the server (ipl_mcp_server.py) and the loader
+# (ipl_sql_insert.py).
+#
+# Both talk to the database through mysql.connector-style connections:
+# conn.cursor(dictionary=..., prepared=...), %s placeholders, commit() and
+# rollback(). A backend only decides where those connections come from:
+#
+# - MySQLBackend: the MySQL server in db_config (tables.sql).
+# - SQLiteBackend: an embedded, file-based database (tables_sqlite.sql).
+#   The server opens it read-only and memory-mapped, so a query is a read
+#   of the page cache with no network hop, and starting up needs no
+#   external service. The loader creates the file on first use.
+#
+# SQLite connections are wrapped so the same SQL runs on both: %s becomes
+# ?, INSERT IGNORE becomes INSERT OR IGNORE, SET foreign_key_checks becomes
+# PRAGMA foreign_keys, and CONCAT() is registered as a function. Template
+# SQL must otherwise stick to what both dialects share; in particular,
+# divide with a decimal operand (x * 1.0 / y), since SQLite truncates
+# integer division.
+#
+#   python ipl_sql_insert.py --sqlite ipl_data.sqlite3
+#   python ipl_mcp_server.py --sqlite ipl_data.sqlite3
+#   python ipl_benchmark.py backends --load --sqlite ipl_bench.sqlite3
+
+import datetime
+import os
+import re
+import sqlite3
+from functools import lru_cache
+from urllib.parse import quote
+
+import mysql.connector
+
+
+SQLITE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables_sqlite.sql")
+# Upper bound on how much of the file SQLite maps instead of read()ing
+# into its own page cache; larger than the whole IPL corpus.
+SQLITE_MMAP_BYTES = 256 * 1024 * 1024
+
+# Errors from either backend, for except clauses that don't care which
+# backend is configured.
+ERRORS = (mysql.connector.Error, sqlite3.Error)
+
+# Errors reported for a bad statement; the connection stays usable.
+# Anything else (lost connection, driver state) means it should not go
+# back into a pool.
+QUERY_ERRORS = (
+    mysql.connector.ProgrammingError, mysql.connector.DataError, mysql.connector.IntegrityError,
+    sqlite3.OperationalError, sqlite3.DataError, sqlite3.IntegrityError
+)
+
+# DATE columns round-trip as datetime.date, as they do from MySQL.
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_converter("DATE", lambda value: datetime.date.fromisoformat(value.decode()))
+
+
+class MySQLBackend:
+    name = "mysql"
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self, autocommit=False, read_only=False, create=False):
+        # The schema comes from running tables.sql; read_only and create
+        # only apply to SQLite.
+        return mysql.connector.connect(autocommit=autocommit, **self.config)
+
+    def analyze(self, conn):
+        # InnoDB keeps its index statistics up to date by itself.
+        pass
+
+    def describe(self):
+        return f"MySQL {self.config['database']} on {self.config['host']}:{self.config['port']}"
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self, autocommit=False, read_only=False, create=False):
+        """A wrapped connection; create builds the schema if the file doesn't exist yet."""
+        if read_only:
+            conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True,
+                                   detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        else:
+            new = not os.path.exists(self.path)
+            if new and not create:
+                raise FileNotFoundError(f"No SQLite database at {self.path}; build it with ipl_sql_insert.py --sqlite")
+            conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+            if new:
+                with open(SQLITE_SCHEMA) as f:
+                    conn.executescript(f.read())
+            conn.execute("PRAGMA foreign_keys = ON")
+        if autocommit:
+            conn.isolation_level = None
+        conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_BYTES}")
+        conn.create_function("CONCAT", -1, sql_concat, deterministic=True)
+        return SQLiteConnection(conn)
+
+    def analyze(self, conn):
+        """Refresh the planner's table statistics after a load.
+
+        Without them SQLite can't tell a 150-row table from a 17,000-row
+        one, and may drive a join (best_powerplay) from the larger side.
+        """
+        cursor = conn.cursor()
+        cursor.execute("ANALYZE")
+        cursor.close()
+        conn.commit()
+
+    def describe(self):
+        return f"SQLite {os.path.abspath(self.path)}"
+
+
+def sql_concat(*values):
+    # MySQL's CONCAT: NULL if any argument is NULL.
+    if any(value is None for value in values):
+        return None
+    return "".join(str(value) for value in values)
+
+
+FOREIGN_KEY_CHECKS = re.compile(r"^\s*SET\s+foreign_key_checks\s*=\s*(\d)\s*$", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def sqlite_statement(sql):
+    """The SQLite spelling of a statement written for MySQL."""
+    match = FOREIGN_KEY_CHECKS.match(sql)
+    if match:
+        return f"PRAGMA foreign_keys = {match.group(1)}"
+    sql = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", sql, flags=re.IGNORECASE)
+    return sql.replace("%s", "?")
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the mysql.connector surface the server and loader use."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, dictionary=False, prepared=False):
+        # sqlite3 already keeps compiled statements per connection, so
+        # prepared needs nothing extra.
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteCursor:
+    def __init__(self, cursor, dictionary):
+        self._cursor = cursor
+        self._dictionary = dictionary
+        self._columns = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sqlite_statement(sql), params or ())
+        self._columns = [column[0] for column in self._cursor.description] if self._cursor.description else None
+
+    def executemany(self, sql, rows):
+        self._cursor.executemany(sqlite_statement(sql), rows)
+        self._columns = None
+
+    def _rows(self, rows):
+        if not self._dictionary:
+            return rows
+        return [dict(zip(self._columns, row)) for row in rows]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._rows([row])[0] if row is not None else None
+
+    def fetchmany(self, size):
+        return self._rows(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def close(self):
+        self._cursor.close()
@@ -10,15 +10,42 @@
 # In[2]:
 
 
-import mysql.connector
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
+from werkzeug.serving import BaseWSGIServer
 from threading import Thread
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import queue
 import pandas as pd
+import numpy as np
 from rapidfuzz import process, fuzz
 import time
+import datetime
+import json
+import os
+import re
+import sqlite3
+import hashlib
+import zlib
+import weakref
+import base64
+import bisect
+import itertools
+import multiprocessing
+import argparse
+import gc
+import resource
+import signal
+import socket
+from collections import OrderedDict
 import requests
 import logging
 
+import ipl_db
+import ipl_snapshot
+from ipl_analytics import AnalyticsEngine
+
 
 # In[ ]:
 
@@ -41,271 +68,232 @@ logging.basicConfig(
 
 
 
-# ### 🧠 Question Mapping Using Language Model API
+# ### 📚 Query Template Registry
 
 # 
 
-# This code defines a simple NLP-based assistant that maps a user's natural language question to a predefined list of known questions. 
+# Every question the server can answer is declared once in `TEMPLATES`: a `name`, its canonical `question`, extra `aliases`, and the `sql` that answers it.
 
 # 
 
-# - The `known_questions` list contains all supported queries the assistant can recognize.
-
-# - The `prompt_builder(user_main_question)` function constructs a prompt string for the language model. It asks the model to match the user's input with the most relevant known question.
-
-# - The `question_map(question)` function:
-
-#   - Sends the constructed prompt to a locally hosted LLaMA3 language model via a REST API (`http://localhost:11434/api/generate`).
-
-#   - Parses the response and returns the matched known question.
-
-#   - If the model responds with `"None"`, or if an error occurs (e.g., timeout, server issue), it returns `None`.
+# Placeholders like `{player}`, `{team1}`, `{city}` or `{venue}` in the question are the template's `slots`. They are filled from entities the gazetteer finds in the user's question, and bound to the SQL's `%s` markers in `params` order (defaults to slot order).
 
 # 
 
-# This mechanism is useful for handling flexible user input by grounding it to a fixed set of query types that can be handled downstream.
+# `TemplateRegistry` indexes every phrase (canonical question plus aliases) after `normalize_question`:
 
 # 
 
-# In[5]:
-
-
-import requests
-
-known_questions = [
-    "show me all matches in the dataset",
-    "which team won the most matches",
-    "what was the highest total score",
-    "show matches played in mumbai",
-    "who scored the most runs across all matches",
-    "which bowler took the most wickets",
-    "show me virat kohli's batting stats",
-    "who has the best bowling figures in a single match",
-    "what's the average first innings score",
-    "which venue has the highest scoring matches",
-    "show me all centuries scored",
-    "what's the most successful chase target",
-    "which team has the best powerplay performance",
-    "show me the scorecard for match between CSK and MI",
-    "how many sixes were hit in the final",
-    "what was the winning margin in the closest match",
-    "show partnerships over 100 runs"
-]
-
-def prompt_builder(user_main_question):
-    options = "\n".join(f"- {q}" for q in known_questions)
-    return f"""You are a helpful assistant.
-
-Given the user's question below, match it to the most relevant known question from the list.
-
-Only return the matched known question exactly as it appears. If there is no suitable match, return "None".
-Only return question no extra text.
-
-User Question:
-{user_main_question}
-
-Known Questions:
-{options}
-"""
-
-def question_map(question):
-    prompt = prompt_builder(question)
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "llama3",
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=15
-        )
-        response.raise_for_status()
-        mapped_question = response.json().get("response", "").strip()
-        
-        if mapped_question.lower() == "none":
-            logging.info("LLM returned 'None' for mapping question")
-            return None
-            
-        logging.info(f"LLM mapped question to: {mapped_question}")
-        return mapped_question
-
-    except Exception as e:
-        logging.error(f"❌ Error in question_map: {str(e)}")
-        return None
-
-
-# In[ ]:
-
-
+# - `lookup()` is a dict hit on the whole normalized question.
 
+# - `search()` finds the longest phrase contained in the question, using an index keyed on each phrase's first two tokens, so only phrases starting at a matching word pair are compared.
 
-
-# ### 🔎 Fuzzy Matching User Questions to Known Queries
+# - `match()` tries `lookup()` then `search()`.
 
 # 
 
-# This function `fuzzy_match_question` attempts to match a user's question to the most similar known question using fuzzy string matching.
+# `known_questions` (the LLM prompt) and the fuzzy-match corpus are generated from the same registry, so adding a template is a single entry in `TEMPLATES`.
 
 # 
 
-# In[7]:
-
-
-def fuzzy_match_question(user_question, threshold=80):
-    if not user_question or not user_question.strip():
-        return None
-        
-    try:
-        best_match, score, index = process.extractOne(
-            user_question,
-            known_questions,
-            scorer=fuzz.token_set_ratio
-        )
-        logging.info(f"🔍 Fuzzy match: '{user_question[:30]}' → '{best_match[:30]}' (Score: {score})")
-        return best_match if score >= threshold else None
-        
-    except Exception as e:
-        logging.error(f"⚠️ Fuzzy matching error: {str(e)}")
-        return None
-
-
 # In[ ]:
 
 
-
-
-
-# # 🚀 Full Flask API for Translating Natural Language to SQL Queries
-
-# 
-
-# This script implements a Flask API that accepts natural language questions, maps them to SQL queries for a MySQL cricket database (`cric_data`), executes those queries, and returns JSON results.
-
-# 
-
-# ---
-
-# 
-
-# ## ✅ 1. App Initialization
-
-# - Creates a Flask app instance via `Flask(__name__)`.
-
-# - Defines `db_config` with parameters for connecting to the MySQL `cric_data` database.
-
-# 
-
-# ---
-
-# 
-
-# ## 🔁 2. Question to SQL Mapping (`map_question_to_sql`)
-
-# - Maps user questions (in lowercase) to predefined SQL queries.
-
-# - Contains explicit mappings for known questions, returning SQL strings tailored for each.
-
-# - Returns `None` if no exact mapping is found.
-
-# 
-
-# ---
-
-# 
-
-# ## 🧠 3. Question Resolution Logic (inside `/query` POST endpoint)
-
-# - Receives a JSON POST with a `"question"` key.
-
-# - The logic proceeds in this order:
-
-#   1. **Direct Mapping:** Try to map the exact user question via `map_question_to_sql`.
-
-#   2. **LLM-Based Mapping:** If no direct SQL found, sends the user question to a local LLM API (`question_map()`) which attempts to find the closest known question phrasing, then tries SQL mapping again.
-
-#   3. **Fuzzy Matching:** If the LLM returns no match, attempts a fuzzy string match (`fuzzy_match_question()`) against known questions for approximate matching.
-
-#   4. If no SQL query is found after all steps, returns HTTP 400 with an error message.
-
-# 
-
-# ---
-
-# 
-
-# ## 🗄️ 4. SQL Execution
-
-# - Connects to MySQL using `mysql.connector` with `db_config`.
-
-# - Executes the generated SQL query and fetches results as dictionaries.
-
-# - Closes the database connection cleanly.
-
-# - Returns a JSON response containing:
-
-#   - The original user question.
-
-#   - The SQL query used (for debugging/clarity).
-
-#   - The query results.
-
-# - If SQL execution fails, returns HTTP 500 with the error message.
-
-# 
-
-# ---
-
-# 
-
-# ## 🧵 5. Running the Flask API
-
-# - Defines a `run_flask()` function that starts the Flask server on port 5000 with debugging enabled.
-
-# - Runs this function inside a background thread (`Thread(target=run_flask).start()`), so the server runs asynchronously (useful for running inside Jupyter or other environments without blocking).
-
-# 
-
-# ---
-
-# 
-
-# ## 🧩 Overall Workflow
-
-# - The API transforms flexible natural language questions into structured SQL commands by layering:
-
-#   - Direct keyword matching
-
-#   - Semantic LLM mapping
-
-#   - Fuzzy string matching
-
-# - This layered approach allows users to ask cricket-related questions in natural language and get accurate database responses.
-
-# ata using flexible natural language queries.
-
-# 
-
-# In[9]:
-
-
-app = Flask(__name__)
-
-db_config = {
-    "host": "127.0.0.1",
-    "port": 3306,
-    "user": "root",
-    "password": "xyz",
-    "database": "ipl_data",
-    "ssl_disabled": True
-}
-
-
-def map_question_to_sql(question):
-    question = question.lower().strip()
-
-    if "show me all matches in the dataset" in question:
-        return """
+def normalize_question(question):
+    question = re.sub(r"[^\w\s{}]", " ", question.lower())
+    return " ".join(question.split())
+
+
+def slot_type(slot):
+    return slot.rstrip("0123456789")
+
+
+def phrase_key(phrase):
+    # "{team1} vs {team2}" and a question delexicalized to "{team} vs {team}"
+    # must normalize to the same key.
+    return normalize_question(re.sub(r"{(\w+)}", lambda m: "{" + slot_type(m.group(1)) + "}", phrase))
+
+
+TOP_LEVEL_TOKEN = re.compile(r"[()]|\b(?:SELECT|WHERE|GROUP\s+BY|ORDER\s+BY)\b", re.IGNORECASE)
+KEYSET_COMPARISON = {"ASC": ">", "DESC": "<"}
+
+
+def top_level_clauses(statement):
+    """(keyword, offset) of each SELECT, WHERE, GROUP BY and ORDER BY outside parentheses."""
+    depth, clauses = 0, []
+    for match in TOP_LEVEL_TOKEN.finditer(statement):
+        token = match.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            clauses.append((" ".join(token.upper().split()), match.start()))
+    return clauses
+
+
+def keyset_page_sql(sql, keyset):
+    """(first page SQL, next page SQL, key index of each key %s) for a template ordered by keyset.
+
+    The next page SQL adds "rows after the last key" to the final SELECT's
+    WHERE, so the database seeks past earlier pages instead of reading
+    and discarding them. Its key parameters follow the template's own; a
+    LIMIT %s follows both.
+    """
+    statement = sql.strip().rstrip(";")
+    clauses = top_level_clauses(statement)
+    select = max(offset for keyword, offset in clauses if keyword == "SELECT")
+    final = [(keyword, offset) for keyword, offset in clauses if offset > select]
+    order = [offset for keyword, offset in final if keyword == "ORDER BY"]
+    if len(order) != 1 or any(keyword == "GROUP BY" for keyword, _ in final):
+        raise ValueError("A keyset needs a final SELECT with one ORDER BY and no GROUP BY")
+
+    # first >= ? AND (first > ? OR (first = ? AND second > ?) OR ...): the
+    # leading bound lets the database range-scan an index on the first key.
+    terms, positions = [], [0]
+    for i, (_, expression, direction) in enumerate(keyset):
+        equal = [f"{keyset[j][1]} = %s" for j in range(i)]
+        terms.append("(" + " AND ".join(equal + [f"{expression} {KEYSET_COMPARISON[direction]} %s"]) + ")")
+        positions.extend(range(i + 1))
+    _, first, direction = keyset[0]
+    condition = f"{first} {KEYSET_COMPARISON[direction]}= %s AND ({' OR '.join(terms)})"
+
+    before = statement[:order[0]].rstrip()
+    tail = statement[len(before):]
+    where = [offset for keyword, offset in final if keyword == "WHERE"]
+    if where:
+        existing = before[where[0] + len("WHERE"):].strip()
+        following = f"{before[:where[0]]}WHERE ({existing}) AND {condition}{tail}"
+    else:
+        indent = tail[:len(tail) - len(tail.lstrip())]
+        following = f"{before}{indent}WHERE {condition}{tail}"
+    return f"{statement}\nLIMIT %s", f"{following}\nLIMIT %s", positions
+
+
+def key_value(value):
+    # Cursor tokens are JSON; dates go in as ISO strings, which both
+    # backends compare correctly against a DATE column.
+    return value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+
+
+class QueryTemplate:
+    def __init__(self, name, question, sql, aliases=(), params=None, keyset=None, refines=None):
+        self.name = name
+        self.question = question
+        self.sql = sql
+        self.aliases = list(aliases)
+        self.slots = re.findall(r"{(\w+)}", question)
+        self.params = list(params) if params is not None else self.slots
+        # (result column, SQL expression[, "DESC"]) per ORDER BY key, making
+        # each row's key unique; templates with one can be paged in SQL.
+        self.keyset = [(key[0], key[1], key[2] if len(key) > 2 else "ASC") for key in keyset or ()]
+        self._pages = keyset_page_sql(sql, self.keyset) if self.keyset else None
+        # (template name, marker word): questions that match that template
+        # and contain the word are asked of this one instead.
+        self.refines = refines
+
+    def page(self, after=None):
+        """(SQL, key params) for the rows after key `after` (None: from the first row); bind LIMIT last."""
+        first, following, positions = self._pages
+        if after is None:
+            return first, ()
+        return following, tuple(after[i] for i in positions)
+
+    def page_key(self, row):
+        """A result row's keyset values, as stored in a cursor."""
+        return [key_value(row[column]) for column, _, _ in self.keyset]
+
+    def phrases(self):
+        return [self.question] + self.aliases
+
+    def bind(self, entities):
+        """Fill slots from extracted entities; None if any slot is missing."""
+        by_type = {}
+        for entity in entities:
+            by_type.setdefault(entity["type"], []).append(entity)
+        values = {}
+        for slot in self.slots:
+            candidates = by_type.get(slot_type(slot))
+            if not candidates:
+                return None
+            values[slot] = candidates.pop(0)
+        return values
+
+
+class TemplateRegistry:
+    def __init__(self, templates=()):
+        self.templates = []
+        self._by_name = {}
+        self._by_phrase = {}
+        self._by_prefix = {}
+        self._refinements = {}
+        for template in templates:
+            self.add(template)
+
+    def add(self, template):
+        if template.name in self._by_name:
+            raise ValueError(f"Duplicate template name: {template.name}")
+        for phrase in template.phrases():
+            key = phrase_key(phrase)
+            if key in self._by_phrase:
+                raise ValueError(f"Phrase '{phrase}' is already used by template {self._by_phrase[key].name}")
+            self._by_phrase[key] = template
+            tokens = tuple(key.split())
+            self._by_prefix.setdefault(tokens[:2], []).append((tokens, template))
+        if template.refines:
+            base, marker = template.refines
+            self._refinements.setdefault(base, []).append((marker, template))
+        self._by_name[template.name] = template
+        self.templates.append(template)
+
+    def get(self, name):
+        return self._by_name.get(name)
+
+    def lookup(self, question):
+        return self._by_phrase.get(phrase_key(question))
+
+    def search(self, question):
+        tokens = tuple(normalize_question(question).split())
+        best_length, best = 0, None
+        for i in range(len(tokens)):
+            for prefix in {tokens[i:i + 2], tokens[i:i + 1]}:
+                for phrase, template in self._by_prefix.get(prefix, ()):
+                    if len(phrase) > best_length and tokens[i:i + len(phrase)] == phrase:
+                        best_length, best = len(phrase), template
+        return best
+
+    def refine(self, template, question):
+        """The template refining `template` whose marker word is in the question, else `template`."""
+        if template is None or template.name not in self._refinements:
+            return template
+        tokens = set(normalize_question(question).split())
+        return next((refined for marker, refined in self._refinements[template.name] if marker in tokens), template)
+
+    def match(self, question):
+        return self.refine(self.lookup(question) or self.search(question), question)
+
+    def questions(self):
+        return [template.question for template in self.templates]
+
+    def vocabulary(self):
+        return {token for template in self.templates for phrase in template.phrases()
+                for token in phrase_key(phrase).split()}
+
+    def fuzzy_corpus(self):
+        phrases, templates = [], []
+        for template in self.templates:
+            for phrase in template.phrases():
+                phrases.append(phrase_key(phrase))
+                templates.append(template)
+        return phrases, templates
+
+
+TEMPLATES = [
+    QueryTemplate(
+        name="all_matches",
+        question="show me all matches in the dataset",
+        aliases=["list all matches"],
+        sql="""
             SELECT 
             md.match_id, 
             md.match_date, 
@@ -319,12 +307,15 @@ def map_question_to_sql(question):
         FROM match_detail md
         JOIN teams t1 ON md.team1_id = t1.team_id
         JOIN teams t2 ON md.team2_id = t2.team_id
-        ORDER BY md.match_date;
-        """
-
-
-    elif "which team won the most matches" in question:
-        return """
+        ORDER BY md.match_date, md.match_id;
+        """,
+        keyset=[("match_date", "md.match_date"), ("match_id", "md.match_id")]
+    ),
+    QueryTemplate(
+        name="most_wins",
+        question="which team won the most matches",
+        aliases=["team with the most wins"],
+        sql="""
             SELECT t.team_name, COUNT(*) AS wins
             FROM match_detail md
             JOIN teams t ON md.winner_team_id = t.team_id
@@ -332,25 +323,28 @@ def map_question_to_sql(question):
             ORDER BY wins DESC
             LIMIT 1;
         """
-
-
-    elif "what was the highest total score" in question:
-        return """
+    ),
+    QueryTemplate(
+        name="highest_total",
+        question="what was the highest total score",
+        aliases=["highest team total"],
+        sql="""
             SELECT 
-            d.match_id, 
-            d.inning_num, 
+            it.match_id, 
+            it.inning_num, 
             t.team_name,
-            SUM(d.runs_total) AS total_runs
-        FROM deliveries d
-        JOIN teams t ON d.batting_team_id = t.team_id
-        GROUP BY d.match_id, d.inning_num, t.team_name
-        ORDER BY total_runs DESC
+            it.total_runs
+        FROM innings_totals it
+        JOIN teams t ON it.batting_team_id = t.team_id
+        ORDER BY it.total_runs DESC
         LIMIT 1;
         """
-
-
-    elif "show matches played in mumbai" in question:
-        return """
+    ),
+    QueryTemplate(
+        name="matches_in_city",
+        question="show matches played in {city}",
+        aliases=["matches played in {city}", "matches in {city}"],
+        sql="""
             SELECT 
             md.match_id,
             md.match_date,
@@ -360,60 +354,87 @@ def map_question_to_sql(question):
         FROM match_detail md
         JOIN teams t1 ON md.team1_id = t1.team_id
         JOIN teams t2 ON md.team2_id = t2.team_id
-        WHERE md.city = 'Mumbai';
-        """
-    
-    elif "who scored the most runs across all matches" in question:
-        return """
+        WHERE md.city = %s
+        ORDER BY md.match_date, md.match_id;
+        """,
+        keyset=[("match_date", "md.match_date"), ("match_id", "md.match_id")]
+    ),
+    QueryTemplate(
+        name="matches_at_venue",
+        question="show matches played at {venue}",
+        aliases=["matches played at {venue}", "matches at {venue}"],
+        sql="""
+            SELECT 
+            md.match_id,
+            md.match_date,
+            md.city,
+            t1.team_name AS team1,
+            t2.team_name AS team2
+        FROM match_detail md
+        JOIN teams t1 ON md.team1_id = t1.team_id
+        JOIN teams t2 ON md.team2_id = t2.team_id
+        WHERE md.venue = %s
+        ORDER BY md.match_date, md.match_id;
+        """,
+        keyset=[("match_date", "md.match_date"), ("match_id", "md.match_id")]
+    ),
+    QueryTemplate(
+        name="most_runs",
+        question="who scored the most runs across all matches",
+        aliases=["most runs across all matches", "top run scorer"],
+        sql="""
             SELECT 
             p.player_name, 
-            SUM(d.runs_batsman) AS total_runs
-        FROM deliveries d
-        JOIN players p ON d.batsman_id = p.player_id
-        GROUP BY d.batsman_id
+            SUM(b.runs) AS total_runs
+        FROM player_match_batting b
+        JOIN players p ON b.player_id = p.player_id
+        GROUP BY b.player_id
         ORDER BY total_runs DESC
         LIMIT 1;
         """
-
-    elif "which bowler took the most wickets" in question:
-        return """
+    ),
+    QueryTemplate(
+        name="most_wickets",
+        question="which bowler took the most wickets",
+        aliases=["top wicket taker"],
+        sql="""
             SELECT 
             p.player_name AS bowler_name,
-            COUNT(w.wicket_id) AS wickets_taken
-        FROM wickets w
-        JOIN deliveries d ON w.delivery_id = d.delivery_id
-        JOIN players p ON d.bowler_id = p.player_id
-        WHERE w.dismissal_kind IN (
-            'bowled', 'caught', 'lbw', 'stumped', 'hit wicket', 'caught and bowled'
-        )
-        GROUP BY d.bowler_id
+            SUM(bw.wickets) AS wickets_taken
+        FROM player_match_bowling bw
+        JOIN players p ON bw.player_id = p.player_id
+        GROUP BY bw.player_id
         ORDER BY wickets_taken DESC
         LIMIT 1;
         """
-
-    elif "show me virat kohli's batting stats" in question:
-        return """
+    ),
+    QueryTemplate(
+        name="player_batting",
+        question="show me {player}'s batting stats",
+        aliases=["{player}'s batting stats", "{player} batting stats", "batting stats for {player}"],
+        params=["player", "player"],
+        sql="""
             WITH player_match_stats AS (
             SELECT 
-                d.batsman_id,
+                b.player_id AS batsman_id,
                 p.player_name,
-                d.match_id,
-                COUNT(*) AS balls_faced,
-                SUM(d.runs_batsman) AS runs,
-                SUM(CASE WHEN d.runs_batsman = 4 THEN 1 ELSE 0 END) AS fours,
-                SUM(CASE WHEN d.runs_batsman = 6 THEN 1 ELSE 0 END) AS sixes
-            FROM deliveries d
-            JOIN players p ON d.batsman_id = p.player_id
-            WHERE p.player_name = 'V Kohli'
-            GROUP BY d.batsman_id, p.player_name, d.match_id
+                b.match_id,
+                SUM(b.balls_faced) AS balls_faced,
+                SUM(b.runs) AS runs,
+                SUM(b.fours) AS fours,
+                SUM(b.sixes) AS sixes
+            FROM player_match_batting b
+            JOIN players p ON b.player_id = p.player_id
+            WHERE b.player_id = %s
+            GROUP BY b.player_id, p.player_name, b.match_id
         ),
         dismissals AS (
             SELECT 
                 w.player_dismissed_id,
                 COUNT(*) AS times_out
             FROM wickets w
-            JOIN deliveries d ON w.delivery_id = d.delivery_id
-            WHERE w.player_dismissed_id IS NOT NULL
+            JOIN deliveries d ON w.delivery_key = d.delivery_key
+            WHERE w.player_dismissed_id = %s
             GROUP BY w.player_dismissed_id
         )
         SELECT 
@@ -426,10 +447,10 @@ def map_question_to_sql(question):
             SUM(pms.balls_faced) AS balls_faced,
             COALESCE(d.times_out, 0) AS times_dismissed,
             ROUND(
-                CASE WHEN d.times_out = 0 THEN NULL ELSE SUM(pms.runs) / d.times_out END
+                CASE WHEN d.times_out = 0 THEN NULL ELSE SUM(pms.runs) * 1.0 / d.times_out END
             , 2) AS batting_average,
             ROUND(
-                CASE WHEN SUM(pms.balls_faced) = 0 THEN NULL ELSE (SUM(pms.runs) / SUM(pms.balls_faced)) * 100 END
+                CASE WHEN SUM(pms.balls_faced) = 0 THEN NULL ELSE SUM(pms.runs) * 100.0 / SUM(pms.balls_faced) END
             , 2) AS strike_rate,
             SUM(CASE WHEN pms.runs BETWEEN 50 AND 99 THEN 1 ELSE 0 END) AS fifties,
             SUM(CASE WHEN pms.runs >= 100 THEN 1 ELSE 0 END) AS centuries
@@ -437,25 +458,22 @@ def map_question_to_sql(question):
         LEFT JOIN dismissals d ON pms.batsman_id = d.player_dismissed_id
         GROUP BY pms.player_name, d.times_out;
         """
-
-    elif "who has the best bowling figures in a single match" in question:
-        return """
+    ),
+    QueryTemplate(
+        name="best_bowling_figures",
+        question="who has the best bowling figures in a single match",
+        aliases=["best bowling figures"],
+        sql="""
             WITH bowler_match_stats AS (
             SELECT
-                d.bowler_id,
+                bw.player_id AS bowler_id,
                 p.player_name,
-                d.match_id,
-                COUNT(CASE 
-                    WHEN w.wicket_id IS NOT NULL 
-                         AND w.dismissal_kind IN ('bowled', 'caught', 'lbw', 'stumped', 'hit wicket', 'caught and bowled')
-                    THEN 1
-                    ELSE NULL
-                END) AS wickets_taken,
-                SUM(d.runs_batsman + d.runs_extras) AS runs_conceded
-            FROM deliveries d
-            LEFT JOIN wickets w ON d.delivery_id = w.delivery_id
-            JOIN players p ON d.bowler_id = p.player_id
-            GROUP BY d.bowler_id, p.player_name, d.match_id
+                bw.match_id,
+                SUM(bw.wickets) AS wickets_taken,
+                SUM(bw.runs_conceded) AS runs_conceded
+            FROM player_match_bowling bw
+            JOIN players p ON bw.player_id = p.player_id
+            GROUP BY bw.player_id, p.player_name, bw.match_id
         )
         SELECT
             player_name,
@@ -466,121 +484,186 @@ def map_question_to_sql(question):
         ORDER BY wickets_taken DESC, runs_conceded ASC
         LIMIT 1;
         """
-
-    elif "what's the average first innings score" in question:
-        return """
+    ),
+    QueryTemplate(
+        name="average_first_innings",
+        question="what's the average first innings score",
+        aliases=["average first innings score"],
+        sql="""
             SELECT 
-            ROUND(AVG(first_innings_total), 2) AS average_first_innings_score
-            FROM (
-                SELECT 
-                    match_id,
-                    SUM(runs_total) AS first_innings_total
-                FROM deliveries
-                WHERE inning_num = 1
-                GROUP BY match_id
-            ) AS first_innings_scores;
+            ROUND(AVG(total_runs), 2) AS average_first_innings_score
+            FROM innings_totals
+            WHERE inning_num = 1;
         """
-
-    elif "which venue has the highest scoring matches" in question:
-            return """
+    ),
+    QueryTemplate(
+        name="highest_scoring_venue",
+        question="which venue has the highest scoring matches",
+        aliases=["highest scoring venue"],
+        sql="""
                 SELECT 
-                    md.venue,
+                    venue,
                     ROUND(AVG(total_runs), 2) AS avg_total_runs
-                FROM (
-                    SELECT 
-                        match_id,
-                        SUM(runs_total) AS total_runs
-                    FROM deliveries
-                    GROUP BY match_id
-                ) AS match_totals
-                JOIN match_detail md ON match_totals.match_id = md.match_id
-                GROUP BY md.venue
+                FROM venue_match_totals
+                GROUP BY venue
                 ORDER BY avg_total_runs DESC
                 LIMIT 5;
             """
-
-    elif "show me all centuries scored" in question:
-        return """
-            WITH player_match_stats AS (
-                SELECT 
-                    d.batsman_id,
-                    p.player_name,
-                    d.match_id,
-                    SUM(d.runs_batsman) AS runs_scored,
-                    COUNT(*) AS balls_faced,
-                    SUM(CASE WHEN d.runs_batsman = 4 THEN 1 ELSE 0 END) AS fours,
-                    SUM(CASE WHEN d.runs_batsman = 6 THEN 1 ELSE 0 END) AS sixes
-                FROM deliveries d
-                JOIN players p ON d.batsman_id = p.player_id
-                GROUP BY d.batsman_id, p.player_name, d.match_id
-            )
+    ),
+    QueryTemplate(
+        name="centuries",
+        question="show me all centuries scored",
+        aliases=["all centuries", "list of centuries"],
+        sql="""
             SELECT 
-                player_name,
-                match_id,
-                runs_scored,
-                balls_faced,
-                fours,
-                sixes
-            FROM player_match_stats
-            WHERE runs_scored >= 100
-            ORDER BY runs_scored DESC, player_name, match_id;
-        """
-
-    elif "what's the most successful chase target" in question:
-        return """
+                p.player_name,
+                b.match_id,
+                b.runs AS runs_scored,
+                b.balls_faced,
+                b.fours,
+                b.sixes
+            FROM player_match_batting b
+            JOIN players p ON b.player_id = p.player_id
+            WHERE b.runs >= 100
+            ORDER BY runs_scored DESC, p.player_name, b.match_id;
+        """,
+        keyset=[("runs_scored", "b.runs", "DESC"), ("player_name", "p.player_name"), ("match_id", "b.match_id")]
+    ),
+    QueryTemplate(
+        name="best_chase",
+        question="what's the most successful chase target",
+        aliases=["highest successful chase", "highest successful run chase"],
+        sql="""
             SELECT 
             md.match_id,
             md.match_date,
             t.team_name AS chasing_team,
             md.win_by_wickets AS wickets_left,
-            (SELECT SUM(d.runs_total) 
-             FROM deliveries d 
-             WHERE d.match_id = md.match_id AND d.batting_team_id = md.winner_team_id) AS chased_runs
+            (SELECT SUM(it.total_runs) 
+             FROM innings_totals it 
+             WHERE it.match_id = md.match_id AND it.batting_team_id = md.winner_team_id) AS chased_runs
         FROM match_detail md
         JOIN teams t ON md.winner_team_id = t.team_id
         WHERE md.win_by_wickets > 0
         ORDER BY chased_runs DESC
         LIMIT 1;
         """
-
-    elif "show me the scorecard for match between CSK and MI" in question:
-        return """
+    ),
+    QueryTemplate(
+        name="best_powerplay",
+        question="which team has the best powerplay performance",
+        aliases=["best powerplay performance"],
+        sql="""
+            WITH powerplay_deliveries AS (
+            SELECT
+                d.batting_team_key,
+                d.runs_total
+            FROM powerplay pp
+            JOIN match_detail md ON md.match_id = pp.match_id
+            JOIN deliveries d
+              ON d.match_key = md.match_key
+             AND d.inning_num = pp.inning_num
+             AND d.over_num BETWEEN pp.start_over AND pp.end_over
+        )
+        SELECT
+            t.team_name,
+            SUM(pw.runs_total) AS total_powerplay_runs
+        FROM powerplay_deliveries pw
+        JOIN teams t ON pw.batting_team_key = t.team_key
+        GROUP BY t.team_name
+        ORDER BY total_powerplay_runs DESC
+        LIMIT 1;
+        """
+    ),
+    QueryTemplate(
+        name="scorecard",
+        question="show me the scorecard for match between {team1} and {team2}",
+        aliases=["{team1} vs {team2} scorecard", "scorecard for {team1} vs {team2}"],
+        # Either team may be listed first; one lookup per order keeps both
+        # on the team1_id index instead of scanning match_detail.
+        params=["team1", "team2", "team2", "team1"],
+        sql="""
             WITH matched_matches AS (
-                SELECT match_id
-                FROM match_detail
-                WHERE (team1_id = 'C.S.K-Team' AND team2_id = 'M.I-Team')
-                   OR (team1_id = 'M.I-Team' AND team2_id = 'C.S.K-Team')
+                SELECT match_id FROM match_detail WHERE team1_id = %s AND team2_id = %s
+                UNION
+                SELECT match_id FROM match_detail WHERE team1_id = %s AND team2_id = %s
             )
             
             SELECT
-                d.match_id,
-                d.inning_num,
+                b.match_id,
+                b.inning_num,
+                b.batting_position,
                 p.player_name AS player,
                 t.team_name,
-                COUNT(*) AS balls_faced,
-                SUM(d.runs_batsman) AS runs,
-                SUM(CASE WHEN d.runs_batsman = 4 THEN 1 ELSE 0 END) AS fours,
-                SUM(CASE WHEN d.runs_batsman = 6 THEN 1 ELSE 0 END) AS sixes
-            FROM deliveries d
-            JOIN players p ON d.batsman_id = p.player_id
-            JOIN teams t ON d.batting_team_id = t.team_id
-            WHERE d.match_id IN (SELECT match_id FROM matched_matches)
-            GROUP BY d.match_id, d.inning_num, p.player_name, t.team_name
-            ORDER BY d.match_id, d.inning_num, runs DESC;
-        """
-
-    elif "how many sixes were hit in the final" in question:
-        return """
+                COALESCE(b.dismissal_kind, 'not out') AS dismissal,
+                b.balls_faced,
+                b.runs,
+                b.fours,
+                b.sixes
+            FROM player_match_batting b
+            JOIN players p ON b.player_id = p.player_id
+            JOIN teams t ON b.team_id = t.team_id
+            WHERE b.match_id IN (SELECT match_id FROM matched_matches)
+            ORDER BY b.match_id, b.inning_num, b.batting_position;
+        """,
+        keyset=[("match_id", "b.match_id"), ("inning_num", "b.inning_num"),
+                ("batting_position", "b.batting_position")]
+    ),
+    QueryTemplate(
+        name="bowling_scorecard",
+        question="show me the bowling scorecard for match between {team1} and {team2}",
+        aliases=["{team1} vs {team2} bowling scorecard", "bowling scorecard for {team1} vs {team2}",
+                 "bowling scorecard {team1} vs {team2}", "{team1} vs {team2} bowling"],
+        # "bowling" also turns a batting scorecard match into this one.
+        refines=("scorecard", "bowling"),
+        # Either team may be listed first; one lookup per order keeps both
+        # on the team1_id index instead of scanning match_detail.
+        params=["team1", "team2", "team2", "team1"],
+        sql="""
+            WITH matched_matches AS (
+                SELECT match_id FROM match_detail WHERE team1_id = %s AND team2_id = %s
+                UNION
+                SELECT match_id FROM match_detail WHERE team1_id = %s AND team2_id = %s
+            )
+            
+            SELECT
+                bw.match_id,
+                bw.inning_num,
+                bw.bowling_position,
+                p.player_name AS bowler,
+                t.team_name,
+                bw.balls,
+                bw.runs_conceded,
+                bw.wickets
+            FROM player_match_bowling bw
+            JOIN players p ON bw.player_id = p.player_id
+            JOIN teams t ON bw.team_id = t.team_id
+            WHERE bw.match_id IN (SELECT match_id FROM matched_matches)
+            ORDER BY bw.match_id, bw.inning_num, bw.bowling_position;
+        """,
+        keyset=[("match_id", "bw.match_id"), ("inning_num", "bw.inning_num"),
+                ("bowling_position", "bw.bowling_position")]
+    ),
+    QueryTemplate(
+        name="sixes_in_final",
+        question="how many sixes were hit in the final",
+        aliases=["sixes in the final"],
+        sql="""
             SELECT 
-            SUM(CASE WHEN d.runs_batsman = 6 THEN 1 ELSE 0 END) AS total_sixes_in_final
-        FROM deliveries d
-        JOIN match_detail md ON d.match_id = md.match_id
+            SUM(b.sixes) AS total_sixes_in_final
+        FROM player_match_batting b
+        JOIN match_detail md ON b.match_id = md.match_id
         WHERE md.stage = 'final';
         """
-
-    elif "what was the winning margin in the closest match" in question:
-        return """
-            (
+    ),
+    QueryTemplate(
+        name="closest_match",
+        question="what was the winning margin in the closest match",
+        aliases=["closest match"],
+        # Each branch is a derived table: SQLite doesn't accept
+        # parenthesized UNION operands with their own ORDER BY/LIMIT.
+        sql="""
+            SELECT * FROM (
           SELECT 
             md.match_id,
             t1.team_name AS team1,
@@ -593,9 +676,9 @@ def map_question_to_sql(question):
           WHERE md.win_by_runs > 0
           ORDER BY md.win_by_runs ASC
           LIMIT 1
-        )
+        ) AS closest_by_runs
         UNION ALL
-        (
+        SELECT * FROM (
           SELECT 
             md.match_id,
             t1.team_name AS team1,
@@ -608,137 +691,2565 @@ def map_question_to_sql(question):
           WHERE md.win_by_wickets > 0
           ORDER BY md.win_by_wickets ASC
           LIMIT 1
-        );
-        """
-
-    elif "show partnerships over 100 runs" in question:
-        return """
-            SELECT 
-            match_id,
-            batting_team_id,
-            bowling_team_id,
-            CONCAT(
-                GREATEST(p1.player_name, p2.player_name),
-                ' - ',
-                LEAST(p1.player_name, p2.player_name)
-            ) AS partnership,
-            SUM(runs_total) AS partnership_score
-        FROM deliveries AS d
-        JOIN players AS p1 
-            ON p1.player_id = d.batsman_id
-        JOIN players AS p2 
-            ON p2.player_id = d.non_striker_id
-        GROUP BY 
-            match_id,
-            batting_team_id,
-            bowling_team_id,
-            CONCAT(
-                GREATEST(p1.player_name, p2.player_name),
-                ' - ',
-                LEAST(p1.player_name, p2.player_name)
-            )
-        HAVING 
-            SUM(runs_total) >= 100
-        ORDER BY 
-            partnership_score DESC;
+        ) AS closest_by_wickets;
         """
-
-    elif "which team has the best powerplay performance" in question:
-        return """
-            WITH powerplay_deliveries AS (
+    ),
+    QueryTemplate(
+        name="century_partnerships",
+        question="show partnerships over 100 runs",
+        aliases=["partnerships over 100", "century partnerships"],
+        sql="""
             SELECT
-                d.match_id,
-                d.inning_num,
-                d.batting_team_id,
-                d.runs_total,
-                pp.start_over,
-                pp.end_over
-            FROM deliveries d
-            JOIN powerplay pp
-              ON d.match_id = pp.match_id
-             AND d.inning_num = pp.inning_num
-             AND d.over_num BETWEEN pp.start_over AND pp.end_over
-        )
-        SELECT
-            t.team_name,
-            SUM(pw.runs_total) AS total_powerplay_runs
-        FROM powerplay_deliveries pw
-        JOIN teams t ON pw.batting_team_id = t.team_id
-        GROUP BY t.team_name
-        ORDER BY total_powerplay_runs DESC
-        LIMIT 1;
-        """
+            ps.match_id,
+            ps.inning_num,
+            ps.wicket_num,
+            ps.batting_team_id,
+            ps.bowling_team_id,
+            CONCAT(p1.player_name, ' - ', p2.player_name) AS partnership,
+            ps.runs AS partnership_score,
+            ps.balls
+        FROM partnerships ps
+        JOIN players p1 ON p1.player_id = ps.batter1_id
+        JOIN players p2 ON p2.player_id = ps.batter2_id
+        WHERE ps.runs >= 100
+        ORDER BY partnership_score DESC, ps.match_id, ps.inning_num, ps.wicket_num;
+        """,
+        keyset=[("partnership_score", "ps.runs", "DESC"), ("match_id", "ps.match_id"),
+                ("inning_num", "ps.inning_num"), ("wicket_num", "ps.wicket_num")]
+    )
+]
 
+template_registry = TemplateRegistry(TEMPLATES)
 
-    else:
+
+# In[ ]:
+
+
+
+
+
+# ### 🏷️ Entity Gazetteer
+
+# 
+
+# Slot templates need the player, team, city or venue named in the question. `Gazetteer` holds every name from the `players`, `teams` and `match_detail` (`city`, `venue`) tables in memory, keyed by normalized token sequence.
+
+# 
+
+# - Players are also known by surname when it is unique (e.g. `kohli`). A shared surname is resolved by the first name's initial when only one of those players has it (`rohit sharma` is `RG Sharma`), as cricsheet names most players by initials. Teams by their initials (`csk`, `mi`) plus `TEAM_ABBREVIATIONS`, and venues by the part before the comma.
+
+# - `extract()` scans the question left to right taking the longest known name at each position, and returns the question with each name replaced by its slot placeholder (`{player}`, `{team}`, ...) along with the entities found.
+
+# - The gazetteer is (re)loaded from MySQL on first use and whenever `data_version` moves, or from the corpus snapshot when one is mapped at that version.
+
+# 
+
+# In[ ]:
+
+
+TEAM_ABBREVIATIONS = {
+    "srh": "Sunrisers Hyderabad",
+    "pbks": "Punjab Kings"
+}
+
+# When one name could be several kinds of entity, prefer the earliest.
+ENTITY_PRIORITY = ["team", "player", "venue", "city"]
+
+# Cricsheet short names lead with the initials of the given names ("RG Sharma").
+INITIALS = re.compile(r"[A-Z]{1,4}")
+
+
+class Gazetteer:
+    def __init__(self, retry_interval=30.0, stopwords=()):
+        self.retry_interval = retry_interval
+        # Words that can't be a first name, e.g. the "by" in "wickets by sharma".
+        self.stopwords = frozenset(stopwords)
+        self._lock = threading.Lock()
+        self._names = {}
+        self._by_initial = {}
+        self._max_tokens = 0
+        self._loaded = False
+        self._version = None
+        self._failed_at = None
+
+    def is_current(self, version):
+        return self._loaded and version == self._version
+
+    def ensure_loaded(self, pool, version):
+        if self.is_current(version):
+            return
+        # Back off after a failure, whether it was the first load or a
+        # reload for a new data_version: the previous names stay in use.
+        if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_interval:
+            return
+        with self._lock:
+            if self.is_current(version):
+                return
+            try:
+                self.load(pool, version)
+                self._version = version
+                self._failed_at = None
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                logging.warning(f"⚠️ Could not load entity gazetteer: {e}")
+
+    def load(self, pool, version=None):
+        snapshot = corpus_snapshot_at(version)
+        if snapshot is not None:
+            players = list(zip(snapshot.column("players", "player_id"), snapshot.column("players", "player_name")))
+            teams = list(zip(snapshot.column("teams", "team_id"), snapshot.column("teams", "team_name")))
+            # A dictionary column's dictionary is its distinct non-NULL values.
+            cities = list(snapshot.dictionary("match_detail", "city"))
+            venues = list(snapshot.dictionary("match_detail", "venue"))
+        else:
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT player_id, player_name FROM players")
+                players = cursor.fetchall()
+                cursor.execute("SELECT team_id, team_name FROM teams")
+                teams = cursor.fetchall()
+                cursor.execute("SELECT DISTINCT city FROM match_detail WHERE city IS NOT NULL")
+                cities = [row[0] for row in cursor.fetchall()]
+                cursor.execute("SELECT DISTINCT venue FROM match_detail WHERE venue IS NOT NULL")
+                venues = [row[0] for row in cursor.fetchall()]
+                cursor.close()
+        self.build(players, teams, cities, venues)
+        logging.info(f"🏷️ Gazetteer loaded from {'snapshot' if snapshot else 'database'}: "
+                     f"{len(players)} players, {len(teams)} teams, {len(cities)} cities, {len(venues)} venues")
+
+    def build(self, players, teams, cities, venues):
+        names = {}
+
+        def add(surface, entity_type, value, name):
+            key = tuple(normalize_question(surface).split())
+            if key:
+                names.setdefault(key, {}).setdefault(entity_type, {"type": entity_type, "value": value, "name": name})
+
+        for city in cities:
+            add(city, "city", city, city)
+        for venue in venues:
+            add(venue, "venue", venue, venue)
+            add(venue.split(",")[0], "venue", venue, venue)
+
+        surnames = {}
+        initialled = {}
+        for player_id, player_name in players:
+            surname = player_name.split()[-1]
+            surnames[surname] = surnames.get(surname, 0) + 1
+            initials, _, rest = player_name.partition(" ")
+            if rest and INITIALS.fullmatch(initials):
+                key = (initials[0].lower(),) + tuple(normalize_question(rest).split())
+                initialled.setdefault(key, []).append({"type": "player", "value": player_id, "name": player_name})
+        for player_id, player_name in players:
+            add(player_name, "player", player_id, player_name)
+            surname = player_name.split()[-1]
+            if surnames[surname] == 1 and len(surname) > 3:
+                add(surname, "player", player_id, player_name)
+
+        # (first letter of the first name, *surname tokens) -> the one player it fits.
+        by_initial = {key: {"player": found[0]} for key, found in initialled.items() if len(found) == 1}
+
+        team_ids = {team_name: team_id for team_id, team_name in teams}
+        for team_id, team_name in teams:
+            add(team_name, "team", team_id, team_name)
+            add("".join(word[0] for word in team_name.split()), "team", team_id, team_name)
+        for abbreviation, team_name in TEAM_ABBREVIATIONS.items():
+            if team_name in team_ids:
+                add(abbreviation, "team", team_ids[team_name], team_name)
+
+        self._names = names
+        self._by_initial = by_initial
+        self._max_tokens = max((len(key) for key in itertools.chain(names, by_initial)), default=0)
+        self._loaded = True
+
+    def lookup(self, tokens):
+        found = self._names.get(tuple(tokens))
+        if found is None and len(tokens) > 1 and len(tokens[0]) > 1 and tokens[0] not in self.stopwords:
+            # "rohit sharma": a given name and a surname shared by several players.
+            found = self._by_initial.get((tokens[0][0],) + tuple(tokens[1:]))
+        return found
+
+    def extract(self, question):
+        tokens = normalize_question(question).split()
+        delexicalized, entities = [], []
+        i = 0
+        while i < len(tokens):
+            for n in range(min(self._max_tokens, len(tokens) - i), 0, -1):
+                found = self.lookup(tokens[i:i + n])
+                if found:
+                    entity = next(found[t] for t in ENTITY_PRIORITY if t in found)
+                    entities.append(entity)
+                    delexicalized.append("{" + entity["type"] + "}")
+                    i += n
+                    break
+            else:
+                delexicalized.append(tokens[i])
+                i += 1
+        return " ".join(delexicalized), entities
+
+
+gazetteer = Gazetteer(stopwords=template_registry.vocabulary())
+
+
+# In[ ]:
+
+
+
+
+
+# ### 🧠 Question Mapping Using Language Model API
+
+# 
+
+# This code defines a simple NLP-based assistant that maps a user's natural language question to a predefined list of known questions. 
+
+# 
+
+# - The `known_questions` list contains all supported queries the assistant can recognize.
+
+# - The `prompt_builder(user_main_question)` function constructs a prompt string for the language model. It lists the known questions by number and asks the model to reply with only the number of the one matching the user's input, or `0`.
+
+# - The `question_map(question)` function:
+
+#   - Returns the cached mapping if this phrasing was mapped before (see `MappingCache` below).
+
+#   - Sends the constructed prompt to a locally hosted LLaMA3 language model via a REST API (`LLM_URL`, default `http://localhost:11434/api/generate`).
+
+#   - Reads the streamed response only until a complete number has arrived, then closes the connection, which stops generation. The number is looked up in `known_questions`, so wording drift in the model's output can't break the mapping.
+
+#   - If the model responds with `0`, `"None"` or anything that isn't a known question's number, or if an error occurs (e.g., timeout, server issue), it returns `None`.
+
+# - Keeping generation short:
+
+#   - `LLM_NUM_PREDICT` caps output tokens and a newline stops generation, so a chatty reply costs a few tokens at most.
+
+#   - `LLM_KEEP_ALIVE` keeps the model loaded between requests. The known-question list comes before the user's question, so a loaded model reuses the cached prompt prefix and only evaluates the question itself.
+
+#   - Concurrent calls for the same question (after normalization) share one request through `llm_flight`; `GET /stats` reports calls and coalesced callers under `llm`.
+
+# 
+
+# This mechanism is useful for handling flexible user input by grounding it to a fixed set of query types that can be handled downstream.
+
+# 
+
+# In[5]:
+
+
+import requests
+
+known_questions = template_registry.questions()
+
+# The numbered list comes first and never changes, so with the model kept
+# loaded Ollama reuses its evaluated prefix and only reads the question.
+def known_question_options():
+    return "\n".join(f"{i}. {q}" for i, q in enumerate(known_questions, 1))
+
+
+def prompt_builder(user_main_question):
+    return f"""You are a helpful assistant.
+
+Given the user's question at the end, pick the known question from the numbered list that asks the same thing.
+Words in braces such as {{player}}, {{team1}} or {{city}} are placeholders for a name in the user's question.
+
+Reply with the known question's number only, e.g. "7". If no known question matches, reply "0".
+
+Known Questions:
+{known_question_options()}
+
+User Question:
+{user_main_question}
+"""
+
+
+def batch_prompt_builder(user_questions):
+    numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(user_questions, 1))
+    return f"""You are a helpful assistant.
+
+Given each numbered user question at the end, pick the known question from the numbered list that asks the same thing.
+Words in braces such as {{player}}, {{team1}} or {{city}} are placeholders for a name in the user's question.
+
+Reply with one line per user question, in order: the user question's number, a period and the known question's number, e.g. "2. 7". Use 0 when no known question matches.
+Only return those lines, no extra text.
+
+Known Questions:
+{known_question_options()}
+
+User Questions:
+{numbered}
+"""
+
+LLM_URL = "http://localhost:11434/api/generate"
+LLM_MODEL = "llama3"
+LLM_TIMEOUT = 15
+LLM_KEEP_ALIVE = "30m"
+# An ID up to 999 is a single llama3 token; the rest of the cap only
+# bounds what a model that ignores the instructions can cost.
+LLM_NUM_PREDICT = 4
+LLM_BATCH_NUM_PREDICT = 6
+
+def llm_payload(question):
+    return {
+        "model": LLM_MODEL,
+        "prompt": prompt_builder(question),
+        "stream": True,
+        "keep_alive": LLM_KEEP_ALIVE,
+        "options": {"temperature": 0, "num_predict": LLM_NUM_PREDICT, "stop": ["\n"]}
+    }
+
+
+def batch_llm_payload(questions):
+    return dict(
+        llm_payload(questions[0]),
+        prompt=batch_prompt_builder(questions),
+        stream=False,
+        options={"temperature": 0, "num_predict": LLM_BATCH_NUM_PREDICT * len(questions)}
+    )
+
+
+def parse_llm_answer(text, final=False):
+    """(complete, known question or None) for the model's output so far.
+
+    The answer is complete once the ID can't grow: a non-digit follows it,
+    the stream ended, or one more digit would pass the last known question.
+    """
+    text = text.lstrip()
+    if not text:
+        return final, None
+    digits = re.match(r"\d*", text).group()
+    if not digits:
+        # "None", or prose instead of an ID.
+        return True, None
+    if not final and len(digits) == len(text) and int(digits) * 10 <= len(known_questions):
+        return False, None
+    index = int(digits)
+    return True, known_questions[index - 1] if 1 <= index <= len(known_questions) else None
+
+
+def read_llm_stream(lines):
+    """(raw answer, known question or None) from Ollama's NDJSON lines, read only until the ID is complete."""
+    answer = ""
+    for line in lines:
+        if not line:
+            continue
+        chunk = json.loads(line)
+        answer += chunk.get("response", "")
+        complete, mapped_question = parse_llm_answer(answer, final=chunk.get("done", False))
+        if complete:
+            return answer, mapped_question
+    return answer, parse_llm_answer(answer, final=True)[1]
+
+
+class SingleFlight:
+    """Concurrent do() calls with the same key share one call of the first caller's function."""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+                self._executed += 1
+            else:
+                self._coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self._executed, "coalesced": self._coalesced, "in_flight": len(self._calls)}
+
+
+llm_flight = SingleFlight()
+
+
+def record_llm_answer(question, answer, mapped_question):
+    if mapped_question is None:
+        logging.info(f"LLM found no known question for mapping question (answered {answer.strip()[:20]!r})")
+        mapping_cache.put(question, None)
+        return None
+
+    logging.info(f"LLM mapped question to: {mapped_question}")
+    mapping_cache.put(question, mapped_question)
+    return mapped_question
+
+
+def call_llm(question, timeout=None):
+    try:
+        # Leaving the block closes the connection, so Ollama stops generating
+        # once the ID has been read.
+        with requests.post(LLM_URL, json=llm_payload(question), timeout=timeout or LLM_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            answer, mapped_question = read_llm_stream(response.iter_lines())
+        return record_llm_answer(question, answer, mapped_question)
+
+    except Exception as e:
+        logging.error(f"❌ Error in question_map: {str(e)}")
+        return None
+
+
+def question_map(question, timeout=None):
+    hit, mapped_question = mapping_cache.get(question)
+    if hit:
+        logging.info(f"LLM mapping cache hit: {mapped_question}")
+        return mapped_question
+
+    return llm_flight.do(normalize_question(question), lambda: call_llm(question, timeout))
+
+
+BATCH_ANSWER = re.compile(r"^\s*(\d+)[.):]\s*(.*?)\s*$")
+
+
+def question_map_batch(questions, timeout=None):
+    """question_map for several questions with one LLM call. Returns {question: mapped question or None}."""
+    mapped = {}
+    pending = []
+    for question in dict.fromkeys(questions):
+        hit, mapped_question = mapping_cache.get(question)
+        if hit:
+            mapped[question] = mapped_question
+        else:
+            pending.append(question)
+    if len(pending) == 1:
+        mapped[pending[0]] = question_map(pending[0], timeout=timeout)
+    elif pending:
+        try:
+            response = requests.post(LLM_URL, json=batch_llm_payload(pending), timeout=timeout or LLM_TIMEOUT)
+            response.raise_for_status()
+            record_batch_answers(pending, response.json().get("response", ""), mapped)
+        except Exception as e:
+            logging.error(f"❌ Error in question_map_batch: {str(e)}")
+        # Questions the model skipped stay unmapped (and uncached).
+        for question in pending:
+            mapped.setdefault(question, None)
+    return mapped
+
+
+def record_batch_answers(pending, text, mapped):
+    """Add each numbered answer in a batch response to mapped (and the mapping cache)."""
+    for line in text.splitlines():
+        match = BATCH_ANSWER.match(line)
+        if match and 1 <= int(match.group(1)) <= len(pending):
+            question = pending[int(match.group(1)) - 1]
+            answer = match.group(2)
+            mapped.setdefault(question, record_llm_answer(question, answer, parse_llm_answer(answer, final=True)[1]))
+
+
+# In[ ]:
+
+
+
+
+
+# ### 💾 Persistent LLM Mapping Cache
+
+# 
+
+# An LLM round-trip takes seconds, and users repeat the same phrasings constantly. `MappingCache` remembers what `question_map` answered for each phrasing so the model is only asked about phrasings it has never seen.
+
+# 
+
+# - Questions are normalized (lowercase, punctuation stripped, whitespace collapsed) before lookup.
+
+# - Mappings live in a SQLite file (`MAPPING_CACHE_PATH`), so they survive restarts.
+
+# - "No match" answers are cached too, with a shorter TTL than positive mappings. LLM errors and timeouts are never cached.
+
+# - Entries are tagged with a hash of `known_questions`; changing the question list invalidates old mappings.
+
+# - Once more than `max_entries` are stored, the least recently used are evicted. A hit only rewrites `last_used` once it is `touch_fraction` of the TTL old, so most hits are a read with no write to the shared file; the entry count is kept in memory and re-read from the file every `recount_puts` inserts, since every worker writes to it.
+
+# 
+
+# In[ ]:
+
+
+class MappingCache:
+    def __init__(self, path, catalog, ttl=7 * 24 * 3600, negative_ttl=3600, max_entries=10000,
+                 touch_fraction=0.01, recount_puts=100):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.touch_fraction = touch_fraction
+        self.recount_puts = recount_puts
+        self.catalog = hashlib.sha1("\n".join(catalog).encode("utf-8")).hexdigest()
+        self.path = path
+        self._lock = threading.Lock()
+        self._open()
+        self._count = self._recount()
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS question_map_cache (
+                question TEXT PRIMARY KEY,
+                mapped_question TEXT,
+                catalog TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_question_map_cache_used ON question_map_cache (last_used)")
+        self._conn.commit()
+
+    def _recount(self):
+        self._puts_since_count = 0
+        return self._conn.execute("SELECT COUNT(*) FROM question_map_cache").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def reopen(self):
+        # SQLite connections must not cross a fork; each worker opens its own.
+        with self._lock:
+            self._open()
+
+    def get(self, question):
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mapped_question, catalog, created_at, last_used FROM question_map_cache WHERE question = ?",
+                (key,)
+            ).fetchone()
+            ttl = self.ttl if row is not None and row[0] is not None else self.negative_ttl
+            if row is None or row[1] != self.catalog or now - row[2] >= ttl:
+                self._misses += 1
+                return False, None
+            if now - row[3] >= ttl * self.touch_fraction:
+                self._conn.execute("UPDATE question_map_cache SET last_used = ? WHERE question = ?", (now, key))
+                self._conn.commit()
+            self._hits += 1
+            if row[0] is None:
+                self._negative_hits += 1
+            return True, row[0]
+
+    def put(self, question, mapped_question):
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            existed = self._conn.execute("SELECT 1 FROM question_map_cache WHERE question = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO question_map_cache (question, mapped_question, catalog, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, mapped_question, self.catalog, now, now)
+            )
+            self._count += existed is None
+            self._puts_since_count += 1
+            if self._count > self.max_entries or self._puts_since_count >= self.recount_puts:
+                # Other workers insert into the same file.
+                self._count = self._recount()
+            if self._count > self.max_entries:
+                cursor = self._conn.execute(
+                    "DELETE FROM question_map_cache WHERE question IN ("
+                    "SELECT question FROM question_map_cache ORDER BY last_used ASC LIMIT ?)",
+                    (self._count - self.max_entries,)
+                )
+                self._evictions += cursor.rowcount
+                self._count -= cursor.rowcount
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": self._count,
+                "hits": self._hits,
+                "negative_hits": self._negative_hits,
+                "misses": self._misses,
+                "evictions": self._evictions
+            }
+
+
+MAPPING_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_map_cache.sqlite3")
+
+mapping_cache = MappingCache(MAPPING_CACHE_PATH, known_questions)
+
+
+# In[ ]:
+
+
+
+
+
+# ### 🔎 Fuzzy Matching User Questions to Known Queries
+
+# 
+
+# This function `fuzzy_match_question` attempts to match a user's question to the most similar known question using fuzzy string matching. It scores against every registry phrase (canonical questions and aliases) and returns the canonical question of the best one.
+
+# 
+
+# In[7]:
+
+
+fuzzy_phrases, fuzzy_templates = template_registry.fuzzy_corpus()
+
+def fuzzy_match_question(user_question, threshold=80):
+    if not user_question or not user_question.strip():
+        return None
+        
+    try:
+        best_phrase, score, index = process.extractOne(
+            normalize_question(user_question),
+            fuzzy_phrases,
+            scorer=fuzz.token_set_ratio
+        )
+        best_match = fuzzy_templates[index].question
+        logging.info(f"🔍 Fuzzy match: '{user_question[:30]}' → '{best_match[:30]}' (Score: {score})")
+        return best_match if score >= threshold else None
+        
+    except Exception as e:
+        logging.error(f"⚠️ Fuzzy matching error: {str(e)}")
+        return None
+
+
+# In[ ]:
+
+
+
+
+
+# ### 🧲 Semantic Matching
+
+# 
+
+# RapidFuzz compares characters, so "top run getter" scores poorly against "who scored the most runs across all matches" even though the words overlap. `SemanticIndex` vectorizes every registry phrase (canonical questions and aliases) once at startup:
+
+# 
+
+# - Features are the content words of the normalized phrase plus the character 3- and 4-grams of each word, so "wickets", "wicket" and "wicketkeeper" share features. Slot placeholders such as `{city}` are kept as words.
+
+# - Features are hashed into `SEMANTIC_DIMENSIONS` buckets (CRC32, stable across processes), log-scaled, weighted by IDF over the phrase corpus and L2-normalized.
+
+# - A question is scored against every phrase with one matrix-vector product (cosine similarity); the best phrase's template wins if it scores at least `SEMANTIC_THRESHOLD`.
+
+# 
+
+# The threshold is calibrated with `SemanticIndex.calibrate` on the labelled paraphrase corpus (`python ipl_benchmark.py semantic`), which finds the lowest score above which every match is correct (0.42 on the current corpus). A wrong match returns a wrong answer while escalating only costs time, so `SEMANTIC_THRESHOLD` sits a little above that. Questions below it go on to the LLM.
+
+# 
+
+# In[ ]:
+
+
+SEMANTIC_DIMENSIONS = 1 << 14
+SEMANTIC_THRESHOLD = 0.45
+SEMANTIC_STOPWORDS = frozenset(
+    "a an and are at by did do does for has have how in is many me much of on "
+    "show the there to was were what which who with".split()
+)
+
+
+class SemanticIndex:
+    def __init__(self, phrases, templates, dimensions=SEMANTIC_DIMENSIONS):
+        self.phrases = phrases
+        self.templates = templates
+        self.dimensions = dimensions
+        counts = np.stack([self._counts(phrase) for phrase in phrases])
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(phrases)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.matrix = np.stack([self._weigh(row) for row in counts])
+
+    @staticmethod
+    def features(text):
+        features = []
+        for word in normalize_question(text).split():
+            if word in SEMANTIC_STOPWORDS:
+                continue
+            # Whole words count double: a shared word is stronger evidence than a shared trigram.
+            features += [f"w:{word}", f"w:{word}"]
+            if word.startswith("{"):
+                continue
+            padded = f"<{word}>"
+            features += [f"c:{padded[i:i + n]}" for n in (3, 4) for i in range(len(padded) - n + 1)]
+        return features
+
+    def _counts(self, text):
+        counts = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self.features(text):
+            counts[zlib.crc32(feature.encode()) % self.dimensions] += 1
+        return counts
+
+    def _weigh(self, counts):
+        vector = np.log1p(counts) * self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def scores(self, text):
+        return self.matrix @ self._weigh(self._counts(text))
+
+    def match(self, text):
+        """(template, cosine similarity) of the closest registry phrase."""
+        scores = self.scores(text)
+        best = int(scores.argmax())
+        return self.templates[best], float(scores[best])
+
+    def calibrate(self, labelled, target_precision=1.0):
+        """Lowest threshold at which matches on `labelled` are still `target_precision` correct.
+
+        `labelled` is a list of (text, template name or None); None marks a
+        question that no template answers, so any match for it is wrong.
+        """
+        outcomes = []
+        for text, expected in labelled:
+            template, score = self.match(text)
+            outcomes.append((score, template.name == expected))
+        outcomes.sort(key=lambda outcome: outcome[0], reverse=True)
+        threshold, correct = None, 0
+        for accepted, (score, is_correct) in enumerate(outcomes, 1):
+            correct += is_correct
+            tied_with_next = accepted < len(outcomes) and outcomes[accepted][0] == score
+            if not tied_with_next and correct / accepted >= target_precision:
+                threshold = score
+        return threshold
+
+
+semantic_index = SemanticIndex(fuzzy_phrases, fuzzy_templates)
+
+
+# In[ ]:
+
+
+
+
+
+# ### 🧭 Question Resolution Pipeline
+
+# 
+
+# `resolve_question` runs the user's question through the stages listed in `RESOLUTION_PIPELINE`, cheapest first, and stops at the first stage that produces a template whose slots can be filled from the entities the gazetteer found in the question.
+
+# 
+
+# - `exact` — the question equals a registry phrase after `normalize_question` (case, punctuation, spacing).
+
+# - `contains` — a registry phrase appears inside the question (`template_registry.search`).
+
+# 
+
+# A template can declare `refines=(other template, word)`: when exact, contains or fuzzy_high matches the other template and the word is in the question, the refining one answers (e.g. "bowling" turns `scorecard` into `bowling_scorecard`).
+
+# - `fuzzy_high` — RapidFuzz match at `FUZZY_HIGH_THRESHOLD`; sub-millisecond, so it runs before the LLM.
+
+# - `semantic` — `semantic_index` cosine match at `SEMANTIC_THRESHOLD`; catches paraphrases the character-level matcher misses, in well under a millisecond.
+
+# - `llm` — `question_map` via Ollama; its HTTP timeout is the stage budget.
+
+# - `fuzzy_low` — RapidFuzz match at `FUZZY_LOW_THRESHOLD` on the user question, then on the LLM's answer.
+
+# 
+
+# Each entry is `(stage, budget_ms)`. Reorder, drop or re-budget stages by editing the list. The result records which stage answered and per-stage timings, and `resolution_stats` aggregates them for `GET /stats`.
+
+# 
+
+# In[ ]:
+
+
+FUZZY_HIGH_THRESHOLD = 90
+FUZZY_LOW_THRESHOLD = 80
+
+RESOLUTION_PIPELINE = [
+    ("exact", 5),
+    ("contains", 5),
+    ("fuzzy_high", 25),
+    ("semantic", 10),
+    ("llm", LLM_TIMEOUT * 1000),
+    ("fuzzy_low", 25)
+]
+
+
+def resolve_exact(question, budget_ms, state):
+    template = template_registry.lookup(question) or template_registry.lookup(state["delexicalized"])
+    template = template_registry.refine(template, question)
+    return (None, template) if template else None
+
+
+def resolve_contains(question, budget_ms, state):
+    template = template_registry.search(question) or template_registry.search(state["delexicalized"])
+    template = template_registry.refine(template, question)
+    return (None, template) if template else None
+
+
+def resolve_fuzzy_high(question, budget_ms, state):
+    match = fuzzy_match_question(state["delexicalized"], threshold=FUZZY_HIGH_THRESHOLD)
+    return (match, template_registry.refine(template_registry.lookup(match), question)) if match else None
+
+
+def resolve_semantic(question, budget_ms, state):
+    template, score = semantic_index.match(state["delexicalized"])
+    logging.info(f"🧲 Semantic match: '{question[:30]}' → '{template.question[:30]}' (Score: {score:.3f})")
+    return (template.question, template) if score >= SEMANTIC_THRESHOLD else None
+
+
+def resolve_llm(question, budget_ms, state):
+    return resolve_llm_answer(question_map(question, timeout=budget_ms / 1000), state)
+
+
+def resolve_llm_answer(mapped_question, state):
+    if not mapped_question or mapped_question == "None":
+        logging.info("LLM returned no suitable mapping")
+        return None
+    mapped_question = mapped_question.lower()
+    state["llm_question"] = mapped_question
+    logging.info(f"Mapped question via LLM: {mapped_question}")
+    template = template_registry.match(mapped_question) or template_registry.match(gazetteer.extract(mapped_question)[0])
+    return (mapped_question, template) if template else None
+
+
+def resolve_fuzzy_low(question, budget_ms, state):
+    candidates = [state["delexicalized"]]
+    if state.get("llm_question"):
+        candidates.append(state["llm_question"])
+    for candidate in candidates:
+        match = fuzzy_match_question(candidate, threshold=FUZZY_LOW_THRESHOLD)
+        if match:
+            return match, template_registry.lookup(match)
+    return None
+
+
+RESOLUTION_STAGES = {
+    "exact": resolve_exact,
+    "contains": resolve_contains,
+    "fuzzy_high": resolve_fuzzy_high,
+    "semantic": resolve_semantic,
+    "llm": resolve_llm,
+    "fuzzy_low": resolve_fuzzy_low
+}
+
+
+class ResolutionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._unresolved = 0
+
+    def record(self, resolution):
+        with self._lock:
+            for step in resolution["stages"]:
+                entry = self._stages.setdefault(step["stage"], {
+                    "runs": 0, "answered": 0, "total_ms": 0.0, "max_ms": 0.0, "over_budget": 0
+                })
+                entry["runs"] += 1
+                entry["answered"] += step["matched"]
+                entry["total_ms"] += step["elapsed_ms"]
+                entry["max_ms"] = max(entry["max_ms"], step["elapsed_ms"])
+                entry["over_budget"] += step["elapsed_ms"] > step["budget_ms"]
+            if resolution["stage"] is None:
+                self._unresolved += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "stages": {
+                    name: dict(entry, avg_ms=round(entry["total_ms"] / entry["runs"], 3), total_ms=round(entry["total_ms"], 3))
+                    for name, entry in self._stages.items()
+                },
+                "unresolved": self._unresolved
+            }
+
+
+resolution_stats = ResolutionStats()
+
+
+def bind_stage(stage, resolved, entities):
+    """(resolved, slots) for a stage's answer, or (None, None) if its slots can't be filled."""
+    if not resolved:
+        return None, None
+    slots = resolved[1].bind(entities)
+    if slots is None:
+        logging.info(f"Template {resolved[1].name} matched at stage {stage} but slots {resolved[1].slots} could not be filled")
+        return None, None
+    return resolved, slots
+
+
+def record_step(steps, stage, budget_ms, stage_start, resolved):
+    elapsed_ms = (time.perf_counter() - stage_start) * 1000
+    steps.append({
+        "stage": stage,
+        "elapsed_ms": round(elapsed_ms, 3),
+        "budget_ms": budget_ms,
+        "matched": resolved is not None
+    })
+    if elapsed_ms > budget_ms:
+        logging.warning(f"⏱️ Resolution stage {stage} took {elapsed_ms:.1f}ms (budget {budget_ms}ms)")
+    if resolved:
+        logging.info(f"Resolved question at stage {stage} in {elapsed_ms:.1f}ms")
+
+
+def run_stages(question, stages, state, entities, steps):
+    for stage, budget_ms in stages:
+        stage_start = time.perf_counter()
+        try:
+            resolved = RESOLUTION_STAGES[stage](question, budget_ms, state)
+        except Exception as e:
+            logging.error(f"⚠️ Resolution stage {stage} failed: {e}")
+            resolved = None
+        resolved, slots = bind_stage(stage, resolved, entities)
+        record_step(steps, stage, budget_ms, stage_start, resolved)
+        if resolved:
+            return resolved, slots
+    return None, None
+
+
+def resolve_question(question, pipeline=None):
+    start = time.perf_counter()
+    gazetteer.ensure_loaded(db_pool, data_version.current())
+    delexicalized, entities = gazetteer.extract(question)
+    state = {"delexicalized": delexicalized}
+    steps = []
+    resolved, slots = run_stages(question, pipeline or RESOLUTION_PIPELINE, state, entities, steps)
+    return finish_resolution(start, resolved, slots, steps)
+
+
+def resolve_batch(questions, pipeline=None):
+    """resolve_question for each question, with one LLM call shared by every question that reaches the LLM stage."""
+    pipeline = pipeline or RESOLUTION_PIPELINE
+    gazetteer.ensure_loaded(db_pool, data_version.current())
+    pending, unresolved = begin_batch(questions, pipeline)
+    if unresolved:
+        llm_start = time.perf_counter()
+        budget_ms = pipeline[batch_llm_split(pipeline)][1]
+        mapped = question_map_batch([entry["question"] for entry in unresolved], timeout=budget_ms / 1000)
+        finish_batch(unresolved, mapped, pipeline, llm_start)
+    return [finish_resolution(entry["start"], entry["resolved"], entry["slots"], entry["steps"]) for entry in pending]
+
+
+def batch_llm_split(pipeline):
+    stages = [stage for stage, _ in pipeline]
+    return stages.index("llm") if "llm" in stages else len(pipeline)
+
+
+def begin_batch(questions, pipeline):
+    """Run the stages before the LLM on each question. Returns (entries, entries left for the LLM)."""
+    split = batch_llm_split(pipeline)
+    pending = []
+    for question in questions:
+        start = time.perf_counter()
+        delexicalized, entities = gazetteer.extract(question)
+        entry = {"question": question, "start": start, "state": {"delexicalized": delexicalized},
+                 "entities": entities, "steps": []}
+        entry["resolved"], entry["slots"] = run_stages(question, pipeline[:split], entry["state"], entry["entities"], entry["steps"])
+        pending.append(entry)
+    unresolved = [entry for entry in pending if not entry["resolved"]] if split < len(pipeline) else []
+    return pending, unresolved
+
+
+def finish_batch(unresolved, mapped, pipeline, llm_start):
+    """Bind the shared LLM call's answers, then run the stages after it on questions still unresolved."""
+    split = batch_llm_split(pipeline)
+    budget_ms = pipeline[split][1]
+    for entry in unresolved:
+        try:
+            resolved = resolve_llm_answer(mapped.get(entry["question"]), entry["state"])
+        except Exception as e:
+            logging.error(f"⚠️ Resolution stage llm failed: {e}")
+            resolved = None
+        entry["resolved"], entry["slots"] = bind_stage("llm", resolved, entry["entities"])
+        record_step(entry["steps"], "llm", budget_ms, llm_start, entry["resolved"])
+        if not entry["resolved"]:
+            entry["resolved"], entry["slots"] = run_stages(entry["question"], pipeline[split + 1:], entry["state"], entry["entities"], entry["steps"])
+
+
+def finish_resolution(start, resolved, slots, steps):
+    mapped_question, template = resolved or (None, None)
+    resolution = {
+        "sql": template.sql if template else None,
+        "params": tuple(slots[slot]["value"] for slot in template.params) if template else (),
+        "template": template.name if template else None,
+        "entities": {slot: entity["name"] for slot, entity in slots.items()} if template else {},
+        "mapped_question": mapped_question,
+        "stage": steps[-1]["stage"] if resolved else None,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+        "stages": steps
+    }
+    resolution_stats.record(resolution)
+    return resolution
+
+
+# In[ ]:
+
+
+
+
+
+# ### 🔌 Pooled Database Connections
+
+# 
+
+# Opening a MySQL connection costs a TCP handshake plus authentication, which is often slower than the template query itself. `ConnectionPool` keeps a bounded set of connections open and hands them out to requests.
+
+# 
+
+# - `size` caps how many connections can be open at once.
+
+# - `acquire()` reuses an idle connection when one is available, opens a new one while under `size`, and otherwise waits at most `timeout` seconds before raising `PoolTimeout`.
+
+# - Connections that sat idle longer than `check_after` seconds are health-checked with `SELECT 1` before being handed out; broken ones are discarded and replaced.
+
+# - `stats()` reports in-use/idle counts, wait times, timeouts and connect failures (served on `GET /stats`).
+
+# 
+
+# In[ ]:
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=8, timeout=5.0, check_after=1.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.check_after = check_after
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._created = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._connect_failures = 0
+        self._discarded = 0
+
+    def acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeout(f"No database connection available within {self.timeout}s")
+            waited = time.perf_counter() - start
+            with self._lock:
+                self._waits += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+        return conn
+
+    def release(self, conn, broken=False):
+        with self._lock:
+            self._in_use -= 1
+        if broken:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception as e:
+            self.release(conn, broken=not self.is_query_error(e))
+            raise
+        else:
+            self.release(conn)
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                return self._new_connection()
+            if time.monotonic() - idle_since < self.check_after or self._healthy(conn):
+                return conn
+            logging.warning("♻️ Discarding unhealthy pooled connection")
+            self._discard(conn)
+
+    def _new_connection(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._connect_failures += 1
+            raise
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def _healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def is_query_error(e):
+        # Errors reported by the server for a bad statement leave the
+        # connection usable; anything else (lost connection, driver state)
+        # means it should not go back into the pool.
+        return isinstance(e, ipl_db.QUERY_ERRORS)
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "created": self._created,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "avg_wait_ms": round(self._wait_total / self._waits * 1000, 3) if self._waits else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 3),
+                "timeouts": self._timeouts,
+                "connect_failures": self._connect_failures,
+                "discarded": self._discarded
+            }
+
+
+# In[ ]:
+
+
+
+
+
+# ### 🗃️ Query Result Cache
+
+# 
+
+# Every known question resolves to a fixed SQL template plus slot values, and the data behind it only changes when `ipl_sql_insert.py` commits new matches. `ResultCache` keeps recent results in process so repeat questions skip MySQL entirely.
+
+# 
+
+# - Entries are keyed by the resolved SQL and its parameters, and evicted least-recently-used once `max_bytes` (measured as serialized JSON size) or `max_entries` is exceeded.
+
+# - Ingest bumps the single-row `data_version` table in the same transaction as each match. `DataVersion` re-reads it at most every `poll_interval` seconds, and the cache drops everything when the version moves.
+
+# - Live ball-by-ball ingest (`ipl_sql_insert.py --live`) bumps `live_version` in the same row instead. That drops only the cached results whose SQL reads a ball-level table (`LIVE_TABLES`); match lists and other results survive, and the gazetteer and analytics snapshot are not rebuilt. `DATA_VERSION_POLL_SECONDS` is half a second so a new ball is visible to `/query` within a second.
+
+# - If the version can't be read, results are not cached, so stale data is never served.
+
+# - `stats()` reports hits, misses, evictions, invalidations and bytes held (served on `GET /stats`).
+
+# - On a miss, `/query` and `/query/batch` run the SQL through `query_flight`, a `SingleFlight` keyed by SQL, parameters and data version. When a popular question arrives many times at once, one request runs the query and the others wait for its result instead of each taking a connection. `GET /stats` reports executions and coalesced requests under `query_flight`.
+
+# 
+
+# In[ ]:
+
+
+class DataVersion:
+    def __init__(self, pool, poll_interval=5.0):
+        self._pool = pool
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._live_version = None
+        self._checked_at = None
+
+    def current(self):
+        self._poll()
+        return self._version
+
+    def live(self):
+        """Counter bumped by every live ball-by-ball batch."""
+        self._poll()
+        return self._live_version
+
+    def _poll(self):
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.poll_interval:
+            with self._lock:
+                if self._checked_at is None or time.monotonic() - self._checked_at >= self.poll_interval:
+                    self._version, self._live_version = self._read()
+                    self._checked_at = time.monotonic()
+
+    def _read(self):
+        try:
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT version, live_version FROM data_version WHERE id = 1")
+                row = cursor.fetchone()
+                cursor.close()
+            return tuple(row) if row else (None, None)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not read data_version, result cache bypassed: {e}")
+            return None, None
+
+
+# Tables a live ball-by-ball batch writes (ipl_sql_insert.follow_live).
+LIVE_TABLES = ("deliveries", "wickets", "reviews", "replacements", "innings_totals",
+               "player_match_batting", "player_match_bowling", "partnerships", "venue_match_totals", "powerplay")
+LIVE_TABLES_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+(?:" + "|".join(LIVE_TABLES) + r")\b", re.IGNORECASE)
+
+
+def reads_live_tables(sql):
+    return LIVE_TABLES_PATTERN.search(sql) is not None
+
+
+class ResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=1024):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._live_version = None
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._live_invalidations = 0
+
+    def get(self, key, version, live_version=None):
+        with self._lock:
+            if version is None:
+                self._misses += 1
+                return None
+            self._sync_version(version)
+            self._sync_live_version(live_version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key, version, result, live_version=None):
+        """key is (sql, params); results of SQL reading LIVE_TABLES are dropped when live_version moves."""
+        if version is None:
+            return
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        live = live_version is not None and reads_live_tables(key[0])
+        with self._lock:
+            self._sync_version(version)
+            self._sync_live_version(live_version)
+            if live and live_version != self._live_version:
+                # Read before a ball that has already been applied.
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (result, size, live)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def _sync_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self._invalidations += 1
+                logging.info(f"🗃️ Data version {self._version} → {version}, dropping {len(self._entries)} cached results")
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def _sync_live_version(self, live_version):
+        if live_version is None or (self._live_version is not None and live_version <= self._live_version):
+            return
+        stale = [key for key, (_, _, live) in self._entries.items() if live]
+        if stale:
+            self._live_invalidations += 1
+            logging.info(f"🗃️ Live version {self._live_version} → {live_version}, dropping {len(stale)} cached results")
+        for key in stale:
+            self._bytes -= self._entries.pop(key)[1]
+        self._live_version = live_version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "live_invalidations": self._live_invalidations,
+                "data_version": self._version,
+                "live_version": self._live_version
+            }
+
+
+# In[ ]:
+
+
+
+
+
+# ### 🧮 In-Memory Analytics Engine
+
+# 
+
+# `ipl_analytics.AnalyticsEngine` answers every template from NumPy/pandas columns instead of MySQL: deliveries, wickets, match_detail and powerplay are loaded once, with players, teams and matches integer-encoded, and each template is a vectorized group-by returning the same columns as its SQL.
+
+# 
+
+# - `/query` uses it when the request body has `"engine": "analytics"`, or for every request when `QUERY_ENGINE = "analytics"`.
+
+# - `AnalyticsSnapshot` loads the engine on first use and rebuilds it when `data_version` moves, so it never answers from older data than the SQL path would. It reads the tables from the corpus snapshot when one is mapped at that version, and from SQL otherwise.
+
+# - Live balls only move `live_version`, which doesn't trigger a rebuild: during a live match the analytics engine answers as of the last whole-match load, so ask the SQL engine for in-progress matches.
+
+# - Answers skip the result cache; the engine is already in memory.
+
+# - `python ipl_benchmark.py analytics` checks every template against the SQL path and compares latencies.
+
+# 
+
+# In[ ]:
+
+
+class AnalyticsSnapshot:
+    def __init__(self, pool):
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._engine = None
+        self._version = None
+        self._source = None
+        self._loads = 0
+        self._answers = 0
+
+    def get(self, version):
+        with self._lock:
+            if self._engine is None or (version is not None and version != self._version):
+                snapshot = corpus_snapshot_at(version)
+                if snapshot is not None:
+                    self._engine = AnalyticsEngine(snapshot.tables())
+                    self._source = "snapshot"
+                else:
+                    with self._pool.connection() as conn:
+                        self._engine = AnalyticsEngine.from_connection(conn)
+                    self._source = "database"
+                self._version = version
+                self._loads += 1
+                logging.info(f"🧮 Analytics engine loaded from {self._source} at data version {version} in {self._engine.load_seconds:.2f}s")
+            return self._engine
+
+    def answer(self, version, template_name, params):
+        engine = self.get(version)
+        result = engine.answer(template_name, params)
+        with self._lock:
+            self._answers += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": self._engine is not None,
+                "data_version": self._version,
+                "source": self._source,
+                "loads": self._loads,
+                "answers": self._answers,
+                "load_seconds": round(self._engine.load_seconds, 3) if self._engine else None
+            }
+
+
+# In[ ]:
+
+
+
+
+
+# ### 🗃️ Corpus Snapshot
+
+# 
+
+# `python ipl_snapshot.py --output ipl_data.snapshot` writes the tables the gazetteer and the analytics engine read into one columnar file: numbers in their smallest dtype, strings dictionary-encoded, every column a contiguous array. `--snapshot PATH` memory-maps it at startup.
+
+# 
+
+# - While the file holds the current `data_version`, the gazetteer and the analytics engine are built from the mapped columns instead of their SQL. Nothing is parsed or fetched; numeric columns and codes are views of the mapping.
+
+# - The mapping is file-backed and read-only, so its pages sit in the page cache once, shared by the parent, every forked worker and any other process that maps the same file.
+
+# - Once a load moves `data_version` past the snapshot, both rebuild from SQL as before. Re-exporting replaces the file atomically, and the next rebuild maps the new one.
+
+# - If the database is unreachable (no `data_version`), both are built from the snapshot anyway.
+
+# - `python ipl_benchmark.py snapshot` compares startup time and memory with loading the same tables through SQL.
+
+# 
+
+# In[ ]:
+
+
+corpus_snapshot = None
+corpus_snapshot_lock = threading.Lock()
+
+
+def use_snapshot(path):
+    """Map the corpus snapshot at path for the gazetteer and analytics engine."""
+    global corpus_snapshot
+    corpus_snapshot = ipl_snapshot.Snapshot(path)
+    logging.info(f"🗃️ Mapped corpus snapshot {corpus_snapshot.describe()}")
+
+
+def corpus_snapshot_at(version):
+    """The mapped snapshot if it holds data_version `version` (any, when that is unknown), else None."""
+    global corpus_snapshot
+    with corpus_snapshot_lock:
+        if corpus_snapshot is None:
+            return None
+        if version is not None and corpus_snapshot.version != version and corpus_snapshot.replaced():
+            try:
+                corpus_snapshot = ipl_snapshot.Snapshot(corpus_snapshot.path)
+                logging.info(f"🗃️ Remapped corpus snapshot {corpus_snapshot.describe()}")
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️ Could not remap corpus snapshot: {e}")
+        if version is None or corpus_snapshot.version == version:
+            return corpus_snapshot
         return None
 
 
+# In[ ]:
+
+
+
+
+
+# ### 📈 Request Timing and Metrics
+
+# 
+
+# Every `/query` request records how long it spent in each stage:
+
+# 
+
+# - `parse`: reading and validating the request body.
+
+# - `direct_map`: the `exact` and `contains` resolution stages.
+
+# - `fuzzy`: the `fuzzy_high`, `semantic` and `fuzzy_low` resolution stages.
+
+# - `llm`: waiting on Ollama (`question_map`).
+
+# - `db_connect`: checking a connection out of `db_pool`, including connecting.
+
+# - `sql_execute` / `fetch`: running the statement / reading its rows.
+
+# - `analytics`: answering from the in-memory engine.
+
+# - `serialize`: building the JSON response.
+
+# 
+
+# - The timings feed Prometheus histograms served on `GET /metrics`, labelled by `template` and by `resolved_by` (the resolution stage that answered).
+
+# - The buckets live in shared memory created before the launcher forks, so every worker adds to the same series and any worker can answer a scrape.
+
+# - Send `X-IPL-Timing: 1` with a request to get its breakdown back as `timing` in the JSON response.
+
+# 
+
+# In[ ]:
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+TIMING_STAGES = ("parse", "direct_map", "fuzzy", "llm", "db_connect", "sql_execute", "fetch", "analytics", "serialize")
+
+RESOLUTION_TIMING_STAGES = {
+    "exact": "direct_map",
+    "contains": "direct_map",
+    "fuzzy_high": "fuzzy",
+    "semantic": "fuzzy",
+    "fuzzy_low": "fuzzy",
+    "llm": "llm"
+}
+
+
+class RequestTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - stage_start)
+
+    def add_resolution(self, resolution):
+        for step in resolution["stages"]:
+            self.add(RESOLUTION_TIMING_STAGES.get(step["stage"], step["stage"]), step["elapsed_ms"] / 1000)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def report(self):
+        return {
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+            "total_ms": round(self.elapsed() * 1000, 3)
+        }
+
+
+class SharedHistogram:
+    """Prometheus histogram over a fixed label space, kept in shared memory.
+
+    Created before the launcher forks, so all workers add into the same
+    buckets. Observations with label values outside the space are dropped.
+    """
+
+    def __init__(self, name, documentation, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = list(labels)
+        self.buckets = buckets
+        self._series = list(itertools.product(*labels.values()))
+        self._index = {series: i for i, series in enumerate(self._series)}
+        # Per series: a count per bucket plus +Inf, then the sum.
+        self._width = len(buckets) + 2
+        self._values = multiprocessing.RawArray("d", len(self._series) * self._width)
+        self._lock = multiprocessing.Lock()
+
+    def observe(self, seconds, **labels):
+        index = self._index.get(tuple(labels[name] for name in self.label_names))
+        if index is None:
+            return
+        base = index * self._width
+        with self._lock:
+            self._values[base + bisect.bisect_left(self.buckets, seconds)] += 1
+            self._values[base + self._width - 1] += seconds
+
+    def render(self):
+        with self._lock:
+            values = self._values[:]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bounds = [repr(b) for b in self.buckets] + ["+Inf"]
+        for series, index in self._index.items():
+            counts = values[index * self._width:(index + 1) * self._width]
+            total = sum(counts[:-1])
+            if not total:
+                continue
+            labels = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, series))
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {int(cumulative)}')
+            lines.append(f"{self.name}_sum{{{labels}}} {counts[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {int(total)}")
+        return "\n".join(lines)
+
+
+class RequestMetrics:
+    def __init__(self, templates, resolution_stages):
+        labels = {"template": list(templates) + ["none"], "resolved_by": list(resolution_stages) + ["none"]}
+        self.requests = SharedHistogram(
+            "ipl_query_seconds", "Time to answer a /query request.", labels
+        )
+        self.stages = SharedHistogram(
+            "ipl_query_stage_seconds", "Time a /query request spent in each stage.",
+            dict(stage=list(TIMING_STAGES), **labels)
+        )
+
+    def observe(self, timer, resolution):
+        template = resolution["template"] if resolution and resolution["template"] else "none"
+        resolved_by = resolution["stage"] if resolution and resolution["stage"] else "none"
+        self.requests.observe(timer.elapsed(), template=template, resolved_by=resolved_by)
+        for stage, seconds in timer.stages.items():
+            self.stages.observe(seconds, stage=stage, template=template, resolved_by=resolved_by)
+
+    def render(self):
+        return self.requests.render() + "\n" + self.stages.render() + "\n"
+
+
+request_metrics = RequestMetrics([template.name for template in TEMPLATES], RESOLUTION_STAGES)
+
+
+# In[ ]:
+
+
+
+
+
+# # 🚀 Full Flask API for Translating Natural Language to SQL Queries
+
+# 
+
+# This script implements a Flask API that accepts natural language questions, maps them to SQL queries for a MySQL cricket database (`cric_data`), executes those queries, and returns JSON results.
+
+# 
+
+# ---
+
+# 
+
+# ## ✅ 1. App Initialization
+
+# - Creates a Flask app instance via `Flask(__name__)`.
+
+# - Defines `db_config` with parameters for connecting to the MySQL `cric_data` database.
+
+# - `db_backend` (see `ipl_db.py`) decides where connections come from: MySQL by default, or with `--sqlite PATH` an embedded SQLite file opened read-only and memory-mapped, so a query never leaves the process and no database server has to be running.
+
+# 
+
+# ---
+
+# 
+
+# ## 🔁 2. Question to SQL Mapping (`map_question_to_sql`)
+
+# - Maps user questions to predefined SQL queries through `template_registry` (see the Query Template Registry above).
+
+# - Matches the whole normalized question first, then the longest template phrase or alias contained in it.
+
+# - Leaderboard templates read the summary tables (`innings_totals`, `player_match_batting`, `player_match_bowling`, `partnerships`, `venue_match_totals`) that `ipl_sql_insert.py` maintains per match during ingest, rather than grouping the whole `deliveries` table on every call.
+
+# - Returns `None` if no exact mapping is found.
+
+# 
+
+# ---
+
+# 
+
+# ## 🧠 3. Question Resolution Logic (inside `/query` POST endpoint)
+
+# - Receives a JSON POST with a `"question"` key.
+
+# - Runs `resolve_question()` (see the Question Resolution Pipeline above), which tries, in `RESOLUTION_PIPELINE` order:
+
+#   1. **Direct Mapping:** Look the normalized question up in the template registry, then search it for a contained template phrase.
+
+#   2. **High-Confidence Fuzzy Matching:** A strict `fuzzy_match_question()` match, then a `semantic_index` match above its calibrated threshold, before paying for the LLM.
+
+#   3. **LLM-Based Mapping:** Sends the user question to a local LLM API (`question_map()`) which attempts to find the closest known question phrasing, then tries SQL mapping again.
+
+#   4. **Fuzzy Matching:** If the LLM returns no match, a looser fuzzy match on the user question and on the LLM's answer.
+
+#   5. If no SQL query is found after all steps, returns HTTP 400 with an error message.
+
+# - The response's `resolution` field names the stage that answered and the time spent in each stage.
+
+# 
+
+# ---
+
+# 
+
+# ## 🗄️ 4. SQL Execution
+
+# - Borrows a connection from `db_pool` (a `ConnectionPool` around `db_backend`).
+
+# - Serves the result from `result_cache` when the same SQL was answered at the current data version.
+
+# - Otherwise executes the template SQL as a server-side prepared statement (`run_sql`) with the slot values as parameters, fetches results as dictionaries and caches them.
+
+# - With `"limit"` in the request, returns one page of at most `limit` rows (capped at `MAX_PAGE_ROWS`) and a `page.next_cursor` token; sending the same question with `"cursor"` returns the next page. Templates that declare a `keyset` (their unique ORDER BY columns) are paged in SQL: the cursor carries the last row's key and the next page's statement seeks past it, so a deep page costs the same as the first. Templates without one return a handful of rows and are sliced from the cached result. Cursors are pinned to the data version they were issued at; after an ingest they return HTTP 410.
+
+# - With `"stream": true`, writes the result as NDJSON (`{"meta": ...}`, one `{"row": ...}` per row, then `{"end": {"rows": n}}`), reading rows from an unbuffered cursor `STREAM_BATCH_ROWS` at a time as they arrive from MySQL.
+
+# - Returns the connection to the pool for the next request.
+
+# - With `"engine": "analytics"` in the request (or `QUERY_ENGINE = "analytics"`), answers from the in-memory `AnalyticsEngine` instead of running the SQL.
+
+# - Returns a JSON response containing:
+
+#   - The original user question.
+
+#   - The SQL query used (for debugging/clarity).
+
+#   - The query results.
+
+# - If SQL execution fails, returns HTTP 500 with the error message; if no pooled connection frees up within `DB_POOL_TIMEOUT`, returns HTTP 503.
+
+# 
+
+# ---
+
+# 
+
+# ## 🧵 5. Running the Flask API
+
+# - `main()` starts the pre-fork launcher, `serve()`: the parent preloads the templates, fuzzy-match corpus, gazetteer and (with `--preload-analytics`) the analytics engine, binds the port once and forks `--workers` processes. Each worker serves the app on `--threads` request threads (`ThreadPoolWSGIServer`), answers `/healthz` and `/readyz`, and drains in-flight requests on SIGTERM; the parent restarts any worker that dies.
+
+# - `--dev` runs `run_flask()` instead: Flask's built-in server in one process with debugging enabled, for local development only.
+
+# 
+
+# ---
+
+# 
+
+# ## 🧩 Overall Workflow
+
+# - The API transforms flexible natural language questions into structured SQL commands by layering:
+
+#   - Direct keyword matching
+
+#   - Semantic LLM mapping
+
+#   - Fuzzy string matching
+
+# - This layered approach allows users to ask cricket-related questions in natural language and get accurate database responses.
+
+# ata using flexible natural language queries.
+
+# 
+
+# In[9]:
+
+
+app = Flask(__name__)
+
+db_config = {
+    "host": "127.0.0.1",
+    "port": 3306,
+    "user": "root",
+    "password": "xyz",
+    "database": "ipl_data",
+    "ssl_disabled": True
+}
+
+# MySQL at db_config; main() switches to ipl_db.SQLiteBackend with --sqlite.
+db_backend = ipl_db.MySQLBackend(db_config)
+
+DB_POOL_SIZE = 8
+DB_POOL_TIMEOUT = 5.0
+
+# autocommit keeps pooled connections from holding a REPEATABLE READ
+# snapshot open between requests, so reused connections see new data.
+db_pool = ConnectionPool(
+    lambda: db_backend.connect(autocommit=True, read_only=True),
+    size=DB_POOL_SIZE,
+    timeout=DB_POOL_TIMEOUT
+)
+
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# One primary-key read per interval; short enough that a live ball is
+# queryable well within a second of its commit.
+DATA_VERSION_POLL_SECONDS = 0.5
+
+data_version = DataVersion(db_pool, poll_interval=DATA_VERSION_POLL_SECONDS)
+result_cache = ResultCache(max_bytes=RESULT_CACHE_MAX_BYTES)
+query_flight = SingleFlight()
+
+# "sql" runs template SQL on MySQL; "analytics" answers from the in-memory
+# engine. Requests can override this with {"engine": ...}.
+QUERY_ENGINE = "sql"
+QUERY_ENGINES = ("sql", "analytics")
+
+analytics = AnalyticsSnapshot(db_pool)
+
+# Runs a batch's distinct queries side by side; no more threads than
+# pooled connections.
+MAX_BATCH_QUESTIONS = 50
+batch_executor = ThreadPoolExecutor(DB_POOL_SIZE, thread_name_prefix="batch")
+
+
+def map_question_to_sql(question):
+    template = template_registry.match(question)
+    return template.sql if template else None
+
+
+# Server-side prepared statements live per connection. Keeping one prepared
+# cursor per template SQL on each pooled connection lets MySQL reuse the
+# statement (and its plan) for every call that only changes parameters.
+prepared_cursors = weakref.WeakKeyDictionary()
+
+
+def run_sql(conn, sql_query, params=(), timer=None):
+    statements = prepared_cursors.setdefault(conn, {})
+    entry = statements.get(sql_query)
+    if entry is None:
+        # The cursor re-prepares whenever it sees a different string object,
+        # so keep the stripped statement text alongside it.
+        entry = statements[sql_query] = (conn.cursor(prepared=True, dictionary=True), sql_query.strip().rstrip(";"))
+    cursor, statement = entry
+    try:
+        execute_start = time.perf_counter()
+        cursor.execute(statement, params)
+        fetch_start = time.perf_counter()
+        rows = cursor.fetchall()
+        if timer is not None:
+            timer.add("sql_execute", fetch_start - execute_start)
+            timer.add("fetch", time.perf_counter() - fetch_start)
+        return rows
+    except Exception:
+        statements.pop(sql_query, None)
+        raise
+
+
+# Templates with a keyset are paged in SQL, seeking past the last row the
+# cursor saw. The rest return a handful of rows (a top-N, an aggregate, one
+# player's line), so their pages are sliced from the cached result.
+MAX_PAGE_ROWS = 1000
+STREAM_BATCH_ROWS = 500
+
+
+def encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if (isinstance(state, dict) and isinstance(state.get("offset"), int) and isinstance(state.get("limit"), int)
+                and isinstance(state.get("after"), (list, type(None)))):
+            return state
+    except (ValueError, TypeError):
+        pass
+    return None
+
+
+def paging_options(body):
+    """(stream, limit, cursor state, error) from a /query body; error is (message, status) or None."""
+    stream = bool(body.get("stream", False))
+    limit = body.get("limit")
+    token = body.get("cursor")
+    state = None
+    if token is not None:
+        state = decode_cursor(token) if isinstance(token, str) else None
+        if state is None:
+            return stream, limit, None, ("Invalid cursor", 400)
+        limit = limit if limit is not None else state["limit"]
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_PAGE_ROWS):
+        return stream, limit, state, (f"limit must be an integer between 1 and {MAX_PAGE_ROWS}", 400)
+    if stream and limit is not None:
+        return stream, limit, state, ("Use either stream or limit/cursor, not both", 400)
+    return stream, limit, state, None
+
+
+def cursor_error(state, template, params, version):
+    """Why a cursor can't continue this query, as (message, status); None if it can."""
+    if state.get("template") != template.name or state.get("params") != list(params):
+        return "Cursor was issued for a different question", 400
+    if state.get("after") is not None and len(state["after"]) != len(template.keyset):
+        return "Invalid cursor", 400
+    if state.get("version") != version:
+        return "Data changed since this cursor was issued; request the first page again", 410
+    return None
+
+
+def page_query(template, params, limit, state):
+    """(SQL, params) reading the next page plus one row of a template with a keyset."""
+    sql_query, key_params = template.page(state.get("after") if state else None)
+    # One extra row tells whether there is a next page.
+    return sql_query, params + key_params + (limit + 1,)
+
+
+def slice_page(result, limit, state):
+    """The next page plus one row, cut from a full result."""
+    offset = state["offset"] if state else 0
+    return result[offset:offset + limit + 1]
+
+
+def page_of(rows, limit, state, template, params, version):
+    """(page rows, page metadata) from the next page plus one row."""
+    offset = state["offset"] if state else 0
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, {
+        "offset": offset,
+        "limit": limit,
+        "rows": len(rows),
+        "next_cursor": encode_cursor({
+            "template": template.name,
+            "params": list(params),
+            "version": version,
+            "offset": offset + limit,
+            "limit": limit,
+            "after": template.page_key(rows[-1]) if template.keyset else None
+        }) if has_more else None
+    }
+
+
+def stream_sql(conn, sql_query, params=(), batch_rows=STREAM_BATCH_ROWS):
+    """Execute on an unbuffered cursor and return an iterator over its rows.
+
+    The statement runs before this returns, so SQL errors surface before
+    any response is sent; rows are then read from the socket batch_rows at
+    a time as the iterator is consumed.
+    """
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(sql_query.strip().rstrip(";"), params)
+
+    def rows():
+        while True:
+            batch = cursor.fetchmany(batch_rows)
+            if not batch:
+                break
+            yield from batch
+        cursor.close()
+    return rows()
+
+
+def ndjson_response(meta, rows, release=None):
+    def generate():
+        count = 0
+        complete = False
+        try:
+            yield app.json.dumps({"meta": meta}) + "\n"
+            for row in rows:
+                yield app.json.dumps({"row": row}) + "\n"
+                count += 1
+            yield app.json.dumps({"end": {"rows": count}}) + "\n"
+            complete = True
+        except ipl_db.ERRORS as err:
+            logging.error(f"Database error while streaming: {err}")
+            yield app.json.dumps({"error": str(err)}) + "\n"
+        finally:
+            # A connection left with unread rows (client went away, or an
+            # error) can't be reused.
+            if release is not None:
+                release(complete)
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+TIMING_HEADER = "X-IPL-Timing"
+TIMED_ENDPOINTS = {"query"}
+
+
+@app.before_request
+def start_timer():
+    g.timer = RequestTimer()
+
+
+@app.after_request
+def record_timing(response):
+    if request.endpoint in TIMED_ENDPOINTS:
+        request_metrics.observe(g.timer, g.get("resolution"))
+    return response
+
+
+def respond(body, status=200):
+    """jsonify, timed as the request's serialize stage.
+
+    When the client sent TIMING_HEADER the body carries the timing
+    breakdown, which covers everything up to serialization; the serialize
+    stage itself only reaches /metrics.
+    """
+    if request.headers.get(TIMING_HEADER):
+        body = dict(body, timing=g.timer.report())
+    with g.timer.stage("serialize"):
+        response = jsonify(body)
+    response.status_code = status
+    return response
+
+
+def fetch_result(sql_query, params, version, timer=None):
+    """Result of a template query: from the cache, or from one execution shared by every concurrent identical request.
+
+    Returns (result, source), where source is "cache", "database" or "coalesced".
+    """
+    live_version = data_version.live()
+    result = result_cache.get((sql_query, params), version, live_version)
+    if result is not None:
+        return result, "cache"
+
+    executed = False
+
+    def execute():
+        nonlocal executed
+        executed = True
+        acquire_start = time.perf_counter()
+        with db_pool.connection() as conn:
+            if timer is not None:
+                timer.add("db_connect", time.perf_counter() - acquire_start)
+            rows = run_sql(conn, sql_query, params, timer)
+        result_cache.put((sql_query, params), version, rows, live_version)
+        return rows
+
+    wait_start = time.perf_counter()
+    result = query_flight.do((sql_query, params, version, live_version), execute)
+    if executed:
+        return result, "database"
+    if timer is not None:
+        # Time spent waiting on another request's execution.
+        timer.add("sql_execute", time.perf_counter() - wait_start)
+    return result, "coalesced"
+
+
 @app.route("/query", methods=["POST"])
 def query():
+    timer = g.timer
     user_question = request.json.get("question")
     logging.info(f"Received question: {user_question}")
 
     if not user_question:
         logging.warning("No question provided in request")
-        return jsonify({"error": "No question provided"}), 400
+        return respond({"error": "No question provided"}, 400)
 
-    sql_query = map_question_to_sql(user_question)
-    mapped_question = None
+    engine = request.json.get("engine", QUERY_ENGINE)
+    if engine not in QUERY_ENGINES:
+        return respond({"error": f"Unknown engine {engine!r}, expected one of {list(QUERY_ENGINES)}"}, 400)
 
-    if not sql_query:
-        logging.info("No direct SQL mapping found, calling question_map")
-        mapped_question = question_map(user_question)
-        if mapped_question and mapped_question != "None":
-            mapped_question = mapped_question.lower()
-            logging.info(f"Mapped question via LLM: {mapped_question}")
-            sql_query = map_question_to_sql(mapped_question)
-        else:
-            logging.info("LLM returned no suitable mapping")
+    stream, limit, cursor_state, error = paging_options(request.json)
+    if error:
+        message, status = error
+        return respond({"error": message}, status)
+    timer.add("parse", time.perf_counter() - timer.start)
 
-    if not sql_query:
-        logging.info("Trying fuzzy matching on user question")
-        fuzzy_match_user = fuzzy_match_question(user_question)
-        if fuzzy_match_user:
-            logging.info(f"Fuzzy matched user question to: {fuzzy_match_user}")
-            sql_query = map_question_to_sql(fuzzy_match_user)
-
-        if not sql_query and mapped_question:
-            logging.info("Trying fuzzy matching on mapped question")
-            fuzzy_match_mapped = fuzzy_match_question(mapped_question)
-            if fuzzy_match_mapped:
-                logging.info(f"Fuzzy matched mapped question to: {fuzzy_match_mapped}")
-                sql_query = map_question_to_sql(fuzzy_match_mapped)
+    resolution = resolve_question(user_question)
+    timer.add_resolution(resolution)
+    g.resolution = resolution
+    sql_query = resolution.pop("sql")
+    params = resolution.pop("params")
+    mapped_question = resolution["mapped_question"]
 
     if not sql_query:
         logging.error("Unable to map question to SQL")
-        return jsonify({"error": "Sorry, I don't understand that question yet."}), 400
+        return respond({
+            "error": "Sorry, I don't understand that question yet.",
+            "resolution": resolution
+        }, 400)
 
     try:
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(sql_query)
-        result = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        logging.info(f"Successfully executed query for question: {user_question}")
-        return jsonify({
+        version = data_version.current()
+        template = template_registry.get(resolution["template"])
+        if cursor_state is not None:
+            error = cursor_error(cursor_state, template, params, version)
+            if error:
+                message, status = error
+                return respond({"error": message}, status)
+
+        response = {
             "question": user_question,
             "mapped_question": mapped_question,
-            "result": result
-        })
+            "resolution": resolution,
+            "engine": engine
+        }
+
+        # Templates the engine doesn't implement yet still go to MySQL.
+        if engine == "analytics" and AnalyticsEngine.supports(resolution["template"]):
+            with timer.stage("analytics"):
+                result = analytics.answer(version, resolution["template"], params)
+            logging.info(f"Answered from analytics engine for question: {user_question}")
+            if stream:
+                return ndjson_response(response, iter(result))
+            if limit is not None:
+                result = slice_page(result, limit, cursor_state)
+
+        elif stream:
+            result = result_cache.get((sql_query, params), version, data_version.live())
+            if result is not None:
+                logging.info(f"Streaming cached result for question: {user_question}")
+                return ndjson_response(response, iter(result))
+            with timer.stage("db_connect"):
+                conn = db_pool.acquire()
+            try:
+                with timer.stage("sql_execute"):
+                    rows = stream_sql(conn, sql_query, params)
+            except Exception as e:
+                db_pool.release(conn, broken=not ConnectionPool.is_query_error(e))
+                raise
+            logging.info(f"Streaming result for question: {user_question}")
+            return ndjson_response(response, rows, lambda complete: db_pool.release(conn, broken=not complete))
+
+        elif limit is not None and template.keyset:
+            result, _ = fetch_result(*page_query(template, params, limit, cursor_state), version, timer)
+
+        else:
+            result, source = fetch_result(sql_query, params, version, timer)
+            if source == "cache":
+                logging.info(f"Served cached result for question: {user_question}")
+            elif source == "coalesced":
+                logging.info(f"Shared an in-flight query's result for question: {user_question}")
+            else:
+                logging.info(f"Successfully executed query for question: {user_question}")
+            if limit is not None:
+                result = slice_page(result, limit, cursor_state)
+
+        if limit is not None:
+            result, response["page"] = page_of(result, limit, cursor_state, template, params, version)
+        response["result"] = result
+        return respond(response)
+
+    except PoolTimeout as err:
+        logging.error(f"Connection pool exhausted: {err}")
+        return respond({"error": str(err)}, 503)
+
+    except ipl_db.ERRORS as err:
+        logging.error(f"Database error: {err}")
+        return respond({"error": str(err)}, 500)
+
+
+def execute_query(engine, template_name, sql_query, params, version):
+    """Answer one resolved template. Returns (result, served_from_cache)."""
+    if engine == "analytics" and AnalyticsEngine.supports(template_name):
+        return analytics.answer(version, template_name, params), False
+    result, source = fetch_result(sql_query, params, version)
+    return result, source == "cache"
+
+
+def batch_request_error(body):
+    """Why a /query/batch body is invalid, or None."""
+    questions = body.get("questions")
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+        return "questions must be a non-empty list of questions"
+    if len(questions) > MAX_BATCH_QUESTIONS:
+        return f"At most {MAX_BATCH_QUESTIONS} questions per batch"
+    engine = body.get("engine", QUERY_ENGINE)
+    if engine not in QUERY_ENGINES:
+        return f"Unknown engine {engine!r}, expected one of {list(QUERY_ENGINES)}"
+    return None
+
+
+def batch_jobs(resolutions):
+    """(template, params) -> SQL; questions that resolve to the same template and params share one query."""
+    jobs = {}
+    for resolution in resolutions:
+        if resolution["sql"]:
+            jobs.setdefault((resolution["template"], resolution["params"]), resolution["sql"])
+    return jobs
+
+
+def batch_response(questions, resolutions, engine, jobs, outcomes, start, resolve_ms, execute_ms):
+    results = []
+    for question, resolution in zip(questions, resolutions):
+        sql_query = resolution.pop("sql")
+        params = resolution.pop("params")
+        entry = {
+            "question": question,
+            "mapped_question": resolution["mapped_question"],
+            "resolution": resolution,
+            "engine": engine
+        }
+        if not sql_query:
+            entry.update(error="Sorry, I don't understand that question yet.", status=400)
+        else:
+            entry.update(outcomes[(resolution["template"], params)])
+        results.append(entry)
+
+    return {
+        "results": results,
+        "batch": {
+            "questions": len(questions),
+            "resolved": sum(1 for r in resolutions if r["template"]),
+            "llm_questions": sum(1 for r in resolutions if any(step["stage"] == "llm" for step in r["stages"])),
+            "distinct_queries": len(jobs),
+            "resolve_ms": round(resolve_ms, 3),
+            "execute_ms": round(execute_ms, 3),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+    }
+
+
+@app.route("/query/batch", methods=["POST"])
+def query_batch():
+    start = time.perf_counter()
+    error = batch_request_error(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+    questions = request.json["questions"]
+    engine = request.json.get("engine", QUERY_ENGINE)
+    logging.info(f"Received batch of {len(questions)} questions")
+
+    resolutions = resolve_batch(questions)
+    resolve_ms = (time.perf_counter() - start) * 1000
+    version = data_version.current()
+    jobs = batch_jobs(resolutions)
+
+    def run(key):
+        job_start = time.perf_counter()
+        outcome = {}
+        try:
+            outcome["result"], outcome["cached"] = execute_query(engine, key[0], jobs[key], key[1], version)
+        except PoolTimeout as err:
+            logging.error(f"Connection pool exhausted: {err}")
+            outcome.update(error=str(err), status=503)
+        except ipl_db.ERRORS as err:
+            logging.error(f"Database error: {err}")
+            outcome.update(error=str(err), status=500)
+        outcome["execute_ms"] = round((time.perf_counter() - job_start) * 1000, 3)
+        return outcome
+
+    execute_start = time.perf_counter()
+    outcomes = dict(zip(jobs, batch_executor.map(run, jobs)))
+    execute_ms = (time.perf_counter() - execute_start) * 1000
+    return jsonify(batch_response(questions, resolutions, engine, jobs, outcomes, start, resolve_ms, execute_ms))
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(request_metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "pool": db_pool.stats(),
+        "cache": result_cache.stats(),
+        "mapping_cache": mapping_cache.stats(),
+        "query_flight": query_flight.stats(),
+        "llm": llm_flight.stats(),
+        "resolution": resolution_stats.stats(),
+        "analytics": analytics.stats()
+    })
+
+
+# In[ ]:
+
+
+
+
+
+# ### 🚦 Pre-fork Launcher, Health and Readiness
+
+# 
+
+# `python ipl_mcp_server.py --workers 4` runs the API as a pre-forked multi-process server instead of Flask's dev server.
+
+# 
+
+# - The parent process builds the template registry and fuzzy corpus (at import), loads the gazetteer (and with `--preload-analytics` the analytics engine), then calls `gc.freeze()` and forks. Workers share that state copy-on-write instead of each loading their own. With `--snapshot`, both are built from the mapped corpus snapshot.
+
+# - Every worker accepts on the same listening socket and serves requests on a pool of `--threads` threads. A worker that dies is restarted.
+
+# - `SIGTERM` (or Ctrl-C) makes each worker stop accepting, fail `/readyz`, and finish in-flight requests for up to `--drain-timeout` seconds before exiting.
+
+# - `GET /healthz` is liveness: it answers while the process can serve, with its pid, startup time and memory. `GET /readyz` answers 503 until state is preloaded, while draining, or when the database is unreachable.
+
+# - Each worker logs how long it took from fork to serving and its RSS, split into shared and private pages.
+
+# - `--dev` keeps the old single-process debug server.
+
+# 
+
+# In[ ]:
+
 
-    except mysql.connector.Error as err:
-        logging.error(f"MySQL error: {err}")
-        return jsonify({"error": str(err)}), 500
+WORKER_THREADS = 8
+DRAIN_TIMEOUT = 30.0
 
 
+class ServingState:
+    def __init__(self):
+        self.worker = None
+        self.preloaded = False
+        self.draining = False
+        self.started_at = time.monotonic()
+        self.startup_ms = None
 
-def run_flask():
-    app.run(debug=True, port=5000, use_reloader=False)
 
-Thread(target=run_flask).start()
+serving = ServingState()
+
+
+def memory_usage():
+    """RSS of this process, split into pages shared with other workers and private ones."""
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        # No /proc (macOS): only the peak RSS is available.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"max_rss_bytes": peak if os.uname().sysname == "Darwin" else peak * 1024}
+    return {
+        "rss_bytes": fields.get("Rss"),
+        "pss_bytes": fields.get("Pss"),
+        "shared_bytes": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_bytes": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+def format_memory(memory):
+    if "rss_bytes" not in memory:
+        return f"max RSS {memory['max_rss_bytes'] / 2**20:.1f} MiB"
+    return f"RSS {memory['rss_bytes'] / 2**20:.1f} MiB ({memory['shared_bytes'] / 2**20:.1f} MiB shared, {memory['private_bytes'] / 2**20:.1f} MiB private)"
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({
+        "status": "ok",
+        "pid": os.getpid(),
+        "worker": serving.worker,
+        "uptime_s": round(time.monotonic() - serving.started_at, 3),
+        "startup_ms": serving.startup_ms,
+        "memory": memory_usage()
+    })
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    checks = {
+        "preloaded": serving.preloaded,
+        "draining": serving.draining,
+        "database": data_version.current() is not None
+    }
+    ready = checks["preloaded"] and not checks["draining"] and checks["database"]
+    return jsonify(dict(checks, ready=ready)), 200 if ready else 503
+
+
+def preload(analytics_engine=False):
+    start = time.perf_counter()
+    version = data_version.current()
+    gazetteer.ensure_loaded(db_pool, version)
+    if analytics_engine:
+        try:
+            analytics.get(version)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not preload analytics engine, it will load on first use: {e}")
+    serving.preloaded = True
+    return time.perf_counter() - start
+
+
+class ThreadPoolWSGIServer(BaseWSGIServer):
+    """Werkzeug server with a fixed number of request threads, like gunicorn --threads."""
+
+    def __init__(self, host, port, app, threads, fd=None):
+        # One slot per request thread, taken before accept(): a worker with
+        # every thread busy stops accepting, so connections wait in the
+        # shared listen backlog for an idle sibling (or push back on
+        # clients once it fills) instead of queueing in this process.
+        self._slots = threading.BoundedSemaphore(threads)
+        super().__init__(host, port, app, fd=fd)
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix="request")
+
+    def get_request(self):
+        self._slots.acquire()
+        try:
+            return super().get_request()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request(self, request, client_address):
+        try:
+            self._executor.submit(self._handle, request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def drain(self, timeout):
+        """Wait up to `timeout` seconds for accepted requests to finish."""
+        waiter = Thread(target=self._executor.shutdown, daemon=True)
+        waiter.start()
+        waiter.join(timeout)
+        return not waiter.is_alive()
+
+    def server_close(self):
+        super().server_close()
+        # BaseWSGIServer also calls this while adopting fd, before the
+        # executor exists.
+        if hasattr(self, "_executor"):
+            self._executor.shutdown(wait=False)
+
+
+def run_worker(index, listener, host, port, threads, drain_timeout):
+    forked_at = time.perf_counter()
+    serving.worker = index
+    serving.started_at = time.monotonic()
+    mapping_cache.reopen()
+    httpd = ThreadPoolWSGIServer(host, port, app, threads, fd=listener.fileno())
+
+    def drain(signum, frame):
+        if serving.draining:
+            return
+        serving.draining = True
+        logging.info(f"🛑 Worker {index} (pid {os.getpid()}) draining")
+        # shutdown() waits for serve_forever() to return, so it can't run
+        # on the thread that is inside it.
+        Thread(target=httpd.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, drain)
+    signal.signal(signal.SIGINT, drain)
+
+    serving.startup_ms = round((time.perf_counter() - forked_at) * 1000, 3)
+    logging.info(f"👷 Worker {index} (pid {os.getpid()}) serving in {serving.startup_ms:.1f} ms, {format_memory(memory_usage())}")
+    httpd.serve_forever()
+    drained = httpd.drain(drain_timeout)
+    if drained:
+        logging.info(f"👋 Worker {index} (pid {os.getpid()}) drained")
+    else:
+        logging.warning(f"⏱️ Worker {index} (pid {os.getpid()}) still had requests after {drain_timeout}s, exiting anyway")
+    return 0 if drained else 1
+
+
+def serve(host="127.0.0.1", port=5000, workers=1, threads=WORKER_THREADS, drain_timeout=DRAIN_TIMEOUT, preload_analytics=False):
+    preload_s = preload(analytics_engine=preload_analytics)
+    logging.info(f"📦 Preloaded state in {preload_s:.2f}s, {format_memory(memory_usage())}")
+
+    # Nothing that holds a socket or file handle may be shared with the
+    # workers: idle MySQL connections are closed, and each worker reopens
+    # the mapping cache.
+    db_pool.close()
+    mapping_cache.close()
+    listener = socket.create_server((host, port), backlog=128)
+    # Move the preloaded objects out of the collector's generations so its
+    # passes don't write to (and un-share) their pages in the workers.
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 1
+            try:
+                code = run_worker(index, listener, host, port, threads, drain_timeout)
+            except Exception:
+                logging.exception(f"💥 Worker {index} failed")
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        logging.info(f"🛑 Stopping {len(children)} workers")
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for index in range(workers):
+        spawn(index)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logging.info(f"🚀 Serving on http://{host}:{port} with {workers} workers × {threads} threads")
+
+    while children:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            logging.warning(f"💥 Worker {index} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(1.0)
+            spawn(index)
+    listener.close()
+    logging.info("👋 All workers stopped")
+
+
+def use_backend(backend):
+    """Serve from another backend; pooled connections to the old one are closed."""
+    global db_backend
+    db_backend = backend
+    db_pool.close()
+    logging.info(f"🗄️ Serving from {backend.describe()}")
+
+
+def run_flask(host="127.0.0.1", port=5000):
+    preload()
+    app.run(debug=True, host=host, port=port, use_reloader=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IPL MCP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS, help="Request threads per worker")
+    parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT,
+                        help="Seconds a worker waits for in-flight requests on SIGTERM")
+    parser.add_argument("--preload-analytics", action="store_true",
+                        help="Load the in-memory analytics engine before forking")
+    parser.add_argument("--dev", action="store_true", help="Flask's single-process debug server instead")
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="Serve from this SQLite file (built by ipl_sql_insert.py --sqlite) instead of MySQL")
+    parser.add_argument("--snapshot", metavar="PATH",
+                        help="Build the gazetteer and analytics engine from this corpus snapshot (ipl_snapshot.py) while it is current")
+    args = parser.parse_args()
+    if args.sqlite:
+        use_backend(ipl_db.SQLiteBackend(args.sqlite))
+    if args.snapshot:
+        use_snapshot(args.snapshot)
+    if args.dev:
+        run_flask(args.host, args.port)
+        return
+    serve(args.host, args.port, args.workers, args.threads, args.drain_timeout, args.preload_analytics)
+
+
+if __name__ == "__main__":
+    main()
 
 
 # In[ ]:
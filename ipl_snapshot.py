@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Columnar binary snapshot of the match corpus.
+#
+# Writes the tables the in-memory analytics engine and the gazetteer read
+# (ipl_analytics.TABLE_QUERIES) into one file that a process can
+# memory-map instead of querying the database or reparsing IPL_10:
+#
+#   magic (8 bytes) | header length (uint64) | JSON header | columns
+#
+# The header records the data_version the tables were read at and, per
+# column, its kind, dtype and where its bytes start. Each column is one
+# contiguous little-endian array, 64-byte aligned:
+#
+# - numbers are stored in the smallest dtype that holds them (float64 when
+#   the column has NULLs), and a loaded column is a read-only NumPy view
+#   of the mapping, so its pages live in the page cache and are shared by
+#   every process that maps the file;
+# - strings are dictionary-encoded: the distinct values go in the header
+#   and the column holds integer codes into them, -1 for NULL;
+# - dates are datetime64[D].
+#
+# Snapshot.tables() returns the same DataFrames as
+# ipl_analytics.fetch_tables(), so anything built from SQL can be built
+# from the file instead. The server maps it with --snapshot.
+#
+#   python ipl_snapshot.py --output ipl_data.snapshot
+#   python ipl_snapshot.py --sqlite ipl_data.sqlite3 --output ipl_data.snapshot
+#   python ipl_mcp_server.py --snapshot ipl_data.snapshot
+
+import argparse
+import datetime
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+import ipl_db
+from ipl_analytics import fetch_tables
+
+
+db_config = {
+    "host": "127.0.0.1",
+    "port": 3306,
+    "user": "root",
+    "password": "your_password",
+    "database": "ipl_data",
+    "ssl_disabled": True
+}
+
+MAGIC = b"IPLSNAP1"
+PREFIX = struct.Struct("<8sQ")
+ALIGNMENT = 64
+
+# Times the export re-reads the tables when data_version moves under it.
+EXPORT_ATTEMPTS = 3
+
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def smallest_int_dtype(values):
+    if len(values) == 0:
+        return np.dtype(np.int8)
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+
+
+def encode_column(series):
+    """(header entry without offsets, array to write) for one column."""
+    kind = pd.api.types.infer_dtype(series, skipna=True)
+    if kind in ("string", "empty"):
+        codes, dictionary = pd.factorize(series, use_na_sentinel=True)
+        return ({"kind": "dictionary", "dictionary": [str(value) for value in dictionary]},
+                codes.astype(smallest_int_dtype(codes).newbyteorder("<")))
+    if kind == "date":
+        values = pd.to_datetime(series).to_numpy(dtype="datetime64[D]")
+        return {"kind": "date"}, values.astype("<M8[D]")
+    if kind == "boolean" and not series.isna().any():
+        return {"kind": "number"}, series.to_numpy(dtype=bool)
+    if kind == "integer" and not series.isna().any():
+        values = series.to_numpy(dtype=np.int64)
+        return {"kind": "number"}, values.astype(smallest_int_dtype(values).newbyteorder("<"))
+    if kind in ("integer", "floating", "mixed-integer-float", "decimal"):
+        return {"kind": "number"}, pd.to_numeric(series).to_numpy(dtype="<f8")
+    raise TypeError(f"Can't store a column of {kind} values in a snapshot")
+
+
+def write_snapshot(path, tables, data_version):
+    """Write tables (name -> DataFrame) to path, replacing any existing file atomically."""
+    header = {"format": 1, "data_version": data_version,
+              "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+              "tables": {}}
+    arrays, offset = [], 0
+    for name, frame in tables.items():
+        columns = []
+        for column in frame.columns:
+            entry, values = encode_column(frame[column])
+            offset = aligned(offset)
+            entry.update(name=column, dtype=values.dtype.str, offset=offset)
+            columns.append(entry)
+            arrays.append((offset, values))
+            offset += values.nbytes
+        header["tables"][name] = {"rows": len(frame), "columns": columns}
+
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    data_start = aligned(PREFIX.size + len(encoded))
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, len(encoded)))
+        f.write(encoded)
+        for array_offset, values in arrays:
+            f.seek(data_start + array_offset)
+            f.write(values.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(temp_path, path)
+    return data_start + offset
+
+
+def read_data_version(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT version FROM data_version WHERE id = 1")
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
+
+
+def export_snapshot(conn, path):
+    """Snapshot the analytics tables as of one data_version; returns (version, bytes written).
+
+    The tables are read with several statements, so if a load commits in
+    between (data_version moves), they are read again.
+    """
+    for _ in range(EXPORT_ATTEMPTS):
+        version = read_data_version(conn)
+        tables = fetch_tables(conn)
+        if read_data_version(conn) == version:
+            return version, write_snapshot(path, tables, version)
+    raise RuntimeError(f"data_version kept moving during {EXPORT_ATTEMPTS} attempts to export a snapshot")
+
+
+class Snapshot:
+    """A snapshot file mapped read-only; columns are views of the mapping."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self.nbytes = stat.st_size
+        magic, header_length = PREFIX.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an IPL snapshot")
+        self.header = json.loads(self._map[PREFIX.size:PREFIX.size + header_length])
+        self.version = self.header["data_version"]
+        self._data_start = aligned(PREFIX.size + header_length)
+        self._dictionaries = {}
+
+    def replaced(self):
+        """True if the file at path is no longer the one mapped (e.g. a newer export)."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self._identity
+
+    def _column_entry(self, table, column):
+        for entry in self.header["tables"][table]["columns"]:
+            if entry["name"] == column:
+                return entry
+        raise KeyError(f"{table}.{column}")
+
+    def array(self, table, column):
+        """The stored array: values, or the codes of a dictionary column."""
+        entry = self._column_entry(table, column)
+        return np.frombuffer(self._map, dtype=np.dtype(entry["dtype"]), count=self.header["tables"][table]["rows"],
+                             offset=self._data_start + entry["offset"])
+
+    def dictionary(self, table, column):
+        """Distinct non-NULL values of a dictionary column, in order of first appearance."""
+        key = (table, column)
+        if key not in self._dictionaries:
+            self._dictionaries[key] = np.array(self._column_entry(table, column)["dictionary"], dtype=object)
+        return self._dictionaries[key]
+
+    def column(self, table, column):
+        entry = self._column_entry(table, column)
+        values = self.array(table, column)
+        if entry["kind"] == "dictionary":
+            decoded = np.full(len(values), None, dtype=object)
+            present = values >= 0
+            decoded[present] = self.dictionary(table, column)[values[present]]
+            return decoded
+        if entry["kind"] == "date":
+            return values.astype(object)
+        return values
+
+    def table(self, name):
+        columns = [entry["name"] for entry in self.header["tables"][name]["columns"]]
+        return pd.DataFrame({column: self.column(name, column) for column in columns}, columns=columns, copy=False)
+
+    def tables(self):
+        """name -> DataFrame, as ipl_analytics.fetch_tables() returns them."""
+        return {name: self.table(name) for name in self.header["tables"]}
+
+    def describe(self):
+        rows = sum(table["rows"] for table in self.header["tables"].values())
+        return f"{self.path} ({self.nbytes / 2**20:.2f} MiB, {rows} rows, data version {self.version})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the IPL corpus to a columnar snapshot file")
+    parser.add_argument("--output", default="ipl_data.snapshot")
+    parser.add_argument("--sqlite", metavar="PATH", help="Export from this SQLite file instead of MySQL")
+    args = parser.parse_args()
+
+    backend = ipl_db.SQLiteBackend(args.sqlite) if args.sqlite else ipl_db.MySQLBackend(db_config)
+    try:
+        conn = backend.connect(read_only=True)
+    except ipl_db.ERRORS as e:
+        print(f"❌ Error while connecting to {backend.describe()}:")
+        print(f"Message: {e}")
+        return
+    try:
+        version, nbytes = export_snapshot(conn, args.output)
+    finally:
+        conn.close()
+    print(f"✅ Wrote {args.output} ({nbytes / 2**20:.2f} MiB) at data version {version} from {backend.describe()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1454 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Load cricsheet IPL match JSON into the ipl_data MySQL schema (tables.sql),
+# or with --sqlite into an embedded SQLite file (tables_sqlite.sql, see
+# ipl_db.py).
+#
+# Script version of ipl_sql_insert.ipynb. Each match file is parsed into
+# per-table rows, inserted, and the match's summary tables and the
+# data_version counter are updated in the same transaction.
+#
+# --bulk parses files in a process pool and loads many matches per
+# transaction with multi-row INSERTs, for (re)loading a whole archive.
+# --incremental loads only files that are new or changed since they were
+# recorded in the ingest_manifest table.
+# --stream reads each file incrementally and inserts it in bounded parts
+# (see STREAMING PARSER), for archives with files too long to hold whole.
+# --live follows a growing feed of deliveries for matches in progress and
+# writes each poll's new balls as one small transaction.
+#
+# Usage:
+#   python ipl_sql_insert.py --data-dir IPL_10
+#   python ipl_sql_insert.py --data-dir all_json --bulk --workers 8
+#   python ipl_sql_insert.py --data-dir IPL_10 --incremental
+#   python ipl_sql_insert.py --data-dir all_json --stream
+#   python ipl_sql_insert.py --rebuild-aggregates
+#   python ipl_sql_insert.py --live live/1473500.jsonl
+#   python ipl_sql_insert.py --data-dir IPL_10 --sqlite ipl_data.sqlite3
+
+import argparse
+import codecs
+import hashlib
+import itertools
+import json
+import os
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+import ipl_db
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "IPL_10")
+
+db_config = {
+    "host": "127.0.0.1",
+    "port": 3306,
+    "user": "root",
+    "password": "your_password",
+    "database": "ipl_data",
+    "ssl_disabled": True
+}
+
+BOWLER_WICKET_KINDS = ('bowled', 'caught', 'lbw', 'stumped', 'hit wicket', 'caught and bowled')
+# A retirement ends a stand but is not a wicket, so the next stand is for the
+# same wicket number (with a different pair of batters).
+RETIRED_KINDS = ('retired hurt', 'retired not out')
+
+
+@lru_cache(maxsize=None)
+def make_team_id(team_name):
+    if not team_name:
+        return "UNKNOWN-Team"
+    return '.'.join([x[0] for x in team_name.split(" ") if x]) + "-Team"
+
+
+# ========== PARSING ==========
+
+def file_match_id(filepath):
+    return os.path.basename(filepath).replace(".json", "")
+
+
+def file_fingerprint(filepath, content=None):
+    """(mtime_ns, size, sha256 hex) as recorded in ingest_manifest."""
+    if content is None:
+        sha256 = hashlib.sha256()
+        with open(filepath, "rb") as file:
+            for chunk in iter(lambda: file.read(STREAM_CHUNK_BYTES), b""):
+                sha256.update(chunk)
+    else:
+        sha256 = hashlib.sha256(content)
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size, sha256.hexdigest()
+
+
+def parse_match(filepath):
+    """Parse one cricsheet match file into a dict of table name -> rows."""
+    with open(filepath, "rb") as file:
+        content = file.read()
+    match_id = file_match_id(filepath)
+    rows = match_rows(match_id, json.loads(content))
+
+    # INGEST MANIFEST
+    rows["ingest_manifest"] = [(os.path.basename(filepath), match_id, *file_fingerprint(filepath, content))]
+    return rows
+
+
+def match_rows(match_id, data):
+    """Rows for one cricsheet match document: its info plus whatever innings it has."""
+    info = data.get("info", {})
+    rows = info_rows(match_id, info)
+
+    # DELIVERIES, POWERPLAY, REVIEWS, REPLACEMENTS, WICKETS
+    context = delivery_context(match_id, info)
+    rows.update({table: [] for table in DELIVERY_TABLES})
+    powerplays = []
+
+    for inning_num, inning in enumerate(data.get('innings', []), start=1):
+        batting_team_id, bowling_team_id = innings_teams(info, inning.get('team'))
+        powerplays.extend(powerplay_rows(match_id, inning_num, inning.get('powerplays', [])))
+
+        for over_data in inning.get('overs', []):
+            over_num = int(over_data.get('over'))
+            for ball_num, ind_delivery in enumerate(over_data.get('deliveries', []), start=1):
+                add_delivery(rows, context, inning_num, batting_team_id, bowling_team_id, over_num, ball_num, ind_delivery)
+
+    rows["powerplay"] = powerplays
+    rows.update(innings_scorecards(match_id, rows["deliveries"], rows["wickets"]))
+    return rows
+
+
+def info_rows(match_id, info):
+    """Rows that come from a match's info block: teams, players, officials and match_detail."""
+    registry_people = info.get("registry", {}).get("people", {})
+    teams_list = info.get("teams", [])
+    players_dict = info.get("players", {})
+    officials_dict = info.get("officials", {})
+
+    rows = {"match_id": match_id, "ingest_manifest": []}
+
+    # TEAMS
+    rows["teams"] = [(make_team_id(ind_team), ind_team) for ind_team in teams_list]
+
+    # PLAYERS & PLAYERS_TEAM
+    players_rows = []
+    players_team_rows = []
+    for ind_team in teams_list:
+        for ind_player in players_dict.get(ind_team, []):
+            player_id = registry_people.get(ind_player)
+            if player_id is None:
+                print(f"Warning: player_id missing for {ind_player} in match {match_id}")
+                continue
+            players_rows.append((player_id, ind_player))
+            players_team_rows.append((player_id, make_team_id(ind_team), info.get('season')))
+    rows["players"] = players_rows
+    rows["players_team"] = players_team_rows
+
+    # MATCH DETAILS
+    event = info.get("event", {})
+    toss = info.get("toss", {})
+    outcome = info.get("outcome", {})
+
+    match_date_str = (info.get('dates') or [None])[0]
+    match_date = datetime.strptime(match_date_str, "%Y-%m-%d").date() if match_date_str else None
+
+    teams = teams_list or [None, None]
+    team_1, team_2 = (teams[0] or "").strip(), (teams[1] or "").strip()
+    winner_team = (outcome.get('winner') or "").strip() or None
+    player_of_match = (info.get('player_of_match') or [None])[0]
+
+    rows["match_detail"] = [(
+        match_id, match_date, info.get('city'), info.get('venue'), int(event.get('match_number', 0)),
+        event.get('stage'), info.get('match_type'), info.get('gender', '').lower(),
+        event.get('name'), int(info.get('balls_per_over', 6)), int(info.get('overs', 20)),
+        info.get('season'), info.get('team_type'),
+        make_team_id(team_1), make_team_id(team_2), make_team_id(toss.get('winner')), toss.get('decision'),
+        make_team_id(winner_team) if winner_team else None,
+        outcome.get('by', {}).get('runs'), outcome.get('by', {}).get('wickets'),
+        registry_people.get(player_of_match)
+    )]
+
+    # MATCH PLAYERS
+    rows["match_players"] = [
+        (match_id, registry_people.get(ind_player), make_team_id(ind_team))
+        for ind_team in teams_list
+        for ind_player in players_dict.get(ind_team, [])
+    ]
+
+    # OFFICIALS & OFFICIAL ROLE
+    rows["officials"] = [
+        (registry_people.get(name), name)
+        for role_list in officials_dict.values()
+        for name in role_list
+    ]
+    rows["match_officials"] = [
+        (match_id, registry_people.get(off_name), roles)
+        for roles, names in officials_dict.items()
+        for off_name in names
+    ]
+    return rows
+
+
+def powerplay_rows(match_id, inning_num, powerplays):
+    rows = []
+    for ind_powerplay in powerplays:
+        start_over = int(ind_powerplay.get('from')) + 1
+        end_over = int(ind_powerplay.get('to')) + 1
+        pp_type = ind_powerplay.get('type')
+        if pp_type:
+            powerplay_id = f"{match_id}_{inning_num}_{start_over}_{end_over}_{pp_type[0]}"
+        else:
+            powerplay_id = f"{match_id}_{inning_num}_{start_over}_{end_over}"
+        rows.append((powerplay_id, match_id, inning_num, start_over, end_over, pp_type))
+    return rows
+
+
+# Tables add_delivery() appends to.
+DELIVERY_TABLES = ("deliveries", "reviews", "replacements", "wickets", "substitute_players", "substitute_players_team")
+
+
+def delivery_context(match_id, info):
+    """What add_delivery() needs from a match's info block."""
+    teams_list = info.get("teams", [])
+    return {
+        "match_id": match_id,
+        "avv": '_vs_'.join([''.join(word[0] for word in team.split()) for team in teams_list]),
+        "people": info.get("registry", {}).get("people", {}),
+        "season": info.get("season"),
+    }
+
+
+def innings_teams(info, batting_team):
+    """(batting_team_id, bowling_team_id) for an innings batted by batting_team."""
+    bowling_team = next((t for t in info.get("teams", []) if t != batting_team), None)
+    return make_team_id(batting_team), make_team_id(bowling_team)
+
+
+def add_delivery(rows, context, inning_num, batting_team_id, bowling_team_id, over_num, ball_num, ind_delivery):
+    """Append one cricsheet delivery (ball_num counts from 1 within its over) to rows."""
+    match_id = context["match_id"]
+    registry_people = context["people"]
+    delivery_id = f"{context['avv']}_{match_id}_{over_num}_{ball_num}_{inning_num}"
+    runs_info = ind_delivery.get('runs', {})
+    extras = ind_delivery.get('extras', {})
+    extras_type = next(iter(extras), None)
+
+    rows["deliveries"].append((
+        delivery_id, match_id, inning_num, batting_team_id, bowling_team_id,
+        over_num, ball_num,
+        registry_people.get(ind_delivery.get('batter')),
+        registry_people.get(ind_delivery.get('bowler')),
+        registry_people.get(ind_delivery.get('non_striker')),
+        int(runs_info.get('batter', 0)), int(runs_info.get('extras', 0)),
+        int(runs_info.get('total', 0)), extras_type,
+        int(extras.get(extras_type, 0)) if extras_type else 0
+    ))
+
+    # REVIEWS
+    review = ind_delivery.get('review', {})
+    if review.get('by'):
+        rows["reviews"].append((
+            f"{delivery_id}_REVIEW", match_id, delivery_id, make_team_id(review.get('by')),
+            registry_people.get(review.get('umpire')),
+            registry_people.get(review.get('batter')),
+            review.get('decision'), review.get('type'),
+            review.get('umpires_call')
+        ))
+
+    # REPLACEMENTS
+    for i, ind_rep_player in enumerate(ind_delivery.get('replacements', {}).get('match', []), start=1):
+        rows["replacements"].append((
+            f"{delivery_id}_REPL_{i}", match_id, make_team_id(ind_rep_player.get('team')),
+            registry_people.get(ind_rep_player.get('in')),
+            registry_people.get(ind_rep_player.get('out')),
+            ind_rep_player.get('reason')
+        ))
+
+    # WICKETS
+    for i, wkt in enumerate(ind_delivery.get('wickets', []), start=1):
+        player_dismissed_id = registry_people.get(wkt.get("player_out"))
+        dismissal_kind = wkt.get('kind')
+        for j, ind_fielder in enumerate(wkt.get('fielders') or [{}], start=1):
+            fielder_name = ind_fielder.get('name')
+            fielder_id = registry_people.get(fielder_name) if fielder_name else None
+            if ind_fielder.get("substitute", False):
+                rows["substitute_players"].append((fielder_id, fielder_name, True))
+                rows["substitute_players_team"].append((fielder_id, bowling_team_id, context["season"]))
+            rows["wickets"].append((
+                f"{delivery_id}_WKT_{i}_{j}", delivery_id, player_dismissed_id, dismissal_kind, fielder_id
+            ))
+    return delivery_id
+
+
+# ========== SCORECARDS ==========
+
+class ScorecardBuilder:
+    """Partnership, batting, bowling and innings lines for one match, built in one ordered pass.
+
+    add() takes parse_match delivery rows in the order they were bowled. A
+    stand lasts while the same two batters are at the crease and is keyed by
+    the wicket it was for and the pair, batter1 being the one who came in
+    first. changed_rows() returns only the lines touched since its last call,
+    so live updates rewrite a few rows per ball instead of the whole match.
+    """
+
+    def __init__(self, match_id):
+        self.match_id = match_id
+        self.partnerships, self.batting, self.bowling, self.innings = {}, {}, {}, {}
+        self._changed = {"partnerships": set(), "player_match_batting": set(),
+                         "player_match_bowling": set(), "innings_totals": set()}
+        self._inning = None
+
+    def add(self, delivery, dismissals=None):
+        """dismissals: {player_dismissed_id: (kind, fielder_id)} for this delivery."""
+        (_, _, inning_num, batting_team, bowling_team, _, _,
+         batsman, bowler, non_striker, runs_batsman, runs_extras, runs_total, *_) = delivery
+        out = dismissals or {}
+        if inning_num != self._inning:
+            self._inning, self._fallen, self._pair, self._stand = inning_num, 0, None, None
+            self._positions, self._bowling_positions = {}, {}
+        inning, positions = inning_num, self._positions
+
+        totals = self.innings.setdefault(inning, [batting_team, bowling_team, 0, 0])
+        totals[2] += runs_total
+        totals[3] += 1
+        self._changed["innings_totals"].add(inning)
+
+        for player in (batsman, non_striker):
+            if player is not None and player not in positions:
+                positions[player] = len(positions) + 1
+                self.batting[inning, player] = [batting_team, positions[player], 0, 0, 0, 0, None, None, None]
+                self._changed["player_match_batting"].add((inning, player))
+
+        if batsman is not None:
+            line = self.batting[inning, batsman]
+            line[2] += runs_batsman
+            line[3] += 1
+            line[4] += runs_batsman == 4
+            line[5] += runs_batsman == 6
+            self._changed["player_match_batting"].add((inning, batsman))
+
+        if batsman is not None and non_striker is not None:
+            if self._pair != {batsman, non_striker}:
+                self._pair = {batsman, non_striker}
+                key = (inning, self._fallen + 1, *sorted(self._pair, key=positions.get))
+                self._stand = key
+                self.partnerships.setdefault(key, [batting_team, bowling_team, 0, 0, 0, 0])
+            stand = self.partnerships[self._stand]
+            stand[2] += runs_total
+            stand[3] += 1
+            stand[4 if batsman == self._stand[2] else 5] += runs_batsman
+            self._changed["partnerships"].add(self._stand)
+
+        if bowler is not None:
+            if bowler not in self._bowling_positions:
+                self._bowling_positions[bowler] = len(self._bowling_positions) + 1
+                self.bowling[inning, bowler] = [bowling_team, self._bowling_positions[bowler], 0, 0, 0]
+            line = self.bowling[inning, bowler]
+            line[2] += any(kind in BOWLER_WICKET_KINDS for kind, _ in out.values())
+            line[3] += runs_batsman + runs_extras
+            line[4] += 1
+            self._changed["player_match_bowling"].add((inning, bowler))
+
+        for dismissed_id, (kind, fielder_id) in out.items():
+            if kind not in RETIRED_KINDS:
+                self._fallen += 1
+            if (inning, dismissed_id) in self.batting:
+                self.batting[inning, dismissed_id][6:] = [
+                    kind, bowler if kind in BOWLER_WICKET_KINDS else None, fielder_id]
+                self._changed["player_match_batting"].add((inning, dismissed_id))
+
+    def _rows(self, table, keys):
+        lines = {"partnerships": self.partnerships, "player_match_batting": self.batting,
+                 "player_match_bowling": self.bowling, "innings_totals": self.innings}[table]
+        if table == "partnerships":
+            return [(self.match_id, inning_num, wicket_num, team, opponent, first, second, *totals)
+                    for inning_num, wicket_num, first, second in keys
+                    for team, opponent, *totals in [lines[inning_num, wicket_num, first, second]]]
+        if table == "innings_totals":
+            return [(self.match_id, inning_num, *lines[inning_num]) for inning_num in keys]
+        return [(self.match_id, inning_num, player, *lines[inning_num, player]) for inning_num, player in keys]
+
+    def rows(self):
+        """Every partnership, batting and bowling line (innings totals come from AGGREGATE_SQL)."""
+        return {table: self._rows(table, lines) for table, lines in (
+            ("partnerships", self.partnerships),
+            ("player_match_batting", self.batting),
+            ("player_match_bowling", self.bowling),
+        )}
+
+    def changed_rows(self):
+        changed = {table: self._rows(table, sorted(keys)) for table, keys in self._changed.items()}
+        for keys in self._changed.values():
+            keys.clear()
+        return changed
+
+
+def wicket_dismissals(wickets):
+    """{delivery_id: {player_dismissed_id: (kind, fielder_id)}} from wickets rows."""
+    dismissals = {}
+    for _, delivery_id, dismissed_id, kind, fielder_id in wickets:
+        # One wickets row per fielder; the first one is enough here.
+        dismissals.setdefault(delivery_id, {}).setdefault(dismissed_id, (kind, fielder_id))
+    return dismissals
+
+
+def innings_scorecards(match_id, deliveries, wickets):
+    """Partnership, batting and bowling rows for one match, in one ordered pass."""
+    dismissals = wicket_dismissals(wickets)
+    builder = ScorecardBuilder(match_id)
+    for delivery in deliveries:
+        builder.add(delivery, dismissals.get(delivery[0]))
+    return builder.rows()
+
+
+# ========== INSERTS ==========
+
+# Insert order respects the foreign keys in tables.sql. Everything up to
+# ingest_manifest creates the teams, players and matches whose surrogate
+# keys the delivery rows need; assign_keys() runs before deliveries.
+INSERT_SQL = [
+    ("teams", "INSERT IGNORE INTO teams (team_id, team_name) VALUES (%s, %s)"),
+    ("players", "INSERT IGNORE INTO players (player_id, player_name) VALUES (%s, %s)"),
+    ("substitute_players", "INSERT IGNORE INTO players (player_id, player_name, substitute) VALUES (%s, %s, %s)"),
+    ("players_team", "INSERT IGNORE INTO players_team (player_id, team_id, season) VALUES (%s, %s, %s)"),
+    ("substitute_players_team", "INSERT IGNORE INTO players_team (player_id, team_id, season) VALUES (%s, %s, %s)"),
+    ("match_detail", """
+        INSERT INTO match_detail (
+            match_id, match_date, city, venue, match_number, stage, match_type, gender,
+            event_name, balls_per_over, overs, season, team_type,
+            team1_id, team2_id, toss_winner_team_id, toss_decision, winner_team_id,
+            win_by_runs, win_by_wickets, player_of_match_id
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """),
+    ("match_players", "INSERT INTO match_players (match_id, player_id, team_id) VALUES (%s, %s, %s)"),
+    ("officials", "INSERT IGNORE INTO officials (official_id, official_name) VALUES (%s, %s)"),
+    ("match_officials", "INSERT INTO match_officials (match_id, official_id, roles) VALUES (%s, %s, %s)"),
+    ("ingest_manifest", """
+        REPLACE INTO ingest_manifest (file_name, match_id, file_mtime_ns, file_size, content_hash)
+        VALUES (%s, %s, %s, %s, %s)
+    """),
+    ("deliveries", """
+        INSERT INTO deliveries (
+            delivery_key, match_key, inning_num, batting_team_key, bowling_team_key,
+            over_num, ball_num, batsman_key, bowler_key, non_striker_key,
+            runs_batsman, runs_extras, runs_total, extras_type, extras_runs
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """),
+    ("powerplay", """
+        INSERT INTO powerplay (powerplay_id, match_id, inning_num, start_over, end_over, pp_type)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """),
+    ("reviews", """
+        INSERT INTO reviews (
+            review_id, match_id, delivery_key, review_by_team_id, umpire_id,
+            batsman_name_id, decision, review_type, umpires_call
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """),
+    ("replacements", """
+        INSERT INTO replacements (
+            replacement_id, match_id, team_id, player_in_id, player_out_id, reason
+        ) VALUES (%s, %s, %s, %s, %s, %s)
+    """),
+    ("wickets", """
+        INSERT INTO wickets (
+            wicket_id, delivery_key, player_dismissed_id, dismissal_kind, fielder_id
+        ) VALUES (%s, %s, %s, %s, %s)
+    """),
+    ("partnerships", """
+        INSERT INTO partnerships (
+            match_id, inning_num, wicket_num, batting_team_id, bowling_team_id,
+            batter1_id, batter2_id, runs, balls, batter1_runs, batter2_runs
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """),
+    ("player_match_batting", """
+        INSERT INTO player_match_batting (
+            match_id, inning_num, player_id, team_id, batting_position, runs, balls_faced,
+            fours, sixes, dismissal_kind, bowler_id, fielder_id
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """),
+    ("player_match_bowling", """
+        INSERT INTO player_match_bowling (
+            match_id, inning_num, player_id, team_id, bowling_position, wickets, runs_conceded, balls
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """),
+]
+
+# Rows per multi-row INSERT statement, and ids per key lookup; keeps each
+# statement well under MySQL's max_allowed_packet.
+BULK_INSERT_ROWS = 1000
+
+
+def delivery_key(match_key, inning_num, over_num, ball_num):
+    return match_key * 100000 + inning_num * 10000 + over_num * 100 + ball_num
+
+
+def lookup_keys(cursor, table, id_column, key_column, ids):
+    ids = sorted(set(ids) - {None})
+    keys = {}
+    for start in range(0, len(ids), BULK_INSERT_ROWS):
+        chunk = ids[start:start + BULK_INSERT_ROWS]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(f"SELECT {id_column}, {key_column} FROM {table} WHERE {id_column} IN ({placeholders})", chunk)
+        keys.update(cursor.fetchall())
+    return keys
+
+
+def assign_keys(cursor, batch):
+    """Copies of the parsed matches with deliveries, reviews and wickets keyed."""
+    deliveries = [row for rows in batch for row in rows["deliveries"]]
+    match_keys = lookup_keys(cursor, "match_detail", "match_id", "match_key", [rows["match_id"] for rows in batch])
+    team_keys = lookup_keys(cursor, "teams", "team_id", "team_key", [team for row in deliveries for team in row[3:5]])
+    player_keys = lookup_keys(cursor, "players", "player_id", "player_key", [player for row in deliveries for player in row[7:10]])
+
+    keyed_batch = []
+    for rows in batch:
+        match_key = match_keys[rows["match_id"]]
+        delivery_keys = {}
+        keyed_deliveries = []
+        for (delivery_id, _, inning_num, batting_team, bowling_team, over_num, ball_num,
+             batsman, bowler, non_striker, *runs) in rows["deliveries"]:
+            key = delivery_keys[delivery_id] = delivery_key(match_key, inning_num, over_num, ball_num)
+            keyed_deliveries.append((
+                key, match_key, inning_num, team_keys.get(batting_team), team_keys.get(bowling_team),
+                over_num, ball_num, player_keys.get(batsman), player_keys.get(bowler), player_keys.get(non_striker),
+                *runs
+            ))
+        keyed_batch.append({
+            **rows,
+            "deliveries": keyed_deliveries,
+            "reviews": [(review[0], review[1], delivery_keys[review[2]], *review[3:]) for review in rows["reviews"]],
+            "wickets": [(wicket[0], delivery_keys[wicket[1]], *wicket[2:]) for wicket in rows["wickets"]],
+        })
+    return keyed_batch
+
+
+def insert_match(cursor, rows):
+    for table, sql in INSERT_SQL:
+        if table == "deliveries" and rows["deliveries"]:
+            rows = assign_keys(cursor, [rows])[0]
+        if rows[table]:
+            cursor.executemany(sql, rows[table])
+
+
+def bulk_insert(cursor, sql, rows, chunk_rows=BULK_INSERT_ROWS):
+    """Insert rows as INSERT ... VALUES (...), (...), ... statements."""
+    head, placeholders = sql.rsplit("VALUES", 1)
+    placeholders = placeholders.strip()
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        cursor.execute(f"{head}VALUES {', '.join([placeholders] * len(chunk))}", [value for row in chunk for value in row])
+
+
+def insert_matches(cursor, batch):
+    """Insert a batch of parsed matches table by table, in INSERT_SQL order."""
+    inserted = 0
+    for table, sql in INSERT_SQL:
+        if table == "deliveries":
+            batch = assign_keys(cursor, batch)
+        rows = [row for match_rows in batch for row in match_rows[table]]
+        if rows:
+            bulk_insert(cursor, sql, rows)
+            inserted += len(rows)
+    return inserted
+
+
+# ========== STREAMING PARSER ==========
+
+# parse_match() decodes the whole document and then builds every row of the
+# match before anything is inserted, so a loader's memory grows with the
+# file. stream_match() reads the file STREAM_CHUNK_BYTES at a time, decodes
+# one over at a time, and hands rows over in parts of about
+# STREAM_BATCH_ROWS deliveries, each inserted before the next is built.
+# What it keeps for the whole match is the info block and the scorecard
+# lines (one per player per innings), which don't grow with the number of
+# balls.
+STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_BATCH_ROWS = BULK_INSERT_ROWS
+
+JSON_DECODER = json.JSONDecoder()
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JSONStream:
+    """Incremental reader for one JSON document in a binary file.
+
+    members() and items() walk into objects and arrays without decoding
+    them; value() decodes the next value whole with json's scanner. The
+    buffer holds the value being decoded plus at most one chunk, and the
+    sha256 of everything read is kept for ingest_manifest.
+    """
+
+    def __init__(self, file, chunk_bytes=STREAM_CHUNK_BYTES):
+        self.file = file
+        self.chunk_bytes = chunk_bytes
+        self.sha256 = hashlib.sha256()
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self._buffer, self._pos = "", 0
+
+    def _fill(self):
+        """Append the next chunk, dropping what has been consumed; False at the end of the file."""
+        while True:
+            chunk = self.file.read(self.chunk_bytes)
+            if not chunk:
+                return False
+            self.sha256.update(chunk)
+            text = self._decode(chunk)
+            if text:
+                self._buffer = self._buffer[self._pos:] + text
+                self._pos = 0
+                return True
+
+    def peek(self):
+        """The next character that isn't whitespace."""
+        while True:
+            self._pos = JSON_WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON document, found {found!r}")
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = JSON_DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Cut off by the end of the buffer, unless the file has ended.
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may go on in the next chunk.
+            if end < len(self._buffer) or not self._fill():
+                self._pos = end
+                return value
+
+    def members(self):
+        """Walk the object at the cursor: yields each key, and the caller reads its value before the next."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() != ",":
+                self.expect("}")
+                return
+            self._pos += 1
+
+    def items(self):
+        """Walk the array at the cursor: yields once per element, and the caller reads it before the next."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield
+            if self.peek() != ",":
+                self.expect("]")
+                return
+            self._pos += 1
+
+    def finish(self):
+        """Read the rest of the file so sha256 covers all of it."""
+        while self._fill():
+            self._pos = len(self._buffer)
+
+
+def match_events(stream):
+    """The parts of a cricsheet match that stream_match() uses, in file order.
+
+    Yields ("info", info) and then, per innings, ("team", inning_num, team),
+    ("powerplays", inning_num, powerplays) and ("over", inning_num, over).
+    cricsheet writes info before the innings and each innings' team before
+    its overs. A file in another order still parses; the part that came
+    early is decoded whole and replayed.
+    """
+    early_innings = None
+    info_seen = False
+    for key in stream.members():
+        if key == "info":
+            yield "info", stream.value()
+            info_seen = True
+        elif key == "innings" and info_seen:
+            for inning_num, _ in enumerate(stream.items(), start=1):
+                yield from inning_events(stream, inning_num)
+        elif key == "innings":
+            early_innings = stream.value()
+        else:
+            stream.value()
+    if not info_seen:
+        yield "info", {}
+    for inning_num, inning in enumerate(early_innings or [], start=1):
+        yield "team", inning_num, inning.get("team")
+        yield "powerplays", inning_num, inning.get("powerplays", [])
+        for over_data in inning.get("overs", []):
+            yield "over", inning_num, over_data
+
+
+def inning_events(stream, inning_num):
+    early_overs = None
+    team_seen = False
+    for key in stream.members():
+        if key == "team":
+            yield "team", inning_num, stream.value()
+            team_seen = True
+        elif key == "powerplays":
+            yield "powerplays", inning_num, stream.value()
+        elif key == "overs" and team_seen:
+            for _ in stream.items():
+                yield "over", inning_num, stream.value()
+        elif key == "overs":
+            early_overs = stream.value()
+        else:
+            stream.value()
+    for over_data in early_overs or []:
+        yield "over", inning_num, over_data
+
+
+def empty_rows(match_id):
+    return {"match_id": match_id, **{table: [] for table, _ in INSERT_SQL}}
+
+
+def stream_match(filepath, batch_rows=STREAM_BATCH_ROWS, chunk_bytes=STREAM_CHUNK_BYTES):
+    """parse_match() in parts, for a file too long to hold as a document or as rows.
+
+    Yields rows dicts with every INSERT_SQL table, ready for insert_match()
+    in the order they come: the info tables first, then batch_rows
+    deliveries at a time (rounded up to a whole over) with their reviews,
+    replacements and wickets, and last the powerplays, scorecards and
+    ingest_manifest row. Together they hold exactly parse_match()'s rows.
+    """
+    match_id = file_match_id(filepath)
+    with open(filepath, "rb") as file:
+        stream = JSONStream(file, chunk_bytes)
+        info, context, teams, powerplays = {}, None, {}, []
+        scorecard = ScorecardBuilder(match_id)
+        part = empty_rows(match_id)
+        for event in match_events(stream):
+            if event[0] == "info":
+                info = event[1]
+                context = delivery_context(match_id, info)
+                part.update(info_rows(match_id, info))
+                yield part
+                part = empty_rows(match_id)
+            elif event[0] == "team":
+                teams[event[1]] = innings_teams(info, event[2])
+            elif event[0] == "powerplays":
+                powerplays.extend(powerplay_rows(match_id, event[1], event[2]))
+            else:
+                _, inning_num, over_data = event
+                batting_team_id, bowling_team_id = teams.get(inning_num) or innings_teams(info, None)
+                over_num = int(over_data.get('over'))
+                for ball_num, ind_delivery in enumerate(over_data.get('deliveries', []), start=1):
+                    first_wicket = len(part["wickets"])
+                    delivery_id = add_delivery(part, context, inning_num, batting_team_id, bowling_team_id,
+                                               over_num, ball_num, ind_delivery)
+                    scorecard.add(part["deliveries"][-1], wicket_dismissals(part["wickets"][first_wicket:]).get(delivery_id))
+                if len(part["deliveries"]) >= batch_rows:
+                    yield part
+                    part = empty_rows(match_id)
+        stream.finish()
+
+    stat = os.stat(filepath)
+    part["powerplay"] = powerplays
+    part.update(scorecard.rows())
+    part["ingest_manifest"] = [(os.path.basename(filepath), match_id, stat.st_mtime_ns, stat.st_size,
+                                stream.sha256.hexdigest())]
+    yield part
+
+
+def stream_insert_match(cursor, filepath, batch_rows=STREAM_BATCH_ROWS):
+    """Insert a match file part by part as stream_match() reads it; returns its match_id."""
+    for part in stream_match(filepath, batch_rows):
+        insert_match(cursor, part)
+    return part["match_id"]
+
+
+# ========== SUMMARY TABLES ==========
+
+# Leaderboard templates in ipl_mcp_server.map_question_to_sql read these
+# instead of grouping the whole deliveries table on every request. Each
+# statement rebuilds the slice for a list of matches ({matches} expands to
+# one placeholder per match), so ingest only pays for the matches it just
+# loaded. partnerships, player_match_batting and player_match_bowling come
+# from innings_scorecards() and are inserted with the match itself.
+AGGREGATE_SQL = [
+    ("DELETE FROM innings_totals WHERE match_id IN ({matches})", """
+        INSERT INTO innings_totals (match_id, inning_num, batting_team_id, bowling_team_id, total_runs, balls)
+        SELECT md.match_id, d.inning_num, bt.team_id, wt.team_id, SUM(d.runs_total), COUNT(*)
+        FROM deliveries d
+        JOIN match_detail md ON md.match_key = d.match_key
+        JOIN teams bt ON bt.team_key = d.batting_team_key
+        JOIN teams wt ON wt.team_key = d.bowling_team_key
+        WHERE md.match_id IN ({matches})
+        GROUP BY md.match_id, d.inning_num, bt.team_id, wt.team_id
+    """),
+    ("DELETE FROM venue_match_totals WHERE match_id IN ({matches})", """
+        INSERT INTO venue_match_totals (match_id, venue, total_runs)
+        SELECT md.match_id, md.venue, COALESCE(SUM(d.runs_total), 0)
+        FROM match_detail md
+        LEFT JOIN deliveries d ON d.match_key = md.match_key
+        WHERE md.match_id IN ({matches})
+        GROUP BY md.match_id, md.venue
+    """),
+]
+
+
+def refresh_aggregates(cursor, match_ids):
+    match_ids = list(match_ids)
+    matches = ", ".join(["%s"] * len(match_ids))
+    for delete_sql, insert_sql in AGGREGATE_SQL:
+        cursor.execute(delete_sql.format(matches=matches), match_ids)
+        cursor.execute(insert_sql.format(matches=matches), match_ids)
+
+
+def refresh_match_aggregates(cursor, match_id):
+    refresh_aggregates(cursor, [match_id])
+
+
+# The loaded rows in parse_match shape, for rebuilding the scorecards of a
+# match without its file. delivery_key orders deliveries as they were bowled.
+SCORECARD_SOURCE_SQL = {
+    "deliveries": """
+        SELECT d.delivery_key, md.match_id, d.inning_num, bt.team_id, wt.team_id, d.over_num, d.ball_num,
+               pb.player_id, pw.player_id, pn.player_id,
+               d.runs_batsman, d.runs_extras, d.runs_total, d.extras_type, d.extras_runs
+        FROM deliveries d
+        JOIN match_detail md ON md.match_key = d.match_key
+        JOIN teams bt ON bt.team_key = d.batting_team_key
+        JOIN teams wt ON wt.team_key = d.bowling_team_key
+        JOIN players pb ON pb.player_key = d.batsman_key
+        JOIN players pw ON pw.player_key = d.bowler_key
+        JOIN players pn ON pn.player_key = d.non_striker_key
+        WHERE md.match_id = %s
+        ORDER BY d.delivery_key
+    """,
+    "wickets": """
+        SELECT w.wicket_id, w.delivery_key, w.player_dismissed_id, w.dismissal_kind, w.fielder_id
+        FROM wickets w
+        JOIN deliveries d ON d.delivery_key = w.delivery_key
+        JOIN match_detail md ON md.match_key = d.match_key
+        WHERE md.match_id = %s
+        ORDER BY w.wicket_id
+    """,
+}
+
+
+def load_scorecard_source(cursor, match_id):
+    source = {}
+    for table, sql in SCORECARD_SOURCE_SQL.items():
+        cursor.execute(sql, (match_id,))
+        source[table] = cursor.fetchall()
+    return source["deliveries"], source["wickets"]
+
+
+def refresh_match_scorecards(cursor, match_id):
+    rows = innings_scorecards(match_id, *load_scorecard_source(cursor, match_id))
+    for table, sql in INSERT_SQL:
+        if table in rows:
+            cursor.execute(f"DELETE FROM {table} WHERE match_id = %s", (match_id,))
+            if rows[table]:
+                cursor.executemany(sql, rows[table])
+
+
+def rebuild_aggregates(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT match_id FROM match_detail")
+    match_ids = [row[0] for row in cursor.fetchall()]
+    for match_id in match_ids:
+        refresh_match_aggregates(cursor, match_id)
+        refresh_match_scorecards(cursor, match_id)
+        bump_data_version(cursor)
+        conn.commit()
+    cursor.close()
+    print(f"✅ Rebuilt summary tables for {len(match_ids)} matches")
+
+
+# ========== INCREMENTAL LOADER ==========
+
+# Same definition as tables.sql; created on demand so databases built before
+# the manifest existed can switch to --incremental without a rebuild.
+MANIFEST_DDL = """
+    CREATE TABLE IF NOT EXISTS ingest_manifest (
+        file_name VARCHAR(255) PRIMARY KEY,
+        match_id VARCHAR(75) NOT NULL,
+        file_mtime_ns BIGINT NOT NULL,
+        file_size BIGINT NOT NULL,
+        content_hash CHAR(64) NOT NULL,
+        ingested_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Reverse foreign key order: everything that references a match's
+# deliveries or match_detail row goes first. Teams, players and officials
+# are shared between matches and are left alone.
+DELETE_MATCH_SQL = [
+    """DELETE FROM wickets WHERE delivery_key IN (
+        SELECT d.delivery_key FROM deliveries d
+        JOIN match_detail md ON md.match_key = d.match_key
+        WHERE md.match_id = %s
+    )""",
+    "DELETE FROM reviews WHERE match_id = %s",
+    "DELETE FROM replacements WHERE match_id = %s",
+    "DELETE FROM powerplay WHERE match_id = %s",
+    "DELETE FROM match_officials WHERE match_id = %s",
+    "DELETE FROM match_players WHERE match_id = %s",
+    "DELETE FROM innings_totals WHERE match_id = %s",
+    "DELETE FROM player_match_batting WHERE match_id = %s",
+    "DELETE FROM player_match_bowling WHERE match_id = %s",
+    "DELETE FROM partnerships WHERE match_id = %s",
+    "DELETE FROM venue_match_totals WHERE match_id = %s",
+    "DELETE FROM deliveries WHERE match_key = (SELECT match_key FROM match_detail WHERE match_id = %s)",
+    "DELETE FROM match_detail WHERE match_id = %s",
+]
+
+
+def delete_match(cursor, match_id):
+    """Remove one match's rows; returns True if the match was loaded."""
+    for sql in DELETE_MATCH_SQL:
+        cursor.execute(sql, (match_id,))
+    return cursor.rowcount > 0
+
+
+def read_manifest(cursor):
+    cursor.execute("SELECT file_name, file_mtime_ns, file_size, content_hash FROM ingest_manifest")
+    return {name: (mtime_ns, size, content_hash) for name, mtime_ns, size, content_hash in cursor.fetchall()}
+
+
+def load_incremental(conn, data_dir, stream=False):
+    """Load new or changed files; a changed match is replaced in one transaction."""
+    cursor = conn.cursor()
+    cursor.execute(MANIFEST_DDL)
+    manifest = read_manifest(cursor)
+    counts = {"new": 0, "replaced": 0, "unchanged": 0, "failed": 0}
+
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith(".json"):
+            continue
+        filepath = os.path.join(data_dir, filename)
+        known = manifest.get(filename)
+        stat = os.stat(filepath)
+        if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            counts["unchanged"] += 1
+            continue
+
+        current_section = "PARSE"
+        try:
+            mtime_ns, _, content_hash = file_fingerprint(filepath)
+            if known and known[2] == content_hash:
+                # Touched but identical: remember the new mtime so the next
+                # run skips it without hashing.
+                cursor.execute("UPDATE ingest_manifest SET file_mtime_ns = %s WHERE file_name = %s", (mtime_ns, filename))
+                conn.commit()
+                counts["unchanged"] += 1
+                continue
+
+            if stream:
+                match_id = file_match_id(filepath)
+            else:
+                rows = parse_match(filepath)
+                match_id = rows["match_id"]
+            current_section = "DELETE"
+            replaced = delete_match(cursor, match_id)
+            if stream:
+                current_section = "PARSE/INSERT"
+                stream_insert_match(cursor, filepath)
+            else:
+                current_section = "INSERT"
+                insert_match(cursor, rows)
+            current_section = "SUMMARY TABLES"
+            refresh_match_aggregates(cursor, match_id)
+            bump_data_version(cursor)
+            conn.commit()
+            counts["replaced" if replaced else "new"] += 1
+            print(f"✅ {'Replaced' if replaced else 'Inserted'} {filename}")
+
+        except ipl_db.ERRORS as e:
+            conn.rollback()
+            counts["failed"] += 1
+            print(f"❌ Database Error in file {filename} → Section: {current_section} → {e}")
+        except Exception as e:
+            conn.rollback()
+            counts["failed"] += 1
+            print(f"❌ General Error in file {filename} → Section: {current_section} → {e}")
+
+    cursor.close()
+    print(f"✅ Incremental load: {counts['new']} new, {counts['replaced']} replaced, "
+          f"{counts['unchanged']} unchanged, {counts['failed']} failed")
+    return counts
+
+
+# ========== DATA VERSION ==========
+
+# The server caches query results per data version; bumping it in the same
+# transaction as the data change makes the new rows and the invalidation
+# visible together.
+def bump_data_version(cursor):
+    cursor.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+
+
+# Live updates bump live_version instead: the server then drops only the
+# cached results that read ball-level tables, and keeps its gazetteer and
+# analytics snapshot.
+def bump_live_version(cursor):
+    cursor.execute("UPDATE data_version SET live_version = live_version + 1 WHERE id = 1")
+
+
+# ========== LOADER ==========
+
+def load_directory(conn, data_dir, stream=False):
+    """Load every file, one transaction per match; stream reads each with stream_match()."""
+    cursor = conn.cursor()
+    loaded = 0
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith(".json"):
+            continue
+        filepath = os.path.join(data_dir, filename)
+        current_section = "PARSE"
+        try:
+            if stream:
+                current_section = "PARSE/INSERT"
+                match_id = stream_insert_match(cursor, filepath)
+            else:
+                rows = parse_match(filepath)
+                match_id = rows["match_id"]
+                current_section = "INSERT"
+                insert_match(cursor, rows)
+            current_section = "SUMMARY TABLES"
+            refresh_match_aggregates(cursor, match_id)
+            bump_data_version(cursor)
+            conn.commit()
+            loaded += 1
+            print(f"✅ Inserted {filename}")
+
+        except ipl_db.ERRORS as e:
+            conn.rollback()
+            print(f"❌ Database Error in file {filename} → Section: {current_section} → {e}")
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ General Error in file {filename} → Section: {current_section} → {e}")
+
+    cursor.close()
+    return loaded
+
+
+# ========== BULK LOADER ==========
+
+def _parse_file(filepath):
+    # Runs in a worker process; errors come back as data so one bad file
+    # doesn't take down the pool.
+    try:
+        return filepath, parse_match(filepath), None
+    except Exception as e:
+        return filepath, None, f"{type(e).__name__}: {e}"
+
+
+# Files each worker may have parsed ahead of the loader. pool.map() would
+# submit the whole archive at once and keep every parsed match until the
+# loader got to it, so the parent's memory grew with the archive whenever
+# parsing outran the inserts.
+PARSE_AHEAD_PER_WORKER = 4
+
+
+def parse_files(paths, workers):
+    if workers <= 1:
+        yield from map(_parse_file, paths)
+        return
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(_parse_file, path)
+                        for path in itertools.islice(paths, workers * PARSE_AHEAD_PER_WORKER))
+        while pending:
+            result = pending.popleft().result()
+            for path in itertools.islice(paths, 1):
+                pending.append(pool.submit(_parse_file, path))
+            yield result
+
+
+def _load_batch(conn, cursor, batch):
+    """One transaction for the whole batch; returns (loaded, rows inserted)."""
+    try:
+        inserted = insert_matches(cursor, batch)
+        refresh_aggregates(cursor, [rows["match_id"] for rows in batch])
+        bump_data_version(cursor)
+        conn.commit()
+        return len(batch), inserted
+    except ipl_db.ERRORS as e:
+        conn.rollback()
+        print(f"⚠️ Batch of {len(batch)} matches failed ({e}), loading them one by one")
+        return _load_one_by_one(conn, cursor, batch)
+
+
+def _load_one_by_one(conn, cursor, batch):
+    # Fallback when a batch fails: load its matches individually with
+    # foreign key checks back on, so only the bad files are skipped.
+    cursor.execute("SET foreign_key_checks = 1")
+    loaded, inserted = 0, 0
+    for rows in batch:
+        try:
+            insert_match(cursor, rows)
+            refresh_match_aggregates(cursor, rows["match_id"])
+            bump_data_version(cursor)
+            conn.commit()
+            loaded += 1
+            inserted += sum(len(rows[table]) for table, _ in INSERT_SQL)
+        except ipl_db.ERRORS as e:
+            conn.rollback()
+            print(f"❌ Database Error in match {rows['match_id']} → {e}")
+    cursor.execute("SET foreign_key_checks = 0")
+    return loaded, inserted
+
+
+# A bulk batch also ends once it holds this many deliveries, so a batch of
+# files far longer than a T20 match stays the same size in memory.
+BULK_BATCH_DELIVERIES = 100 * BULK_INSERT_ROWS
+
+
+def bulk_load_directory(conn, data_dir, workers=None, batch_size=200):
+    """Parse files in a process pool and load batch_size matches per transaction."""
+    workers = workers or os.cpu_count() or 1
+    paths = [os.path.join(data_dir, f) for f in sorted(os.listdir(data_dir)) if f.endswith(".json")]
+    cursor = conn.cursor()
+    # Every batch is one transaction inserted in INSERT_SQL order, so the
+    # per-row foreign key lookups only cost time here. Checks are restored
+    # before the connection is handed back.
+    cursor.execute("SET foreign_key_checks = 0")
+
+    start = time.perf_counter()
+    loaded, failed, inserted = 0, 0, 0
+    parsed = parse_files(paths, workers)
+    try:
+        while True:
+            batch, deliveries = [], 0
+            for path, rows, error in parsed:
+                if error:
+                    failed += 1
+                    print(f"❌ General Error in file {os.path.basename(path)} → Section: PARSE → {error}")
+                    continue
+                batch.append(rows)
+                deliveries += len(rows["deliveries"])
+                if len(batch) >= batch_size or deliveries >= BULK_BATCH_DELIVERIES:
+                    break
+            if not batch:
+                break
+            batch_loaded, batch_inserted = _load_batch(conn, cursor, batch)
+            loaded += batch_loaded
+            failed += len(batch) - batch_loaded
+            inserted += batch_inserted
+            print(f"✅ {loaded}/{len(paths)} files loaded")
+    finally:
+        parsed.close()
+        cursor.execute("SET foreign_key_checks = 1")
+        cursor.close()
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "files": loaded,
+        "failed": failed,
+        "rows": inserted,
+        "seconds": round(elapsed, 2),
+        "files_per_s": round(loaded / elapsed, 1) if elapsed else 0.0,
+        "rows_per_s": round(inserted / elapsed, 1) if elapsed else 0.0,
+        "workers": workers,
+        "batch_size": batch_size
+    }
+    print(f"✅ Bulk load: {loaded} files, {inserted} rows in {report['seconds']}s "
+          f"({report['files_per_s']} files/s, {report['rows_per_s']} rows/s)")
+    return report
+
+
+# ========== LIVE UPDATES ==========
+
+# A live feed is a file of JSON lines that grows while the match is played:
+#
+#   {"match_id": "1473500", "info": {...}}
+#   {"match_id": "1473500", "inning": 1, "team": "Mumbai Indians", "powerplays": [...]}
+#   {"match_id": "1473500", "inning": 1, "team": "Mumbai Indians", "over": 0, "delivery": {...}}
+#
+# "info" is the cricsheet info block and opens the match; "powerplays" is
+# the cricsheet inning's powerplay list, sent when an inning starts (or
+# with any later line of it once a powerplay is taken); "delivery" is a
+# cricsheet delivery object, "team" the batting side and "over" the 0-based
+# over it belongs to. Balls are numbered in arrival order within their over,
+# as parse_match numbers them, so reading a feed again from the start skips
+# the balls that are already loaded.
+#
+# follow_live() tails the file and writes whatever lines arrived since the
+# last poll (up to LIVE_BATCH_LINES) as one transaction: the new deliveries,
+# the summary rows those balls touched, any powerplays, and a live_version
+# bump. Loading the finished match file with --incremental later replaces
+# the live rows.
+LIVE_POLL_SECONDS = 0.1
+LIVE_BATCH_LINES = 36
+
+# Summary rows a live batch rewrites by primary key.
+LIVE_UPSERT_SQL = {
+    **{table: sql.replace("INSERT INTO", "REPLACE INTO", 1) for table, sql in INSERT_SQL
+       if table in ("partnerships", "player_match_batting", "player_match_bowling", "powerplay")},
+    "innings_totals": """
+        REPLACE INTO innings_totals (match_id, inning_num, batting_team_id, bowling_team_id, total_runs, balls)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """,
+    "venue_match_totals": "REPLACE INTO venue_match_totals (match_id, venue, total_runs) VALUES (%s, %s, %s)",
+}
+
+
+class LiveMatch:
+    """Ingest state for one match followed ball by ball."""
+
+    def __init__(self, match_id, info):
+        self.match_id = match_id
+        self.info = info
+        self.context = delivery_context(match_id, info)
+        self.scorecard = ScorecardBuilder(match_id)
+        self.loaded = Counter()   # (inning_num, over_num) -> balls in the database
+        self.arrived = Counter()  # (inning_num, over_num) -> balls read from the feed
+
+    @classmethod
+    def load(cls, cursor, match_id, info, rewind=True):
+        """State for match_id, opening the match if it isn't loaded; returns (match, opened).
+
+        The one read of the match's earlier deliveries happens here. rewind
+        means the feed is being read from its start, so balls already loaded
+        are skipped as they come past; otherwise new balls are numbered after
+        them.
+        """
+        match = cls(match_id, info)
+        cursor.execute("SELECT match_id FROM match_detail WHERE match_id = %s", (match_id,))
+        if not cursor.fetchall():
+            insert_match(cursor, match_rows(match_id, {"info": info}))
+            refresh_match_aggregates(cursor, match_id)
+            return match, True
+
+        deliveries, wickets = load_scorecard_source(cursor, match_id)
+        dismissals = wicket_dismissals(wickets)
+        for delivery in deliveries:
+            match.scorecard.add(delivery, dismissals.get(delivery[0]))
+            over = (delivery[2], delivery[5])
+            match.loaded[over] = max(match.loaded[over], delivery[6])
+        match.scorecard.changed_rows()  # already in the database
+        if not rewind:
+            match.arrived.update(match.loaded)
+        return match, False
+
+    def add(self, rows, event):
+        """Append one feed delivery to rows; False if it is already loaded."""
+        inning_num, over_num = int(event["inning"]), int(event["over"])
+        over = (inning_num, over_num)
+        self.arrived[over] += 1
+        ball_num = self.arrived[over]
+        if ball_num <= self.loaded[over]:
+            return False
+        self.loaded[over] = ball_num
+
+        batting_team_id, bowling_team_id = innings_teams(self.info, event["team"])
+        first_wicket = len(rows["wickets"])
+        delivery_id = add_delivery(rows, self.context, inning_num, batting_team_id, bowling_team_id,
+                                   over_num, ball_num, event["delivery"])
+        self.scorecard.add(rows["deliveries"][-1], wicket_dismissals(rows["wickets"][first_wicket:]).get(delivery_id))
+        return True
+
+    def summary_rows(self):
+        """Summary rows changed since the last call."""
+        changed = self.scorecard.changed_rows()
+        total_runs = sum(totals[2] for totals in self.scorecard.innings.values())
+        changed["venue_match_totals"] = [(self.match_id, self.info.get("venue"), total_runs)]
+        return changed
+
+
+def apply_live_batch(cursor, live, infos, events, recover=()):
+    """Write one micro-batch of feed events in the caller's transaction.
+
+    live maps match_id -> LiveMatch and infos match_id -> info block, both
+    kept across batches. Matches in recover are reloaded without rewinding.
+    Returns (deliveries added, powerplay rows written, matches opened).
+    """
+    pending, powerplays = {}, []
+    added = opened = 0
+    for event in events:
+        match_id = str(event["match_id"])
+        if "info" in event:
+            infos[match_id] = event["info"]
+        elif match_id not in infos:
+            raise ValueError(f"Feed line for match {match_id} before its info line")
+        if match_id not in live:
+            live[match_id], new = LiveMatch.load(cursor, match_id, infos[match_id], rewind=match_id not in recover)
+            opened += new
+        if "powerplays" in event:
+            # Keyed by match, inning and overs, so a repeated line rewrites its row.
+            powerplays.extend(powerplay_rows(match_id, int(event["inning"]), event["powerplays"]))
+        if "delivery" in event:
+            rows = pending.setdefault(match_id, {"match_id": match_id, **{table: [] for table, _ in INSERT_SQL}})
+            added += live[match_id].add(rows, event)
+
+    for match_id, rows in pending.items():
+        if not rows["deliveries"]:
+            continue
+        insert_match(cursor, rows)
+        for table, summary in live[match_id].summary_rows().items():
+            if summary:
+                cursor.executemany(LIVE_UPSERT_SQL[table], summary)
+    if powerplays:
+        cursor.executemany(LIVE_UPSERT_SQL["powerplay"], powerplays)
+    return added, len(powerplays), opened
+
+
+def read_feed_lines(feed, limit):
+    """Complete lines appended to feed since the last call, at most limit; a partial last line waits."""
+    lines = []
+    while len(lines) < limit:
+        position = feed.tell()
+        line = feed.readline()
+        if not line.endswith("\n"):
+            feed.seek(position)
+            break
+        if line.strip():
+            lines.append(line)
+    return lines
+
+
+def _commit_live_batch(conn, cursor, live, infos, events, recover):
+    """apply_live_batch() in its own transaction; returns deliveries added."""
+    try:
+        added, powerplays, opened = apply_live_batch(cursor, live, infos, events, recover)
+        if opened:
+            # New players, teams and venues for the server's gazetteer.
+            bump_data_version(cursor)
+        if added or powerplays:
+            bump_live_version(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # The in-memory state ran ahead of the rollback; reload it from the
+        # database before the next ball.
+        recover.update(live)
+        live.clear()
+        raise
+    recover.difference_update(live)
+    return added
+
+
+def follow_live(conn, path, follow=True, poll_seconds=LIVE_POLL_SECONDS, batch_lines=LIVE_BATCH_LINES, stop=None):
+    """Load a live feed file ball by ball, following it as it grows unless follow is False.
+
+    stop is an optional threading.Event that ends a follow between batches.
+    """
+    cursor = conn.cursor()
+    live, infos, recover = {}, {}, set()
+    counts = {"batches": 0, "deliveries": 0, "failed_lines": 0}
+    with open(path, encoding="utf-8") as feed:
+        try:
+            while stop is None or not stop.is_set():
+                lines = read_feed_lines(feed, batch_lines)
+                if not lines:
+                    if not follow:
+                        break
+                    time.sleep(poll_seconds)
+                    continue
+
+                start = time.perf_counter()
+                events = []
+                for line in lines:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError as e:
+                        counts["failed_lines"] += 1
+                        print(f"❌ Skipping malformed feed line → {e}: {line[:80]!r}")
+                try:
+                    added = _commit_live_batch(conn, cursor, live, infos, events, recover)
+                except Exception as e:
+                    # Retry line by line so one bad ball doesn't hold back the rest.
+                    print(f"⚠️ Live batch of {len(events)} lines failed ({e}), loading them one by one")
+                    added = 0
+                    for event in events:
+                        try:
+                            added += _commit_live_batch(conn, cursor, live, infos, [event], recover)
+                        except Exception as e:
+                            counts["failed_lines"] += 1
+                            kind = "Database Error" if isinstance(e, ipl_db.ERRORS) else "General Error"
+                            print(f"❌ {kind} in live feed line for match {event.get('match_id')} → {e}")
+                counts["batches"] += 1
+                counts["deliveries"] += added
+                print(f"✅ Live: {added} deliveries from {len(lines)} lines in {(time.perf_counter() - start) * 1000:.1f} ms")
+        except KeyboardInterrupt:
+            pass
+    cursor.close()
+    print(f"✅ Live feed: {counts['deliveries']} deliveries in {counts['batches']} batches, "
+          f"{counts['failed_lines']} lines failed")
+    return counts
+
+
+def feed_events(match_id, data):
+    """A finished cricsheet match as live feed events, for replaying it ball by ball."""
+    yield {"match_id": match_id, "info": data.get("info", {})}
+    for inning_num, inning in enumerate(data.get("innings", []), start=1):
+        if inning.get("powerplays"):
+            yield {"match_id": match_id, "inning": inning_num, "team": inning.get("team"),
+                   "powerplays": inning["powerplays"]}
+        for over_data in inning.get("overs", []):
+            for ind_delivery in over_data.get("deliveries", []):
+                yield {"match_id": match_id, "inning": inning_num, "team": inning.get("team"),
+                       "over": int(over_data.get("over")), "delivery": ind_delivery}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load IPL match JSON into MySQL or SQLite")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--rebuild-aggregates", action="store_true",
+                        help="Recompute the summary tables and scorecards from deliveries without loading files")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only load files that are new or changed since the last run (see ingest_manifest)")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Parse in a process pool and load many matches per transaction")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes for --bulk (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Matches per transaction for --bulk")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read each file with the streaming parser and insert it in bounded parts (default and --incremental loads)")
+    parser.add_argument("--live", metavar="FEED",
+                        help="Follow a live feed of JSON lines (see LIVE UPDATES) and load each ball as it arrives")
+    parser.add_argument("--no-follow", action="store_true", help="With --live, load what the feed holds and exit")
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="Load into this SQLite file instead of MySQL, creating it from tables_sqlite.sql if missing")
+    args = parser.parse_args()
+
+    backend = ipl_db.SQLiteBackend(args.sqlite) if args.sqlite else ipl_db.MySQLBackend(db_config)
+    try:
+        conn = backend.connect(create=True)
+        print(f"✅ Connected to {backend.describe()}.")
+    except ipl_db.ERRORS as e:
+        print(f"❌ Error while connecting to {backend.describe()}:")
+        print(f"Message: {e}")
+        return
+
+    try:
+        if args.rebuild_aggregates:
+            rebuild_aggregates(conn)
+        elif args.live:
+            follow_live(conn, args.live, follow=not args.no_follow)
+        elif args.incremental:
+            load_incremental(conn, args.data_dir, stream=args.stream)
+        elif args.bulk:
+            bulk_load_directory(conn, args.data_dir, workers=args.workers, batch_size=args.batch_size)
+        else:
+            loaded = load_directory(conn, args.data_dir, stream=args.stream)
+            print(f"✅ Matches tables populated! ({loaded} files)")
+        backend.analyze(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
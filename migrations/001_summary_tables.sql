@@ -0,0 +1,76 @@
+-- Migrate an ipl_data database created from the original tables.sql, before
+-- the per-match summary tables (see tables.sql, section 11), in place:
+--
+--   mysql -u root -p ipl_data < migrations/001_summary_tables.sql
+--
+-- Creates innings_totals, player_match_batting, player_match_bowling and
+-- venue_match_totals as they were first added; later migrations add their
+-- newer columns and indexes. The tables start empty: once every migration
+-- has run, fill them with
+--
+--   python ipl_sql_insert.py --rebuild-aggregates
+
+USE ipl_data;
+
+CREATE TABLE IF NOT EXISTS innings_totals (
+    match_id VARCHAR(75) NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    batting_team_id VARCHAR(50) NOT NULL,
+    bowling_team_id VARCHAR(50) NOT NULL,
+    total_runs INT NOT NULL DEFAULT 0,
+    balls INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num),
+    INDEX idx_innings_totals_runs (total_runs),
+    INDEX idx_innings_totals_inning (inning_num, total_runs),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (batting_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (bowling_team_id) REFERENCES teams(team_id)
+);
+
+CREATE TABLE IF NOT EXISTS player_match_batting (
+    match_id VARCHAR(75) NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    player_id VARCHAR(75) NOT NULL,
+    team_id VARCHAR(50) NOT NULL,
+    runs INT NOT NULL DEFAULT 0,
+    balls_faced INT NOT NULL DEFAULT 0,
+    fours INT NOT NULL DEFAULT 0,
+    sixes INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num, player_id),
+    INDEX idx_player_match_batting_player (player_id, runs),
+    INDEX idx_player_match_batting_runs (runs),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (player_id) REFERENCES players(player_id),
+    FOREIGN KEY (team_id) REFERENCES teams(team_id)
+);
+
+CREATE TABLE IF NOT EXISTS player_match_bowling (
+    match_id VARCHAR(75) NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    player_id VARCHAR(75) NOT NULL,
+    team_id VARCHAR(50) NOT NULL,
+    wickets INT NOT NULL DEFAULT 0,
+    runs_conceded INT NOT NULL DEFAULT 0,
+    balls INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num, player_id),
+    INDEX idx_player_match_bowling_player (player_id, wickets),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (player_id) REFERENCES players(player_id),
+    FOREIGN KEY (team_id) REFERENCES teams(team_id)
+);
+
+CREATE TABLE IF NOT EXISTS venue_match_totals (
+    match_id VARCHAR(75) PRIMARY KEY,
+    venue VARCHAR(300),
+    total_runs INT NOT NULL DEFAULT 0,
+
+    INDEX idx_venue_match_totals_venue (venue, total_runs),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id)
+);
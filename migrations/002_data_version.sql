@@ -0,0 +1,16 @@
+-- Add the data_version counter (see tables.sql, section 12) that
+-- ipl_sql_insert.py bumps in every transaction that changes match data, and
+-- that the server's result cache is invalidated by:
+--
+--   mysql -u root -p ipl_data < migrations/002_data_version.sql
+--
+-- Safe to run on a database that already has it.
+
+USE ipl_data;
+
+CREATE TABLE IF NOT EXISTS data_version (
+    id TINYINT PRIMARY KEY CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO data_version (id, version) VALUES (1, 0);
@@ -0,0 +1,155 @@
+-- Migrate an ipl_data database created before the integer surrogate keys
+-- (see tables.sql) in place:
+--
+--   mysql -u root -p ipl_data < migrations/003_integer_keys.sql
+--
+-- Adds team_key, player_key and match_key, rebuilds deliveries, wickets and
+-- reviews on integer keys, and adds the covering indexes the templates use.
+-- Every other table keeps its rows. Stop ingest while it runs; the server
+-- can keep running and picks up the change through data_version.
+--
+-- Run 001 and 002 first: this bumps data_version and re-indexes
+-- player_match_bowling.
+
+USE ipl_data;
+
+SET foreign_key_checks = 0;
+
+-- 1. Surrogate keys (AUTO_INCREMENT fills existing rows)
+ALTER TABLE teams
+    ADD COLUMN team_key INT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE AFTER team_id;
+
+ALTER TABLE players
+    ADD COLUMN player_key INT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE AFTER player_id;
+
+ALTER TABLE match_detail
+    ADD COLUMN match_key INT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE AFTER match_id,
+    ADD INDEX idx_match_detail_date (match_date),
+    ADD INDEX idx_match_detail_city (city),
+    ADD INDEX idx_match_detail_venue (venue),
+    ADD INDEX idx_match_detail_stage (stage),
+    ADD INDEX idx_match_detail_win_by_runs (win_by_runs),
+    ADD INDEX idx_match_detail_win_by_wickets (win_by_wickets);
+
+-- 2. Deliveries on integer keys
+CREATE TABLE deliveries_keyed (
+    delivery_key BIGINT UNSIGNED PRIMARY KEY,
+    match_key INT UNSIGNED NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    batting_team_key INT UNSIGNED NOT NULL,
+    bowling_team_key INT UNSIGNED NOT NULL,
+    over_num INT NOT NULL CHECK (over_num >= 0),
+    ball_num INT NOT NULL CHECK (ball_num >= 0),
+
+    batsman_key INT UNSIGNED NOT NULL,
+    bowler_key INT UNSIGNED NOT NULL,
+    non_striker_key INT UNSIGNED NOT NULL,
+
+    runs_batsman INT NOT NULL DEFAULT 0 CHECK (runs_batsman >= 0),
+    runs_extras INT NOT NULL DEFAULT 0 CHECK (runs_extras >= 0),
+    runs_total INT NOT NULL DEFAULT 0 CHECK (runs_total >= 0),
+
+    extras_type VARCHAR(50),
+    extras_runs INT DEFAULT 0 CHECK (extras_runs >= 0),
+
+    INDEX idx_deliveries_innings (match_key, inning_num, over_num, batting_team_key, runs_total),
+    INDEX idx_deliveries_partnership (match_key, batting_team_key, bowling_team_key, batsman_key, non_striker_key, runs_total),
+
+    FOREIGN KEY (match_key) REFERENCES match_detail(match_key),
+    FOREIGN KEY (batting_team_key) REFERENCES teams(team_key),
+    FOREIGN KEY (bowling_team_key) REFERENCES teams(team_key),
+    FOREIGN KEY (batsman_key) REFERENCES players(player_key),
+    FOREIGN KEY (bowler_key) REFERENCES players(player_key),
+    FOREIGN KEY (non_striker_key) REFERENCES players(player_key)
+);
+
+INSERT INTO deliveries_keyed (
+    delivery_key, match_key, inning_num, batting_team_key, bowling_team_key,
+    over_num, ball_num, batsman_key, bowler_key, non_striker_key,
+    runs_batsman, runs_extras, runs_total, extras_type, extras_runs
+)
+SELECT
+    md.match_key * 100000 + d.inning_num * 10000 + d.over_num * 100 + d.ball_num,
+    md.match_key, d.inning_num, bt.team_key, wt.team_key,
+    d.over_num, d.ball_num, pb.player_key, pw.player_key, pn.player_key,
+    d.runs_batsman, d.runs_extras, d.runs_total, d.extras_type, d.extras_runs
+FROM deliveries d
+JOIN match_detail md ON md.match_id = d.match_id
+JOIN teams bt ON bt.team_id = d.batting_team_id
+JOIN teams wt ON wt.team_id = d.bowling_team_id
+JOIN players pb ON pb.player_id = d.batsman_id
+JOIN players pw ON pw.player_id = d.bowler_id
+JOIN players pn ON pn.player_id = d.non_striker_id;
+
+RENAME TABLE
+    deliveries TO deliveries_old,
+    wickets TO wickets_old,
+    reviews TO reviews_old,
+    deliveries_keyed TO deliveries;
+
+-- 3. Wickets and reviews reference delivery_key
+CREATE TABLE wickets (
+    wicket_id varchar(200) PRIMARY KEY,
+    delivery_key BIGINT UNSIGNED NOT NULL,
+    player_dismissed_id VARCHAR(75) NOT NULL,
+    dismissal_kind VARCHAR(50) NOT NULL,
+    fielder_id VARCHAR(75),
+
+    FOREIGN KEY (player_dismissed_id) REFERENCES players(player_id),
+    FOREIGN KEY (fielder_id) REFERENCES players(player_id),
+    FOREIGN KEY (delivery_key) REFERENCES deliveries(delivery_key)
+);
+
+INSERT INTO wickets (wicket_id, delivery_key, player_dismissed_id, dismissal_kind, fielder_id)
+SELECT
+    w.wicket_id,
+    md.match_key * 100000 + d.inning_num * 10000 + d.over_num * 100 + d.ball_num,
+    w.player_dismissed_id, w.dismissal_kind, w.fielder_id
+FROM wickets_old w
+JOIN deliveries_old d ON d.delivery_id = w.delivery_id
+JOIN match_detail md ON md.match_id = d.match_id;
+
+CREATE TABLE reviews (
+    review_id VARCHAR(200) PRIMARY KEY,
+    match_id VARCHAR(75) NOT NULL,
+    delivery_key BIGINT UNSIGNED NOT NULL,
+
+    review_by_team_id VARCHAR(50) NOT NULL,
+    umpire_id VARCHAR(150),
+    batsman_name_id VARCHAR(75),
+    decision VARCHAR(50) NOT NULL,
+    review_type VARCHAR(50) NOT NULL,
+    umpires_call VARCHAR(10),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (delivery_key) REFERENCES deliveries(delivery_key),
+    FOREIGN KEY (review_by_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (batsman_name_id) REFERENCES players(player_id),
+    FOREIGN KEY (umpire_id) REFERENCES officials(official_id)
+);
+
+INSERT INTO reviews (
+    review_id, match_id, delivery_key, review_by_team_id, umpire_id,
+    batsman_name_id, decision, review_type, umpires_call
+)
+SELECT
+    r.review_id, r.match_id,
+    md.match_key * 100000 + d.inning_num * 10000 + d.over_num * 100 + d.ball_num,
+    r.review_by_team_id, r.umpire_id, r.batsman_name_id, r.decision, r.review_type, r.umpires_call
+FROM reviews_old r
+JOIN deliveries_old d ON d.delivery_id = r.delivery_id
+JOIN match_detail md ON md.match_id = d.match_id;
+
+DROP TABLE reviews_old, wickets_old, deliveries_old;
+
+-- 4. Covering indexes for the template query shapes
+ALTER TABLE powerplay
+    ADD INDEX idx_powerplay_overs (match_id, inning_num, start_over, end_over);
+
+ALTER TABLE player_match_bowling
+    DROP INDEX idx_player_match_bowling_player,
+    ADD INDEX idx_player_match_bowling_player (player_id, match_id, wickets, runs_conceded);
+
+UPDATE data_version SET version = version + 1 WHERE id = 1;
+
+SET foreign_key_checks = 1;
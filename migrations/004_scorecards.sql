@@ -0,0 +1,46 @@
+-- Migrate an ipl_data database created before the partnerships table and
+-- the scorecard columns (see tables.sql, section 11) in place:
+--
+--   mysql -u root -p ipl_data < migrations/004_scorecards.sql
+--   python ipl_sql_insert.py --rebuild-aggregates
+--
+-- Adds partnerships and the batting/bowling order and dismissal columns, and
+-- drops the deliveries index that only served the old partnerships group-by.
+-- The rebuild fills the new table and columns from deliveries and wickets.
+
+USE ipl_data;
+
+ALTER TABLE player_match_batting
+    ADD COLUMN batting_position INT NOT NULL DEFAULT 0 AFTER team_id,
+    ADD COLUMN dismissal_kind VARCHAR(50),
+    ADD COLUMN bowler_id VARCHAR(75),
+    ADD COLUMN fielder_id VARCHAR(75);
+
+ALTER TABLE player_match_bowling
+    ADD COLUMN bowling_position INT NOT NULL DEFAULT 0 AFTER team_id;
+
+CREATE TABLE partnerships (
+    match_id VARCHAR(75) NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    wicket_num INT NOT NULL CHECK (wicket_num > 0),
+    batting_team_id VARCHAR(50) NOT NULL,
+    bowling_team_id VARCHAR(50) NOT NULL,
+    batter1_id VARCHAR(75) NOT NULL,
+    batter2_id VARCHAR(75) NOT NULL,
+    runs INT NOT NULL DEFAULT 0,
+    balls INT NOT NULL DEFAULT 0,
+    batter1_runs INT NOT NULL DEFAULT 0,
+    batter2_runs INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num, wicket_num, batter1_id, batter2_id),
+    INDEX idx_partnerships_runs (runs),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (batting_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (bowling_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (batter1_id) REFERENCES players(player_id),
+    FOREIGN KEY (batter2_id) REFERENCES players(player_id)
+);
+
+ALTER TABLE deliveries
+    DROP INDEX idx_deliveries_partnership;
@@ -0,0 +1,11 @@
+-- Add the live_version counter that ipl_sql_insert.py --live bumps after
+-- every ball-by-ball batch (see tables.sql, section 12):
+--
+--   mysql -u root -p ipl_data < migrations/005_live_version.sql
+--
+-- Restart the server afterwards; it reads both counters in one query.
+
+USE ipl_data;
+
+ALTER TABLE data_version
+    ADD COLUMN live_version BIGINT NOT NULL DEFAULT 0;
@@ -2,6 +2,13 @@ DROP DATABASE IF EXISTS ipl_data;
 CREATE DATABASE ipl_data;
 USE ipl_data;
 
+DROP TABLE IF EXISTS ingest_manifest;
+DROP TABLE IF EXISTS data_version;
+DROP TABLE IF EXISTS partnerships;
+DROP TABLE IF EXISTS venue_match_totals;
+DROP TABLE IF EXISTS player_match_bowling;
+DROP TABLE IF EXISTS player_match_batting;
+DROP TABLE IF EXISTS innings_totals;
 DROP TABLE IF EXISTS powerplay;
 DROP TABLE IF EXISTS wickets;
 DROP TABLE IF EXISTS match_players;
@@ -16,14 +23,19 @@ DROP TABLE IF EXISTS players;
 DROP TABLE IF EXISTS teams;
 
 -- 1. TEAMS
+-- Teams, players and matches keep their cricsheet string ids as primary
+-- keys (the API and the summary tables use them) and get an integer
+-- surrogate key that deliveries, the largest table, references instead.
 CREATE TABLE teams (
     team_id VARCHAR(50) PRIMARY KEY,
+    team_key INT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE,
     team_name VARCHAR(250) NOT NULL UNIQUE
 );
 
 -- 2. PLAYERS
 CREATE TABLE players (
     player_id VARCHAR(100) PRIMARY KEY,
+    player_key INT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE,
     player_name VARCHAR(200) NOT NULL,
     substitute BOOL DEFAULT FALSE
 );
@@ -41,6 +53,7 @@ CREATE TABLE players_team (
 -- 3. MATCH DETAILS
 CREATE TABLE match_detail (
     match_id VARCHAR(100) PRIMARY KEY,
+    match_key INT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE,
     match_date DATE NOT NULL,
     city VARCHAR(100) NOT NULL,
     venue VARCHAR(300),
@@ -65,6 +78,13 @@ CREATE TABLE match_detail (
 
     player_of_match_id VARCHAR(100),
 
+    INDEX idx_match_detail_date (match_date),
+    INDEX idx_match_detail_city (city),
+    INDEX idx_match_detail_venue (venue),
+    INDEX idx_match_detail_stage (stage),
+    INDEX idx_match_detail_win_by_runs (win_by_runs),
+    INDEX idx_match_detail_win_by_wickets (win_by_wickets),
+
     FOREIGN KEY (player_of_match_id) REFERENCES players(player_id),
     FOREIGN KEY (team1_id) REFERENCES teams(team_id),
     FOREIGN KEY (team2_id) REFERENCES teams(team_id),
@@ -95,18 +115,20 @@ CREATE TABLE match_officials (
 );
 
 -- 6. DELIVERIES DETAIL
+-- delivery_key = match_key * 100000 + inning_num * 10000 + over_num * 100 + ball_num,
+-- so the clustered primary key keeps each innings' balls together and in order.
 CREATE TABLE deliveries (
-    delivery_id VARCHAR(100) PRIMARY KEY,
-    match_id VARCHAR(75) NOT NULL,
+    delivery_key BIGINT UNSIGNED PRIMARY KEY,
+    match_key INT UNSIGNED NOT NULL,
     inning_num INT NOT NULL CHECK (inning_num > 0),
-    batting_team_id VARCHAR(50) NOT NULL,
-    bowling_team_id VARCHAR(50) NOT NULL,
+    batting_team_key INT UNSIGNED NOT NULL,
+    bowling_team_key INT UNSIGNED NOT NULL,
     over_num INT NOT NULL CHECK (over_num >= 0),
     ball_num INT NOT NULL CHECK (ball_num >= 0),
         
-    batsman_id VARCHAR(75) NOT NULL,
-    bowler_id VARCHAR(75) NOT NULL,
-    non_striker_id VARCHAR(75) NOT NULL,
+    batsman_key INT UNSIGNED NOT NULL,
+    bowler_key INT UNSIGNED NOT NULL,
+    non_striker_key INT UNSIGNED NOT NULL,
     
     runs_batsman INT NOT NULL DEFAULT 0 CHECK (runs_batsman >= 0),
     runs_extras INT NOT NULL DEFAULT 0 CHECK (runs_extras >= 0),
@@ -115,12 +137,15 @@ CREATE TABLE deliveries (
     extras_type VARCHAR(50),
     extras_runs INT DEFAULT 0 CHECK (extras_runs >= 0),
 
-    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
-    FOREIGN KEY (batting_team_id) REFERENCES teams(team_id),
-    FOREIGN KEY (bowling_team_id) REFERENCES teams(team_id),
-    FOREIGN KEY (batsman_id) REFERENCES players(player_id),
-    FOREIGN KEY (bowler_id) REFERENCES players(player_id),
-    FOREIGN KEY (non_striker_id) REFERENCES players(player_id)
+    -- Covers the per-match summary refresh and the powerplay over-range join.
+    INDEX idx_deliveries_innings (match_key, inning_num, over_num, batting_team_key, runs_total),
+
+    FOREIGN KEY (match_key) REFERENCES match_detail(match_key),
+    FOREIGN KEY (batting_team_key) REFERENCES teams(team_key),
+    FOREIGN KEY (bowling_team_key) REFERENCES teams(team_key),
+    FOREIGN KEY (batsman_key) REFERENCES players(player_key),
+    FOREIGN KEY (bowler_key) REFERENCES players(player_key),
+    FOREIGN KEY (non_striker_key) REFERENCES players(player_key)
 );
 
 
@@ -128,7 +153,7 @@ CREATE TABLE deliveries (
 CREATE TABLE reviews (
     review_id VARCHAR(200) PRIMARY KEY,
     match_id VARCHAR(75) NOT NULL,
-    delivery_id VARCHAR(100) NOT NULL,
+    delivery_key BIGINT UNSIGNED NOT NULL,
     
     review_by_team_id VARCHAR(50) NOT NULL,
     umpire_id VARCHAR(150),
@@ -138,7 +163,7 @@ CREATE TABLE reviews (
     umpires_call VARCHAR(10),
 
     FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
-    FOREIGN KEY (delivery_id) REFERENCES deliveries(delivery_id),
+    FOREIGN KEY (delivery_key) REFERENCES deliveries(delivery_key),
     FOREIGN KEY (review_by_team_id) REFERENCES teams(team_id),
     FOREIGN KEY (batsman_name_id) REFERENCES players(player_id),
     FOREIGN KEY (umpire_id) REFERENCES officials(official_id)
@@ -179,14 +204,14 @@ CREATE TABLE match_players (
 -- 10. Wickets
 CREATE TABLE wickets (
     wicket_id varchar(200) PRIMARY KEY,
-    delivery_id VARCHAR(100) NOT NULL,
+    delivery_key BIGINT UNSIGNED NOT NULL,
     player_dismissed_id VARCHAR(75) NOT NULL,
     dismissal_kind VARCHAR(50) NOT NULL,
     fielder_id VARCHAR(75),
     
    FOREIGN KEY (player_dismissed_id) REFERENCES players(player_id),
     FOREIGN KEY (fielder_id) REFERENCES players(player_id),
-    FOREIGN KEY (delivery_id) REFERENCES deliveries(delivery_id)
+    FOREIGN KEY (delivery_key) REFERENCES deliveries(delivery_key)
 
     );
     
@@ -199,9 +224,144 @@ CREATE TABLE wickets (
     end_over int,
     pp_type varchar(10),
     
+    INDEX idx_powerplay_overs (match_id, inning_num, start_over, end_over),
+
     FOREIGN KEY (match_id) REFERENCES match_detail(match_id)
     );
-    
 
-    
 
+-- 11. SUMMARY TABLES
+-- Maintained per match by ipl_sql_insert.py in the same transaction as the
+-- match's deliveries: innings_totals and venue_match_totals by
+-- refresh_match_aggregates, the scorecards and partnerships by
+-- innings_scorecards in one ordered pass over each innings. Leaderboard
+-- templates read these instead of grouping the whole deliveries table.
+
+-- 11_1. Innings totals
+CREATE TABLE innings_totals (
+    match_id VARCHAR(75) NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    batting_team_id VARCHAR(50) NOT NULL,
+    bowling_team_id VARCHAR(50) NOT NULL,
+    total_runs INT NOT NULL DEFAULT 0,
+    balls INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num),
+    INDEX idx_innings_totals_runs (total_runs),
+    INDEX idx_innings_totals_inning (inning_num, total_runs),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (batting_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (bowling_team_id) REFERENCES teams(team_id)
+);
+
+-- 11_2. Batting line per player per innings (the batting scorecard)
+-- Every batter who came to the crease, including one who never faced a
+-- ball. dismissal_kind is NULL for not out; bowler_id is set for the
+-- dismissals credited to the bowler.
+CREATE TABLE player_match_batting (
+    match_id VARCHAR(75) NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    player_id VARCHAR(75) NOT NULL,
+    team_id VARCHAR(50) NOT NULL,
+    batting_position INT NOT NULL DEFAULT 0,
+    runs INT NOT NULL DEFAULT 0,
+    balls_faced INT NOT NULL DEFAULT 0,
+    fours INT NOT NULL DEFAULT 0,
+    sixes INT NOT NULL DEFAULT 0,
+    dismissal_kind VARCHAR(50),
+    bowler_id VARCHAR(75),
+    fielder_id VARCHAR(75),
+
+    PRIMARY KEY (match_id, inning_num, player_id),
+    INDEX idx_player_match_batting_player (player_id, runs),
+    INDEX idx_player_match_batting_runs (runs),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (player_id) REFERENCES players(player_id),
+    FOREIGN KEY (team_id) REFERENCES teams(team_id)
+);
+
+-- 11_3. Bowling line per player per innings (the bowling scorecard)
+CREATE TABLE player_match_bowling (
+    match_id VARCHAR(75) NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    player_id VARCHAR(75) NOT NULL,
+    team_id VARCHAR(50) NOT NULL,
+    bowling_position INT NOT NULL DEFAULT 0,
+    wickets INT NOT NULL DEFAULT 0,
+    runs_conceded INT NOT NULL DEFAULT 0,
+    balls INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num, player_id),
+    INDEX idx_player_match_bowling_player (player_id, match_id, wickets, runs_conceded),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (player_id) REFERENCES players(player_id),
+    FOREIGN KEY (team_id) REFERENCES teams(team_id)
+);
+
+-- 11_4. Match total per venue
+CREATE TABLE venue_match_totals (
+    match_id VARCHAR(75) PRIMARY KEY,
+    venue VARCHAR(300),
+    total_runs INT NOT NULL DEFAULT 0,
+
+    INDEX idx_venue_match_totals_venue (venue, total_runs),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id)
+);
+
+-- 11_5. Partnerships
+-- One row per stand: consecutive deliveries with the same two batters at the
+-- crease. wicket_num is the wicket the stand was for (1 = opening stand);
+-- batter1 came in first. The same pair batting again later is a new stand.
+CREATE TABLE partnerships (
+    match_id VARCHAR(75) NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    wicket_num INT NOT NULL CHECK (wicket_num > 0),
+    batting_team_id VARCHAR(50) NOT NULL,
+    bowling_team_id VARCHAR(50) NOT NULL,
+    batter1_id VARCHAR(75) NOT NULL,
+    batter2_id VARCHAR(75) NOT NULL,
+    runs INT NOT NULL DEFAULT 0,
+    balls INT NOT NULL DEFAULT 0,
+    batter1_runs INT NOT NULL DEFAULT 0,
+    batter2_runs INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num, wicket_num, batter1_id, batter2_id),
+    INDEX idx_partnerships_runs (runs),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (batting_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (bowling_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (batter1_id) REFERENCES players(player_id),
+    FOREIGN KEY (batter2_id) REFERENCES players(player_id)
+);
+
+
+-- 12. DATA VERSION
+-- version is bumped by ipl_sql_insert.py in every transaction that loads or
+-- replaces whole matches; the server's result cache is invalidated whenever
+-- it moves. live_version is bumped by each live ball-by-ball batch
+-- (--live), and only invalidates cached results that read ball-level tables.
+CREATE TABLE data_version (
+    id TINYINT PRIMARY KEY CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    live_version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO data_version (id, version) VALUES (1, 0);
+
+
+-- 13. INGEST MANIFEST
+-- One row per loaded match file. ipl_sql_insert.py --incremental compares
+-- mtime/size and then the content hash to load only new or changed files.
+CREATE TABLE ingest_manifest (
+    file_name VARCHAR(255) PRIMARY KEY,
+    match_id VARCHAR(75) NOT NULL,
+    file_mtime_ns BIGINT NOT NULL,
+    file_size BIGINT NOT NULL,
+    content_hash CHAR(64) NOT NULL,
+    ingested_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,424 @@
+-- SQLite port of tables.sql, for the embedded backend (ipl_db.SQLiteBackend).
+--
+-- ipl_sql_insert.py --sqlite creates a new database file from this script;
+-- keep it in step with tables.sql. Differences from the MySQL schema:
+--
+-- - The integer surrogate keys (team_key, player_key, match_key) are filled
+--   from the rowid by an AFTER INSERT trigger, since SQLite only
+--   auto-increments the primary key.
+-- - deliveries.delivery_key is an INTEGER PRIMARY KEY, so it is the rowid
+--   and the table is clustered on it as in InnoDB.
+-- - Indexes are separate CREATE INDEX statements, including one per
+--   foreign key column that InnoDB would have created implicitly.
+-- - Text columns are COLLATE NOCASE, like MySQL's default case-insensitive
+--   collation, so stage = 'final' matches 'Final' on both.
+-- - ENUM becomes a CHECK and YEAR an INT.
+-- - WAL mode lets the server keep reading while --incremental or --live
+--   writes.
+
+PRAGMA journal_mode = WAL;
+
+DROP TABLE IF EXISTS ingest_manifest;
+DROP TABLE IF EXISTS data_version;
+DROP TABLE IF EXISTS partnerships;
+DROP TABLE IF EXISTS venue_match_totals;
+DROP TABLE IF EXISTS player_match_bowling;
+DROP TABLE IF EXISTS player_match_batting;
+DROP TABLE IF EXISTS innings_totals;
+DROP TABLE IF EXISTS powerplay;
+DROP TABLE IF EXISTS wickets;
+DROP TABLE IF EXISTS match_players;
+DROP TABLE IF EXISTS replacements;
+DROP TABLE IF EXISTS reviews;
+DROP TABLE IF EXISTS deliveries;
+DROP TABLE IF EXISTS match_officials;
+DROP TABLE IF EXISTS officials;
+DROP TABLE IF EXISTS match_detail;
+DROP TABLE IF EXISTS players_team;
+DROP TABLE IF EXISTS players;
+DROP TABLE IF EXISTS teams;
+
+-- 1. TEAMS
+CREATE TABLE teams (
+    team_id VARCHAR(50) COLLATE NOCASE PRIMARY KEY,
+    team_key INTEGER UNIQUE,
+    team_name VARCHAR(250) COLLATE NOCASE NOT NULL UNIQUE
+);
+
+CREATE TRIGGER teams_team_key AFTER INSERT ON teams WHEN NEW.team_key IS NULL
+BEGIN
+    UPDATE teams SET team_key = NEW.rowid WHERE rowid = NEW.rowid;
+END;
+
+-- 2. PLAYERS
+CREATE TABLE players (
+    player_id VARCHAR(100) COLLATE NOCASE PRIMARY KEY,
+    player_key INTEGER UNIQUE,
+    player_name VARCHAR(200) COLLATE NOCASE NOT NULL,
+    substitute BOOL DEFAULT FALSE
+);
+
+CREATE TRIGGER players_player_key AFTER INSERT ON players WHEN NEW.player_key IS NULL
+BEGIN
+    UPDATE players SET player_key = NEW.rowid WHERE rowid = NEW.rowid;
+END;
+
+    -- 2_1. Player_team
+CREATE TABLE players_team (
+    player_id VARCHAR(100) COLLATE NOCASE NOT NULL,
+    team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    season INT NOT NULL,
+    PRIMARY KEY (player_id, team_id, season),
+    FOREIGN KEY (player_id) REFERENCES players(player_id),
+    FOREIGN KEY (team_id) REFERENCES teams(team_id)
+);
+
+CREATE INDEX idx_players_team_team ON players_team (team_id);
+
+-- 3. MATCH DETAILS
+CREATE TABLE match_detail (
+    match_id VARCHAR(100) COLLATE NOCASE PRIMARY KEY,
+    match_key INTEGER UNIQUE,
+    match_date DATE NOT NULL,
+    city VARCHAR(100) COLLATE NOCASE NOT NULL,
+    venue VARCHAR(300) COLLATE NOCASE,
+    match_number INT,
+    stage VARCHAR(100) COLLATE NOCASE,
+    match_type VARCHAR(50) COLLATE NOCASE NOT NULL,
+    gender VARCHAR(6) COLLATE NOCASE NOT NULL CHECK (gender IN ('male', 'female')),
+    event_name VARCHAR(100) COLLATE NOCASE,
+    balls_per_over INT DEFAULT 6 CHECK (balls_per_over > 0),
+    overs INT CHECK (overs > 0),
+    season INT NOT NULL,
+    team_type VARCHAR(75) COLLATE NOCASE NOT NULL,
+
+    team1_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    team2_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    toss_winner_team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    toss_decision VARCHAR(20) COLLATE NOCASE NOT NULL,
+    winner_team_id VARCHAR(50) COLLATE NOCASE,
+
+    win_by_runs INT DEFAULT NULL CHECK (win_by_runs >= 0),
+    win_by_wickets INT DEFAULT NULL CHECK (win_by_wickets >= 0),
+
+    player_of_match_id VARCHAR(100) COLLATE NOCASE,
+
+    FOREIGN KEY (player_of_match_id) REFERENCES players(player_id),
+    FOREIGN KEY (team1_id) REFERENCES teams(team_id),
+    FOREIGN KEY (team2_id) REFERENCES teams(team_id),
+    FOREIGN KEY (toss_winner_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (winner_team_id) REFERENCES teams(team_id),
+
+    CHECK (team1_id <> team2_id),
+    CHECK (winner_team_id IS NULL OR winner_team_id = team1_id OR winner_team_id = team2_id)
+);
+
+CREATE TRIGGER match_detail_match_key AFTER INSERT ON match_detail WHEN NEW.match_key IS NULL
+BEGIN
+    UPDATE match_detail SET match_key = NEW.rowid WHERE rowid = NEW.rowid;
+END;
+
+CREATE INDEX idx_match_detail_date ON match_detail (match_date);
+CREATE INDEX idx_match_detail_city ON match_detail (city);
+CREATE INDEX idx_match_detail_venue ON match_detail (venue);
+CREATE INDEX idx_match_detail_stage ON match_detail (stage);
+CREATE INDEX idx_match_detail_win_by_runs ON match_detail (win_by_runs);
+CREATE INDEX idx_match_detail_win_by_wickets ON match_detail (win_by_wickets);
+CREATE INDEX idx_match_detail_player_of_match ON match_detail (player_of_match_id);
+CREATE INDEX idx_match_detail_team1 ON match_detail (team1_id);
+CREATE INDEX idx_match_detail_team2 ON match_detail (team2_id);
+CREATE INDEX idx_match_detail_toss_winner ON match_detail (toss_winner_team_id);
+CREATE INDEX idx_match_detail_winner ON match_detail (winner_team_id);
+
+
+-- 4. OFFICIALS
+CREATE TABLE officials (
+    official_id VARCHAR(150) COLLATE NOCASE PRIMARY KEY,
+    official_name VARCHAR(150) COLLATE NOCASE NOT NULL
+);
+
+-- 5. MATCH OFFICIALS
+CREATE TABLE match_officials (
+    match_id VARCHAR(75) COLLATE NOCASE,
+    official_id VARCHAR(150) COLLATE NOCASE NOT NULL,
+    roles VARCHAR(100) COLLATE NOCASE NOT NULL,
+
+    PRIMARY KEY (match_id, official_id, roles),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (official_id) REFERENCES officials(official_id)
+);
+
+CREATE INDEX idx_match_officials_official ON match_officials (official_id);
+
+-- 6. DELIVERIES DETAIL
+-- delivery_key = match_key * 100000 + inning_num * 10000 + over_num * 100 + ball_num,
+-- so the rowid keeps each innings' balls together and in order.
+CREATE TABLE deliveries (
+    delivery_key INTEGER PRIMARY KEY,
+    match_key INT NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    batting_team_key INT NOT NULL,
+    bowling_team_key INT NOT NULL,
+    over_num INT NOT NULL CHECK (over_num >= 0),
+    ball_num INT NOT NULL CHECK (ball_num >= 0),
+
+    batsman_key INT NOT NULL,
+    bowler_key INT NOT NULL,
+    non_striker_key INT NOT NULL,
+
+    runs_batsman INT NOT NULL DEFAULT 0 CHECK (runs_batsman >= 0),
+    runs_extras INT NOT NULL DEFAULT 0 CHECK (runs_extras >= 0),
+    runs_total INT NOT NULL DEFAULT 0 CHECK (runs_total >= 0),
+
+    extras_type VARCHAR(50) COLLATE NOCASE,
+    extras_runs INT DEFAULT 0 CHECK (extras_runs >= 0),
+
+    FOREIGN KEY (match_key) REFERENCES match_detail(match_key),
+    FOREIGN KEY (batting_team_key) REFERENCES teams(team_key),
+    FOREIGN KEY (bowling_team_key) REFERENCES teams(team_key),
+    FOREIGN KEY (batsman_key) REFERENCES players(player_key),
+    FOREIGN KEY (bowler_key) REFERENCES players(player_key),
+    FOREIGN KEY (non_striker_key) REFERENCES players(player_key)
+);
+
+-- Covers the per-match summary refresh and the powerplay over-range join.
+CREATE INDEX idx_deliveries_innings ON deliveries (match_key, inning_num, over_num, batting_team_key, runs_total);
+CREATE INDEX idx_deliveries_batting_team ON deliveries (batting_team_key);
+CREATE INDEX idx_deliveries_bowling_team ON deliveries (bowling_team_key);
+CREATE INDEX idx_deliveries_batsman ON deliveries (batsman_key);
+CREATE INDEX idx_deliveries_bowler ON deliveries (bowler_key);
+CREATE INDEX idx_deliveries_non_striker ON deliveries (non_striker_key);
+
+
+-- 7. Reviews
+CREATE TABLE reviews (
+    review_id VARCHAR(200) COLLATE NOCASE PRIMARY KEY,
+    match_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    delivery_key BIGINT NOT NULL,
+
+    review_by_team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    umpire_id VARCHAR(150) COLLATE NOCASE,
+    batsman_name_id VARCHAR(75) COLLATE NOCASE,
+    decision VARCHAR(50) COLLATE NOCASE NOT NULL,
+    review_type VARCHAR(50) COLLATE NOCASE NOT NULL,
+    umpires_call VARCHAR(10) COLLATE NOCASE,
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (delivery_key) REFERENCES deliveries(delivery_key),
+    FOREIGN KEY (review_by_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (batsman_name_id) REFERENCES players(player_id),
+    FOREIGN KEY (umpire_id) REFERENCES officials(official_id)
+);
+
+CREATE INDEX idx_reviews_match ON reviews (match_id);
+CREATE INDEX idx_reviews_delivery ON reviews (delivery_key);
+CREATE INDEX idx_reviews_team ON reviews (review_by_team_id);
+CREATE INDEX idx_reviews_batsman ON reviews (batsman_name_id);
+CREATE INDEX idx_reviews_umpire ON reviews (umpire_id);
+
+
+-- 8. Replacements
+CREATE TABLE replacements (
+    replacement_id VARCHAR(200) COLLATE NOCASE PRIMARY KEY,
+    match_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+
+    team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    player_in_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    player_out_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    reason VARCHAR(100) COLLATE NOCASE,
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (player_in_id) REFERENCES players(player_id),
+    FOREIGN KEY (player_out_id) REFERENCES players(player_id)
+);
+
+CREATE INDEX idx_replacements_match ON replacements (match_id);
+CREATE INDEX idx_replacements_team ON replacements (team_id);
+CREATE INDEX idx_replacements_player_in ON replacements (player_in_id);
+CREATE INDEX idx_replacements_player_out ON replacements (player_out_id);
+
+
+-- 9. Match Players
+CREATE TABLE match_players (
+    match_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    player_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+
+    PRIMARY KEY (match_id, player_id),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (player_id) REFERENCES players(player_id),
+    FOREIGN KEY (team_id) REFERENCES teams(team_id)
+);
+
+CREATE INDEX idx_match_players_player ON match_players (player_id);
+CREATE INDEX idx_match_players_team ON match_players (team_id);
+
+
+-- 10. Wickets
+CREATE TABLE wickets (
+    wicket_id VARCHAR(200) COLLATE NOCASE PRIMARY KEY,
+    delivery_key BIGINT NOT NULL,
+    player_dismissed_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    dismissal_kind VARCHAR(50) COLLATE NOCASE NOT NULL,
+    fielder_id VARCHAR(75) COLLATE NOCASE,
+
+    FOREIGN KEY (player_dismissed_id) REFERENCES players(player_id),
+    FOREIGN KEY (fielder_id) REFERENCES players(player_id),
+    FOREIGN KEY (delivery_key) REFERENCES deliveries(delivery_key)
+);
+
+CREATE INDEX idx_wickets_player_dismissed ON wickets (player_dismissed_id);
+CREATE INDEX idx_wickets_fielder ON wickets (fielder_id);
+CREATE INDEX idx_wickets_delivery ON wickets (delivery_key);
+
+-- Powerplay
+CREATE TABLE powerplay (
+    powerplay_id VARCHAR(200) COLLATE NOCASE PRIMARY KEY,
+    match_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    start_over INT,
+    end_over INT,
+    pp_type VARCHAR(10) COLLATE NOCASE,
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id)
+);
+
+CREATE INDEX idx_powerplay_overs ON powerplay (match_id, inning_num, start_over, end_over);
+
+
+-- 11. SUMMARY TABLES
+-- Maintained per match by ipl_sql_insert.py, as in tables.sql.
+
+-- 11_1. Innings totals
+CREATE TABLE innings_totals (
+    match_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    batting_team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    bowling_team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    total_runs INT NOT NULL DEFAULT 0,
+    balls INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (batting_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (bowling_team_id) REFERENCES teams(team_id)
+);
+
+CREATE INDEX idx_innings_totals_runs ON innings_totals (total_runs);
+CREATE INDEX idx_innings_totals_inning ON innings_totals (inning_num, total_runs);
+CREATE INDEX idx_innings_totals_batting_team ON innings_totals (batting_team_id);
+CREATE INDEX idx_innings_totals_bowling_team ON innings_totals (bowling_team_id);
+
+-- 11_2. Batting line per player per innings (the batting scorecard)
+CREATE TABLE player_match_batting (
+    match_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    player_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    batting_position INT NOT NULL DEFAULT 0,
+    runs INT NOT NULL DEFAULT 0,
+    balls_faced INT NOT NULL DEFAULT 0,
+    fours INT NOT NULL DEFAULT 0,
+    sixes INT NOT NULL DEFAULT 0,
+    dismissal_kind VARCHAR(50) COLLATE NOCASE,
+    bowler_id VARCHAR(75) COLLATE NOCASE,
+    fielder_id VARCHAR(75) COLLATE NOCASE,
+
+    PRIMARY KEY (match_id, inning_num, player_id),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (player_id) REFERENCES players(player_id),
+    FOREIGN KEY (team_id) REFERENCES teams(team_id)
+);
+
+CREATE INDEX idx_player_match_batting_player ON player_match_batting (player_id, runs);
+CREATE INDEX idx_player_match_batting_runs ON player_match_batting (runs);
+CREATE INDEX idx_player_match_batting_team ON player_match_batting (team_id);
+
+-- 11_3. Bowling line per player per innings (the bowling scorecard)
+CREATE TABLE player_match_bowling (
+    match_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    player_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    bowling_position INT NOT NULL DEFAULT 0,
+    wickets INT NOT NULL DEFAULT 0,
+    runs_conceded INT NOT NULL DEFAULT 0,
+    balls INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num, player_id),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (player_id) REFERENCES players(player_id),
+    FOREIGN KEY (team_id) REFERENCES teams(team_id)
+);
+
+CREATE INDEX idx_player_match_bowling_player ON player_match_bowling (player_id, match_id, wickets, runs_conceded);
+CREATE INDEX idx_player_match_bowling_team ON player_match_bowling (team_id);
+
+-- 11_4. Match total per venue
+CREATE TABLE venue_match_totals (
+    match_id VARCHAR(75) COLLATE NOCASE PRIMARY KEY,
+    venue VARCHAR(300) COLLATE NOCASE,
+    total_runs INT NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id)
+);
+
+CREATE INDEX idx_venue_match_totals_venue ON venue_match_totals (venue, total_runs);
+
+-- 11_5. Partnerships
+CREATE TABLE partnerships (
+    match_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    inning_num INT NOT NULL CHECK (inning_num > 0),
+    wicket_num INT NOT NULL CHECK (wicket_num > 0),
+    batting_team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    bowling_team_id VARCHAR(50) COLLATE NOCASE NOT NULL,
+    batter1_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    batter2_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    runs INT NOT NULL DEFAULT 0,
+    balls INT NOT NULL DEFAULT 0,
+    batter1_runs INT NOT NULL DEFAULT 0,
+    batter2_runs INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (match_id, inning_num, wicket_num, batter1_id, batter2_id),
+
+    FOREIGN KEY (match_id) REFERENCES match_detail(match_id),
+    FOREIGN KEY (batting_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (bowling_team_id) REFERENCES teams(team_id),
+    FOREIGN KEY (batter1_id) REFERENCES players(player_id),
+    FOREIGN KEY (batter2_id) REFERENCES players(player_id)
+);
+
+CREATE INDEX idx_partnerships_runs ON partnerships (runs);
+CREATE INDEX idx_partnerships_batting_team ON partnerships (batting_team_id);
+CREATE INDEX idx_partnerships_bowling_team ON partnerships (bowling_team_id);
+CREATE INDEX idx_partnerships_batter1 ON partnerships (batter1_id);
+CREATE INDEX idx_partnerships_batter2 ON partnerships (batter2_id);
+
+
+-- 12. DATA VERSION
+-- See tables.sql: version moves with whole-match loads, live_version with
+-- each live ball-by-ball batch.
+CREATE TABLE data_version (
+    id TINYINT PRIMARY KEY CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    live_version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO data_version (id, version) VALUES (1, 0);
+
+
+-- 13. INGEST MANIFEST
+CREATE TABLE ingest_manifest (
+    file_name VARCHAR(255) COLLATE NOCASE PRIMARY KEY,
+    match_id VARCHAR(75) COLLATE NOCASE NOT NULL,
+    file_mtime_ns BIGINT NOT NULL,
+    file_size BIGINT NOT NULL,
+    content_hash CHAR(64) COLLATE NOCASE NOT NULL,
+    ingested_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,84 @@
+# Shared fixtures: IPL_10 loaded into a temporary SQLite database
+# (ipl_db.SQLiteBackend), so the tests need no MySQL server.
+#
+# The whole season loads in about a second. It is used rather than a
+# slice because on it no leaderboard template (LIMIT 1/5) has a tie at the
+# cut, so each template has exactly one right answer to compare.
+#
+#   python -m pytest -q
+
+import os
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import ipl_benchmark  # noqa: E402
+import ipl_db  # noqa: E402
+import ipl_mcp_server as server  # noqa: E402
+
+DATA_DIR = os.path.join(REPO, "IPL_10")
+
+
+@pytest.fixture(scope="session")
+def sqlite_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("ipl_sqlite") / "ipl_test.sqlite3")
+    ipl_benchmark.load_sqlite_database(path, DATA_DIR)
+    return path
+
+
+@pytest.fixture(scope="session")
+def sqlite_conn(sqlite_path):
+    conn = ipl_db.SQLiteBackend(sqlite_path).connect(autocommit=True, read_only=True)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="session")
+def sample_params(sqlite_conn):
+    """Slot name -> value taken from the loaded season (see ipl_benchmark.sql_sample_params)."""
+    cursor = sqlite_conn.cursor(dictionary=True)
+    slots = ipl_benchmark.sql_sample_params(cursor)
+    cursor.close()
+    return slots
+
+
+def mysql_connection(database):
+    """(connection, sample slots) for a loaded database on db_config's MySQL server; skips the test without one."""
+    try:
+        conn = ipl_db.MySQLBackend(dict(server.db_config, database=database)).connect(autocommit=True)
+    except ipl_db.ERRORS as e:
+        pytest.skip(f"MySQL unreachable: {e}")
+    cursor = conn.cursor(dictionary=True)
+    try:
+        slots = ipl_benchmark.sql_sample_params(cursor)
+    except (ipl_db.ERRORS, TypeError) as e:
+        slots = None
+        reason = f"MySQL database {database} is not loaded: {e}"
+    cursor.close()
+    if slots is None:
+        conn.close()
+        pytest.skip(reason)
+    return conn, slots
+
+
+@pytest.fixture(scope="session")
+def mysql_conn():
+    """The server's database (db_config)."""
+    conn, slots = mysql_connection(server.db_config["database"])
+    yield conn, slots
+    conn.close()
+
+
+@pytest.fixture(scope="session")
+def mysql_bench_conn():
+    """IPL_10 in MySQL, as `python ipl_benchmark.py backends --load` leaves it."""
+    conn, _ = mysql_connection("ipl_bench")
+    yield conn
+    conn.close()
+
+
+def template_params(template, slots):
+    return tuple(slots[slot] for slot in template.params)
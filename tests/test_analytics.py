@@ -0,0 +1,25 @@
+# The in-memory analytics engine must return what the template's SQL
+# returns, row for row, on the same data.
+
+import pytest
+
+from conftest import template_params
+from ipl_analytics import AnalyticsEngine
+from ipl_benchmark import comparable
+import ipl_mcp_server as server
+
+
+@pytest.fixture(scope="module")
+def engine(sqlite_conn):
+    return AnalyticsEngine.from_connection(sqlite_conn)
+
+
+def test_every_template_is_implemented():
+    assert [t.name for t in server.TEMPLATES if not AnalyticsEngine.supports(t.name)] == []
+
+
+@pytest.mark.parametrize("template", server.TEMPLATES, ids=lambda t: t.name)
+def test_engine_matches_sql(template, engine, sqlite_conn, sample_params):
+    params = template_params(template, sample_params)
+    expected = comparable(server.run_sql(sqlite_conn, template.sql, params))
+    assert comparable(engine.answer(template.name, params)) == expected
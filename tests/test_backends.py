@@ -0,0 +1,65 @@
+# ipl_db's SQLite backend must answer every template as MySQL does. The
+# rewrites it makes to MySQL statements always run; the template parity
+# check runs when db_config's server holds IPL_10 in ipl_bench
+# (`python ipl_benchmark.py backends --load`).
+
+import sqlite3
+
+import pytest
+
+from conftest import template_params
+from ipl_benchmark import result_set
+import ipl_db
+import ipl_mcp_server as server
+
+
+@pytest.mark.parametrize("mysql, sqlite", [
+    ("SELECT * FROM teams WHERE team_id = %s AND team_name = %s",
+     "SELECT * FROM teams WHERE team_id = ? AND team_name = ?"),
+    ("INSERT IGNORE INTO teams (team_id, team_name) VALUES (%s, %s)",
+     "INSERT OR IGNORE INTO teams (team_id, team_name) VALUES (?, ?)"),
+    ("insert  ignore into teams VALUES (%s, %s)", "INSERT OR IGNORE into teams VALUES (?, ?)"),
+    ("SET foreign_key_checks = 0", "PRAGMA foreign_keys = 0"),
+    ("  set FOREIGN_KEY_CHECKS=1 ", "PRAGMA foreign_keys = 1"),
+    ("REPLACE INTO powerplay VALUES (%s)", "REPLACE INTO powerplay VALUES (?)"),
+])
+def test_sqlite_statement(mysql, sqlite):
+    assert ipl_db.sqlite_statement(mysql) == sqlite
+
+
+def test_rewritten_statements_run_on_sqlite():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE child (id INTEGER PRIMARY KEY, parent_id INTEGER REFERENCES parent (id))")
+    conn.execute(ipl_db.sqlite_statement("SET foreign_key_checks = 1"))
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute(ipl_db.sqlite_statement("INSERT INTO child VALUES (%s, %s)"), (1, 1))
+    conn.execute(ipl_db.sqlite_statement("SET foreign_key_checks = 0"))
+    insert = ipl_db.sqlite_statement("INSERT IGNORE INTO child VALUES (%s, %s)")
+    conn.execute(insert, (1, 1))
+    conn.execute(insert, (1, 2))
+    assert conn.execute("SELECT * FROM child").fetchall() == [(1, 1)]
+    conn.close()
+
+
+def match_ids(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT match_id FROM match_detail")
+    ids = {str(row[0]) for row in cursor.fetchall()}
+    cursor.close()
+    return ids
+
+
+@pytest.fixture(scope="module")
+def mysql_ipl10(mysql_bench_conn, sqlite_conn):
+    if match_ids(mysql_bench_conn) != match_ids(sqlite_conn):
+        pytest.skip("ipl_bench does not hold IPL_10; run `python ipl_benchmark.py backends --load`")
+    return mysql_bench_conn
+
+
+@pytest.mark.parametrize("template", server.TEMPLATES, ids=lambda t: t.name)
+def test_sqlite_matches_mysql(template, mysql_ipl10, sqlite_conn, sample_params):
+    params = template_params(template, sample_params)
+    expected = result_set(server.run_sql(mysql_ipl10, template.sql, params))
+    # Rows that tie on the ORDER BY may come back in either order.
+    assert sorted(result_set(server.run_sql(sqlite_conn, template.sql, params))) == sorted(expected)
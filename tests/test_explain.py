@@ -0,0 +1,23 @@
+# No template may fall back to reading a whole table that an index should
+# serve (ipl_benchmark.FULL_SCAN_ALLOWED / FULL_SCAN_EXPECTED list the
+# exceptions). SQLite's EXPLAIN QUERY PLAN always runs; MySQL's EXPLAIN
+# runs too when db_config's server is reachable and loaded.
+
+import pytest
+
+from conftest import template_params
+from ipl_benchmark import explain_plan
+import ipl_mcp_server as server
+
+
+@pytest.mark.parametrize("template", server.TEMPLATES, ids=lambda t: t.name)
+def test_sqlite_plan_has_no_full_scan(template, sqlite_conn, sample_params):
+    plan, full_scans = explain_plan(sqlite_conn, template, template_params(template, sample_params))
+    assert full_scans == [], [row["detail"] for row in plan]
+
+
+@pytest.mark.parametrize("template", server.TEMPLATES, ids=lambda t: t.name)
+def test_mysql_plan_has_no_full_scan(template, mysql_conn):
+    conn, slots = mysql_conn
+    plan, full_scans = explain_plan(conn, template, template_params(template, slots))
+    assert full_scans == [], plan
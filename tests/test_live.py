@@ -0,0 +1,45 @@
+# Replaying a finished match through the live feed (follow_live) must
+# leave the same rows as loading its file.
+
+import json
+import os
+import shutil
+
+from conftest import DATA_DIR
+import ipl_db
+import ipl_sql_insert
+
+REPLAYED_TABLES = ["powerplay", "player_match_batting", "player_match_bowling", "partnerships", "innings_totals"]
+
+
+def match_rows(conn, table, match_id):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM {table} WHERE match_id = %s", (match_id,))
+    rows = sorted(cursor.fetchall())
+    cursor.close()
+    return rows
+
+
+def test_feed_replay_matches_file_load(sqlite_path, tmp_path):
+    path = str(tmp_path / "live.sqlite3")
+    shutil.copy(sqlite_path, path)
+    name = sorted(f for f in os.listdir(DATA_DIR) if f.endswith(".json"))[0]
+    match_id = name[:-len(".json")]
+    with open(os.path.join(DATA_DIR, name), encoding="utf-8") as f:
+        data = json.load(f)
+
+    conn = ipl_db.SQLiteBackend(path).connect()
+    try:
+        loaded = {table: match_rows(conn, table, match_id) for table in REPLAYED_TABLES}
+        assert loaded["powerplay"]
+        cursor = conn.cursor()
+        ipl_sql_insert.delete_match(cursor, match_id)
+        conn.commit()
+        cursor.close()
+
+        feed = tmp_path / "feed.jsonl"
+        feed.write_text("".join(json.dumps(event) + "\n" for event in ipl_sql_insert.feed_events(match_id, data)))
+        ipl_sql_insert.follow_live(conn, str(feed), follow=False)
+        assert {table: match_rows(conn, table, match_id) for table in REPLAYED_TABLES} == loaded
+    finally:
+        conn.close()
@@ -0,0 +1,32 @@
+# Keyset pages (QueryTemplate.page) read back to back must equal the
+# template's full result, in order.
+
+import pytest
+
+from conftest import template_params
+from ipl_benchmark import comparable
+import ipl_mcp_server as server
+
+KEYSET_TEMPLATES = [t for t in server.TEMPLATES if t.keyset]
+PAGE_ROWS = 3
+
+
+def test_large_templates_have_a_keyset():
+    assert {t.name for t in KEYSET_TEMPLATES} >= {"all_matches", "centuries", "century_partnerships", "scorecard"}
+
+
+@pytest.mark.parametrize("template", KEYSET_TEMPLATES, ids=lambda t: t.name)
+def test_pages_match_full_result(template, sqlite_conn, sample_params):
+    params = template_params(template, sample_params)
+    expected = server.run_sql(sqlite_conn, template.sql, params)
+    assert len(expected) > PAGE_ROWS
+
+    rows, after = [], None
+    while True:
+        sql_query, key_params = template.page(after)
+        page = server.run_sql(sqlite_conn, sql_query, params + key_params + (PAGE_ROWS,))
+        rows.extend(page)
+        if len(page) < PAGE_ROWS:
+            break
+        after = template.page_key(page[-1])
+    assert comparable(rows) == comparable(expected)
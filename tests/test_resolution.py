@@ -0,0 +1,34 @@
+# Questions that differ by one word must reach the right one of two sibling
+# templates, without the LLM.
+
+import pytest
+
+import ipl_db
+import ipl_mcp_server as server
+
+LOCAL_PIPELINE = [(stage, budget_ms) for stage, budget_ms in server.RESOLUTION_PIPELINE if stage != "llm"]
+TEAMS = "Royal Challengers Bengaluru vs Kolkata Knight Riders"
+
+
+@pytest.fixture(scope="module")
+def resolve(sqlite_path):
+    previous = server.db_backend
+    server.use_backend(ipl_db.SQLiteBackend(sqlite_path))
+    yield lambda question: server.resolve_question(question, LOCAL_PIPELINE)
+    server.use_backend(previous)
+
+
+@pytest.mark.parametrize("question, template", [
+    (f"{TEAMS} scorecard", "scorecard"),
+    (f"scorecard {TEAMS}", "scorecard"),
+    (f"scorecard for {TEAMS}", "scorecard"),
+    (f"{TEAMS} bowling scorecard", "bowling_scorecard"),
+    (f"bowling scorecard {TEAMS}", "bowling_scorecard"),
+    (f"bowling scorecard for {TEAMS}", "bowling_scorecard"),
+    (f"{TEAMS} bowling", "bowling_scorecard"),
+    (f"show the bowling scorecard of {TEAMS}", "bowling_scorecard"),
+])
+def test_scorecard_siblings(resolve, question, template):
+    resolution = resolve(question)
+    assert resolution["template"] == template, resolution["stage"]
+    assert len(resolution["params"]) == 4